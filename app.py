@@ -9,16 +9,23 @@ from routes.pagos import pagos_bp
 from routes.envios import envios_bp
 from routes.contacto import contact_bp
 from datetime import timedelta
-from flask_jwt_extended import JWTManager
+from flask_jwt_extended import JWTManager, jwt_required
 from flask_cors import CORS
 import os
+import tempfile
 from flask import request
 from services.email_service import send_email
-from extension import mail  
+from services.identidad import require_admin
+from extension import mail, cache, vistas_buffer, sugeridos_index, busqueda_index, prefijo_index, cotizador, zonas_index, expirador_reservas, metricas, identidad, revocaciones, passwords
 from flask_migrate import Migrate
+from services.outbox import emails_cli
+from services.pagos_mp import mp_cli
 
 
 def build_db_uri():
+    if os.getenv("DATABASE_URL"):  # URI completa (ej: la base del benchmark)
+        return os.getenv("DATABASE_URL")
+
     db_type = os.getenv("DB_TYPE", "mysql")  # mysql o sqlite (si querés fallback)
     if db_type == "sqlite":
         return "sqlite:///ecommerce.db"
@@ -69,12 +76,93 @@ app.config["MAIL_DEFAULT_SENDER"] = os.getenv("MAIL_DEFAULT_SENDER", app.config[
 # admin opcional
 app.config["ADMIN_EMAIL"] = os.getenv("ADMIN_EMAIL")
 
+# conexión SMTP persistente: si estuvo ociosa más de N segundos se verifica con NOOP
+app.config["MAIL_POOL_CHECK"] = int(os.getenv("MAIL_POOL_CHECK", "30"))
+
+# ====== CACHE CATÁLOGO ======
+# memory: LRU por worker | redis: compartido entre workers de gunicorn
+app.config["CACHE_BACKEND"] = os.getenv("CACHE_BACKEND", "memory")
+app.config["CACHE_REDIS_URL"] = os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+app.config["CACHE_TTL"] = int(os.getenv("CACHE_TTL", "60"))
+app.config["CACHE_MAX_ENTRIES"] = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+
+# vistas de productos: se acumulan por worker y se escriben cada N segundos
+app.config["VISTAS_FLUSH_SEGUNDOS"] = float(os.getenv("VISTAS_FLUSH_SEGUNDOS", "10"))
+
+# índice de sugeridos en memoria: se recarga completo cada N segundos
+app.config["SUGERIDOS_TTL"] = float(os.getenv("SUGERIDOS_TTL", "300"))
+
+# búsqueda: fulltext (MySQL, productos.texto_busqueda) | memoria (índice invertido por worker)
+app.config["BUSQUEDA_BACKEND"] = os.getenv(
+    "BUSQUEDA_BACKEND", "fulltext" if app.config["SQLALCHEMY_DATABASE_URI"].startswith("mysql") else "memoria"
+)
+
+# cotizaciones de envío: cache por (transportista, CP, bulto) + circuit breaker
+app.config["ENVIOS_ANDREANI_URL"] = os.getenv("ENVIOS_ANDREANI_URL", "https://www.andreani.com/api/cotizador/prices")
+app.config["ENVIOS_VIACARGO_URL"] = os.getenv("ENVIOS_VIACARGO_URL", "https://ws.busplus.com.ar/alerce/cotizar")
+app.config["ENVIOS_COTIZACION_TTL"] = int(os.getenv("ENVIOS_COTIZACION_TTL", "3600"))
+app.config["ENVIOS_COTIZACION_STALE"] = int(os.getenv("ENVIOS_COTIZACION_STALE", "86400"))
+app.config["ENVIOS_DEADLINE"] = float(os.getenv("ENVIOS_DEADLINE", "4"))
+app.config["ENVIOS_BREAKER_FALLAS"] = int(os.getenv("ENVIOS_BREAKER_FALLAS", "3"))
+app.config["ENVIOS_BREAKER_ABIERTO"] = float(os.getenv("ENVIOS_BREAKER_ABIERTO", "60"))
+# pool de consultas a transportistas por worker: threads + cola acotada (lleno = "saturado")
+app.config["ENVIOS_HILOS"] = int(os.getenv("ENVIOS_HILOS", "8"))
+app.config["ENVIOS_COLA_MAX"] = int(os.getenv("ENVIOS_COLA_MAX", "16"))
+
+# índice de zonas de envío en memoria: se recarga completo cada N segundos
+app.config["ZONAS_TTL"] = float(os.getenv("ZONAS_TTL", "300"))
+
+# expirador de reservas: un solo worker (lease en DB) libera el stock al vencer cada pedido
+app.config["RESERVAS_SCHEDULER"] = os.getenv("RESERVAS_SCHEDULER", "true").lower() == "true"
+app.config["RESERVAS_LEASE_SEGUNDOS"] = float(os.getenv("RESERVAS_LEASE_SEGUNDOS", "30"))
+app.config["RESERVAS_REFRESCO_SEGUNDOS"] = float(os.getenv("RESERVAS_REFRESCO_SEGUNDOS", "10"))
+app.config["RESERVAS_RESIEMBRA"] = float(os.getenv("RESERVAS_RESIEMBRA", "600"))
+
+# métricas: /metrics (Prometheus), Server-Timing y log de SQL lento (0 = apagado)
+app.config["METRICAS_HABILITADAS"] = os.getenv("METRICAS_HABILITADAS", "true").lower() == "true"
+app.config["METRICAS_SLOW_MS"] = float(os.getenv("METRICAS_SLOW_MS", "0"))
+app.config["METRICAS_SERVER_TIMING"] = os.getenv("METRICAS_SERVER_TIMING", "true").lower() == "true"
+app.config["METRICAS_TOKEN"] = os.getenv("METRICAS_TOKEN")
+# sin token /metrics da 403; "true" lo deja abierto (solo para desarrollo)
+app.config["METRICAS_PUBLICAS"] = os.getenv("METRICAS_PUBLICAS", "false").lower() == "true"
+
+# identidad: rol/activo por usuario cacheados N segundos (autorizar sin ir a la DB)
+app.config["IDENTIDAD_TTL"] = float(os.getenv("IDENTIDAD_TTL", "60"))
+
+# logout: jti revocados en DB + copia en memoria por worker (sync cada N segundos)
+app.config["REVOCACION_SYNC_SEGUNDOS"] = float(os.getenv("REVOCACION_SYNC_SEGUNDOS", "5"))
+app.config["REVOCACION_PURGA_SEGUNDOS"] = float(os.getenv("REVOCACION_PURGA_SEGUNDOS", "600"))
+
+# passwords: costo del hash (formato werkzeug) y pool acotado para verificar en el login
+app.config["PASSWORD_METODO"] = os.getenv("PASSWORD_METODO", "scrypt:32768:8:1")
+app.config["PASSWORD_HILOS"] = int(os.getenv("PASSWORD_HILOS", "2"))
+app.config["PASSWORD_COLA_MAX"] = int(os.getenv("PASSWORD_COLA_MAX", "32"))
+app.config["PASSWORD_TIMEOUT"] = float(os.getenv("PASSWORD_TIMEOUT", "5"))
+# tope por máquina entre todos los workers (cupos con flock; 0 = solo el límite por worker)
+app.config["PASSWORD_HILOS_GLOBAL"] = int(os.getenv("PASSWORD_HILOS_GLOBAL", "2"))
+app.config["PASSWORD_COLA_GLOBAL"] = int(os.getenv("PASSWORD_COLA_GLOBAL", "2"))
+app.config["PASSWORD_CUPOS_DIR"] = os.getenv("PASSWORD_CUPOS_DIR", os.path.join(tempfile.gettempdir(), "loversplay-passwords"))
+
 
 
 db.init_app(app)
 jwt = JWTManager(app)
 mail.init_app(app)
+cache.init_app(app)
+vistas_buffer.init_app(app)
+sugeridos_index.init_app(app)
+busqueda_index.init_app(app)
+prefijo_index.init_app(app)
+cotizador.init_app(app)
+zonas_index.init_app(app)
+expirador_reservas.init_app(app)
+metricas.init_app(app)
+identidad.init_app(app)
+revocaciones.init_app(app)
+passwords.init_app(app)
 migrate = Migrate(app, db)
+app.cli.add_command(emails_cli)
+app.cli.add_command(mp_cli)
 
 @jwt.expired_token_loader
 def expired_token_callback(jwt_header=None, jwt_payload=None):
@@ -100,7 +188,14 @@ def unauthorized_callback(error):
 
 @jwt.token_in_blocklist_loader
 def revoked_token_callback(jwt_header=None, jwt_payload=None):
-    return False
+    return revocaciones.revocado(jwt_payload["jti"])
+
+@jwt.revoked_token_loader
+def revoked_token_response(jwt_header=None, jwt_payload=None):
+    return jsonify({
+        "error": "token_revocado",
+        "mensaje": "La sesión fue cerrada. Iniciá sesión nuevamente."
+    }), 401
 
 @app.route("/api/test-mail", methods=["POST"])
 def test_mail():
@@ -117,6 +212,14 @@ def test_mail():
     return jsonify({"status": "ok", "sent_to": to}), 200
 
 
+@app.route("/api/cache/stats", methods=["GET"])
+@jwt_required()
+def cache_stats():
+    if not require_admin():
+        return jsonify({"error": "Acceso denegado"}), 403
+    return jsonify(cache.stats()), 200
+
+
 # Registrar rutas
 app.register_blueprint(auth_bp)
 app.register_blueprint(categorias_bp)
@@ -0,0 +1,494 @@
+"""
+Benchmark de carga de los endpoints calientes, reproducible.
+
+Siembra una base aparte (SQLite o un MySQL local) con un catálogo sintético
+(productos, categorías, imágenes, usuarios, pedidos y pagos) y le pega a:
+
+    GET  /productos/  /productos/<id>  /productos/filtro  /categorias/  /pedidos/
+    POST /pedidos/    /productos/stock/check
+
+Por escenario reporta p50/p95/p99, req/s y queries por request (las saca
+del header Server-Timing de services/metricas.py) y compara contra un
+baseline guardado: sale con código 1 si el p95 empeora más que
+--tolerancia o si sube la cantidad de queries.
+
+    python benchmarks/carga_endpoints.py --sembrar --productos 5000 --pedidos 3000
+    python benchmarks/carga_endpoints.py --requests 300 --rondas 5
+    python benchmarks/carga_endpoints.py --modo gunicorn --workers 4 --concurrencia 16
+    python benchmarks/carga_endpoints.py --guardar-baseline
+
+--db es una URI de SQLAlchemy. OJO: --sembrar borra y recrea las tablas,
+usar una base dedicada (ej: mysql+pymysql://root:@127.0.0.1:3306/ecommerce_bench).
+Con SQLite y varios workers de gunicorn los POST pueden chocar con
+"database is locked": para comparar escrituras usar MySQL.
+
+Las latencias del baseline dependen de la máquina; las queries por request no.
+Los POST /pedidos/ agregan pedidos: para comparar, correr con --sembrar así
+cada corrida arranca de la misma base (la siembra es determinística).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+DB_DEFAULT = "sqlite:////tmp/loversplay_bench.db"
+BASELINE_DEFAULT = os.path.join(RAIZ, "benchmarks", "baseline.json")
+
+PALABRAS = (
+    "gel lubricante vibrador anillo masajeador aceite lenceria body conjunto "
+    "rosa negro rojo silicona recargable sumergible intimo sensual calor frio "
+    "frutilla chocolate vainilla clasico premium mini doble kit pack"
+).split()
+
+_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+# ------------------------
+# Siembra
+# ------------------------
+def _insertar(db, tabla, filas, lote=1000):
+    for i in range(0, len(filas), lote):
+        db.session.execute(tabla.insert(), filas[i:i + lote])
+
+
+def sembrar(app, productos, categorias, usuarios, pedidos, semilla=42, recrear=True):
+    """
+    Carga el catálogo sintético. Con recrear=False no toca el esquema (las
+    tablas tienen que existir y estar vacías, ej: recién migradas).
+    """
+    from database import db
+    from models import (
+        Categoria, ImagenProducto, Pago, Pedido, PedidoDetalle, Producto, Usuario, producto_categoria,
+    )
+    from services.busqueda import texto_busqueda
+    from services.pedidos import refrescar_resumen
+
+    rnd = random.Random(semilla)
+    ahora = datetime.utcnow()
+    t0 = time.perf_counter()
+
+    with app.app_context():
+        if recrear:
+            db.drop_all()
+            db.create_all()
+        if recrear and db.engine.dialect.name == "mysql":
+            db.session.execute(db.text(
+                "CREATE FULLTEXT INDEX ft_productos_texto_busqueda ON productos (texto_busqueda)"
+            ))
+
+        nombres_cat = {i: f"Categoría {i}" for i in range(1, categorias + 1)}
+        _insertar(db, Categoria.__table__, [
+            {"id": i, "nombre": n, "slug": f"categoria-{i}", "icon_key": "bench", "url_imagen": f"/cat{i}.jpg"}
+            for i, n in nombres_cat.items()
+        ])
+
+        filas_prod, filas_pc, filas_img = [], [], []
+        for pid in range(1, productos + 1):
+            nombre = " ".join(rnd.sample(PALABRAS, 3)).capitalize() + f" {pid}"
+            corta = " ".join(rnd.sample(PALABRAS, 6))
+            cats = rnd.sample(range(1, categorias + 1), k=min(categorias, rnd.choice((1, 1, 2))))
+            filas_prod.append({
+                "id": pid,
+                "nombre": nombre,
+                "slug": f"producto-{pid}",
+                "activo": rnd.random() > 0.05,
+                "precio": round(rnd.uniform(1000, 90000), 2),
+                "descripcion_corta": corta,
+                "descripcion_larga": corta * 4,
+                "stock": 10 ** 6,  # los POST /pedidos/ no lo agotan
+                "peso": round(rnd.uniform(0.1, 3), 2),
+                "url_imagen_principal": f"/productos/{pid}/0.jpg",
+                "fecha_creacion": ahora - timedelta(days=rnd.randint(0, 720)),
+                "vistas": int(rnd.paretovariate(1.2) * 10),
+                "valoracion_promedio": round(rnd.uniform(0, 5), 2),
+                "texto_busqueda": texto_busqueda(nombre, corta, None, [nombres_cat[c] for c in cats]),
+            })
+            filas_pc += [{"producto_id": pid, "categoria_id": c} for c in cats]
+            filas_img += [{"producto_id": pid, "url_imagen": f"/productos/{pid}/{k}.jpg"} for k in range(1, 4)]
+        _insertar(db, Producto.__table__, filas_prod)
+        _insertar(db, producto_categoria, filas_pc)
+        _insertar(db, ImagenProducto.__table__, filas_img)
+
+        # un solo hash: uno por usuario haría la siembra eterna
+        u = Usuario()
+        u.set_password("bench")
+        filas_usr = [{
+            "id": 1, "nombre": "admin", "email": "admin@bench.local", "rol": "admin",
+            "password_hash": u.password_hash, "activo": True, "fecha_registro": ahora,
+        }]
+        filas_usr += [{
+            "id": uid, "nombre": f"Usuario {uid}", "email": f"usuario{uid}@bench.local", "rol": "cliente",
+            "password_hash": u.password_hash, "activo": True, "fecha_registro": ahora,
+        } for uid in range(2, usuarios + 2)]
+        _insertar(db, Usuario.__table__, filas_usr)
+
+        precios = {f["id"]: f["precio"] for f in filas_prod}
+        filas_ped, filas_det, filas_pago = [], [], []
+        for pedido_id in range(1, pedidos + 1):
+            estado = rnd.choices(("PAGADO", "PENDIENTE_PAGO", "EXPIRADO", "ENVIADO"), (5, 2, 2, 1))[0]
+            fecha = ahora - timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+            total = 0.0
+            for producto_id in rnd.sample(range(1, productos + 1), k=rnd.randint(1, 4)):
+                cantidad = rnd.randint(1, 3)
+                subtotal = round(precios[producto_id] * cantidad, 2)
+                total += subtotal
+                filas_det.append({
+                    "pedido_id": pedido_id, "producto_id": producto_id, "cantidad": cantidad, "subtotal": subtotal,
+                })
+            filas_ped.append({
+                "id": pedido_id,
+                "usuario_id": rnd.randint(2, usuarios + 1),
+                "fecha": fecha,
+                "estado": estado,
+                "total": round(total, 2),
+                "costo_envio": 0,
+                "expires_at": fecha + timedelta(minutes=30),
+                "stock_state": {"PAGADO": "confirmed", "ENVIADO": "confirmed", "EXPIRADO": "released"}.get(estado, "reserved"),
+            })
+            filas_pago.append({
+                "pedido_id": pedido_id,
+                "estado": {"PAGADO": "approved", "ENVIADO": "approved", "EXPIRADO": "rejected"}.get(estado, "pending"),
+                "monto": round(total, 2),
+                "fecha_creacion": fecha,
+                "fecha_actualizacion": fecha,
+            })
+        _insertar(db, Pedido.__table__, filas_ped)
+        _insertar(db, PedidoDetalle.__table__, filas_det)
+        _insertar(db, Pago.__table__, filas_pago)
+        db.session.commit()
+
+        for i in range(1, pedidos + 1, 500):
+            refrescar_resumen(list(range(i, min(i + 500, pedidos + 1))))
+            db.session.commit()
+
+    print(
+        f"sembrado en {time.perf_counter() - t0:.1f}s: {productos} productos, {categorias} categorías, "
+        f"{usuarios} usuarios, {pedidos} pedidos"
+    )
+
+
+# ------------------------
+# Escenarios
+# ------------------------
+def escenarios(app, semilla=42):
+    """
+    Lista de (nombre, generador). Cada generador recibe un Random y devuelve
+    (método, url, json, headers).
+    """
+    from flask_jwt_extended import create_access_token
+    from database import db
+    from models import Pedido, Producto
+
+    with app.app_context():
+        activos = [pid for (pid,) in db.session.query(Producto.id).filter(Producto.activo.is_(True))]
+        con_pedidos = sorted({uid for (uid,) in db.session.query(Pedido.usuario_id).distinct()})
+        # los tokens se firman acá: gunicorn usa el mismo JWT_SECRET_KEY
+        tokens = {uid: create_access_token(identity=str(uid)) for uid in con_pedidos[:200]}
+
+    if not activos or not tokens:
+        sys.exit("la base no tiene datos: correr con --sembrar")
+
+    paginas = max(len(activos) // 12, 1)
+    uids = list(tokens)
+
+    def auth(rnd):
+        return {"Authorization": "Bearer " + tokens[rnd.choice(uids)]}
+
+    return [
+        ("GET /productos/", lambda rnd: (
+            "GET",
+            f"/productos/?page={min(int(rnd.paretovariate(1.5)), paginas)}&sort={rnd.choice(('views', 'price_asc', 'newest'))}",
+            None, {},
+        )),
+        ("GET /productos/<id>", lambda rnd: ("GET", f"/productos/{rnd.choice(activos)}", None, {})),
+        ("GET /productos/filtro", lambda rnd: (
+            "GET",
+            f"/productos/filtro?filtro={rnd.choice(PALABRAS)}&page={rnd.randint(1, 3)}"
+            if rnd.random() < 0.7 else f"/productos/filtro?page={rnd.randint(1, 5)}",
+            None, {},
+        )),
+        ("GET /categorias/", lambda rnd: ("GET", "/categorias/", None, {})),
+        ("GET /pedidos/", lambda rnd: ("GET", "/pedidos/", None, auth(rnd))),
+        ("POST /productos/stock/check", lambda rnd: (
+            "POST", "/productos/stock/check",
+            {"items": [{"id": pid, "qty": rnd.randint(1, 3)} for pid in rnd.sample(activos, k=min(5, len(activos)))]},
+            {},
+        )),
+        ("POST /pedidos/", lambda rnd: (
+            "POST", "/pedidos/",
+            {"detalles": [{"producto_id": pid, "cantidad": 1} for pid in rnd.sample(activos, k=min(3, len(activos)))]},
+            auth(rnd),
+        )),
+    ]
+
+
+# ------------------------
+# Clientes
+# ------------------------
+class ClienteInproceso:
+    """Flask test_client: mide la app sin red ni servidor (un client por thread)."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def __call__(self, metodo, url, body, headers):
+        if not hasattr(self._local, "c"):
+            self._local.c = self.app.test_client()
+        r = self._local.c.open(url, method=metodo, json=body, headers=headers)
+        return r.status_code, r.headers.get("Server-Timing", "")
+
+    def cerrar(self):
+        pass
+
+
+class ClienteGunicorn:
+    """Levanta `gunicorn app:app` con la misma base y le pega por HTTP."""
+
+    def __init__(self, db_uri, workers, puerto):
+        import requests
+
+        self.base = f"http://127.0.0.1:{puerto}"
+        self._local = threading.local()
+        self._requests = requests
+        env = dict(os.environ, DATABASE_URL=db_uri, RESERVAS_SCHEDULER="false", METRICAS_HABILITADAS="true")
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{puerto}", "app:app"],
+            cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            try:
+                if requests.get(self.base + "/categorias/", timeout=1).ok:
+                    return
+            except requests.RequestException:
+                time.sleep(0.2)
+        self.cerrar()
+        sys.exit("gunicorn no levantó en 30s")
+
+    def __call__(self, metodo, url, body, headers):
+        if not hasattr(self._local, "s"):
+            self._local.s = self._requests.Session()
+        r = self._local.s.request(metodo, self.base + url, json=body, headers=headers, timeout=30)
+        return r.status_code, r.headers.get("Server-Timing", "")
+
+    def cerrar(self):
+        self.proc.terminate()
+        self.proc.wait(timeout=10)
+
+
+# ------------------------
+# Medición
+# ------------------------
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)]
+
+
+def medir(cliente, generador, total, concurrencia, calentamiento, semilla):
+    # calentamiento: caches de respuestas e índices en memoria ya cargados
+    rnd = random.Random(semilla)
+    for _ in range(calentamiento):
+        cliente(*generador(rnd))
+
+    latencias, queries, errores = [], [], []
+    lock = threading.Lock()
+    pendientes = iter(range(total))
+
+    def trabajador(i):
+        rnd_t = random.Random(semilla * 1000 + i)
+        while True:
+            with lock:
+                if next(pendientes, None) is None:
+                    return
+            req = generador(rnd_t)
+            t = time.perf_counter()
+            status, server_timing = cliente(*req)
+            dur = time.perf_counter() - t
+            m = _QUERIES.search(server_timing)
+            with lock:
+                latencias.append(dur)
+                if m:
+                    queries.append(int(m.group(1)))
+                if status >= 400:
+                    errores.append(status)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=trabajador, args=(i,)) for i in range(concurrencia)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracion = time.perf_counter() - t0
+
+    latencias.sort()
+    return {
+        "n": len(latencias),
+        "errores": len(errores),
+        "p50_ms": round(_percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(_percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(_percentil(latencias, 99) * 1000, 2),
+        "rps": round(len(latencias) / duracion, 1) if duracion else 0.0,
+        "queries_media": round(sum(queries) / len(queries), 2) if queries else None,
+        "queries_max": max(queries) if queries else None,
+    }
+
+
+def _mediana(rondas):
+    """Mediana campo a campo de varias rondas (el ruido de una sola corrida es alto)."""
+    resultado = {}
+    for campo in rondas[0]:
+        valores = sorted(r[campo] for r in rondas if r[campo] is not None)
+        resultado[campo] = valores[len(valores) // 2] if valores else None
+    resultado["errores"] = sum(r["errores"] for r in rondas)
+    resultado["n"] = sum(r["n"] for r in rondas)
+    return resultado
+
+
+def comparar(resultados, baseline, tolerancia, margen_ms):
+    """Lista de (escenario, motivo) con lo que empeoró respecto del baseline."""
+    regresiones = []
+    for nombre, r in resultados.items():
+        b = baseline.get("escenarios", {}).get(nombre)
+        if b is None:
+            continue
+        # el margen absoluto evita falsos positivos en los hits de cache (< 1 ms)
+        if b["p95_ms"] and r["p95_ms"] > max(b["p95_ms"] * (1 + tolerancia), b["p95_ms"] + margen_ms):
+            regresiones.append((nombre, f"p95 {b['p95_ms']} -> {r['p95_ms']} ms"))
+        if b.get("queries_media") is not None and r["queries_media"] is not None \
+                and r["queries_media"] > b["queries_media"] + 0.5:
+            regresiones.append((nombre, f"queries/request {b['queries_media']} -> {r['queries_media']}"))
+        if r["errores"] > b.get("errores", 0):
+            regresiones.append((nombre, f"errores {b.get('errores', 0)} -> {r['errores']}"))
+    return regresiones
+
+
+def _imprimir(resultados, baseline):
+    print(f"{'escenario':32} {'n':>6} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'queries':>8}  vs baseline p95")
+    for nombre, r in resultados.items():
+        b = (baseline or {}).get("escenarios", {}).get(nombre)
+        delta = f"{(r['p95_ms'] / b['p95_ms'] - 1) * 100:+.0f}%" if b and b["p95_ms"] else "-"
+        q = "-" if r["queries_media"] is None else f"{r['queries_media']:g}"
+        print(
+            f"{nombre:32} {r['n']:>6} {r['errores']:>4} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+            f"{r['p99_ms']:>8.2f} {r['rps']:>8.1f} {q:>8}  {delta}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.getenv("BENCH_DATABASE_URL", DB_DEFAULT))
+    parser.add_argument("--sembrar", action="store_true", help="borra y siembra la base antes de medir")
+    parser.add_argument("--solo-sembrar", action="store_true")
+    parser.add_argument("--productos", type=int, default=5000)
+    parser.add_argument("--categorias", type=int, default=40)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--pedidos", type=int, default=3000)
+    parser.add_argument("--modo", choices=("inproceso", "gunicorn"), default="inproceso")
+    parser.add_argument("--workers", type=int, default=4, help="workers de gunicorn")
+    parser.add_argument("--puerto", type=int, default=8099)
+    parser.add_argument("--requests", type=int, default=300, help="requests medidos por escenario")
+    parser.add_argument("--concurrencia", type=int, help="threads cliente (default: 1 en proceso, 2 por worker en gunicorn)")
+    parser.add_argument("--rondas", type=int, default=3, help="se reporta la mediana de las rondas")
+    parser.add_argument("--calentamiento", type=int, default=20)
+    parser.add_argument("--escenario", action="append", help="solo estos (se puede repetir)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--baseline", default=BASELINE_DEFAULT)
+    parser.add_argument("--guardar-baseline", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="empeoramiento de p95 tolerado (0.25 = 25%%)")
+    parser.add_argument("--margen-ms", type=float, default=2.0, help="empeoramiento absoluto de p95 tolerado")
+    parser.add_argument("--salida", help="guardar los resultados en este JSON")
+    args = parser.parse_args()
+
+    # la app lee la config del entorno al importarse
+    os.environ["DATABASE_URL"] = args.db
+    os.environ["RESERVAS_SCHEDULER"] = "false"  # que no expire pedidos en medio de la medición
+    os.environ["METRICAS_HABILITADAS"] = "true"
+    os.environ["METRICAS_SERVER_TIMING"] = "true"
+    os.environ.setdefault("URL_BASE_IMG", "http://img.bench.local")
+    os.environ.setdefault("ADMIN_EMAIL", "admin@bench.local")
+    os.chdir(RAIZ)
+    from app import app
+
+    if args.sembrar or args.solo_sembrar:
+        sembrar(app, args.productos, args.categorias, args.usuarios, args.pedidos, args.semilla)
+        if args.solo_sembrar:
+            return
+
+    if args.concurrencia is None:
+        # en proceso los threads se pelean el GIL con la app: mide latencia, no concurrencia
+        args.concurrencia = 1 if args.modo == "inproceso" else 2 * args.workers
+
+    lista = escenarios(app, args.semilla)
+    if args.escenario:
+        lista = [(n, g) for n, g in lista if n in args.escenario]
+
+    if args.modo == "gunicorn":
+        cliente = ClienteGunicorn(args.db, args.workers, args.puerto)
+    else:
+        cliente = ClienteInproceso(app)
+
+    resultados = {}
+    try:
+        for nombre, generador in lista:
+            resultados[nombre] = _mediana([
+                medir(cliente, generador, args.requests, args.concurrencia, args.calentamiento, args.semilla + r)
+                for r in range(args.rondas)
+            ])
+    finally:
+        cliente.cerrar()
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.guardar_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    _imprimir(resultados, baseline)
+
+    documento = {
+        "meta": {
+            "fecha": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "maquina": platform.machine(),
+            "db": args.db.split(":", 1)[0],
+            "modo": args.modo,
+            "workers": args.workers if args.modo == "gunicorn" else None,
+            "requests": args.requests,
+            "concurrencia": args.concurrencia,
+            "rondas": args.rondas,
+        },
+        "escenarios": resultados,
+    }
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(documento, f, indent=2, ensure_ascii=False)
+    if args.guardar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(documento, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print("baseline guardado en", args.baseline)
+        return
+
+    if baseline is not None:
+        if baseline["meta"].get("modo") != args.modo or baseline["meta"].get("db") != documento["meta"]["db"]:
+            print("AVISO: el baseline es de otro modo/base, la comparación de latencias es orientativa")
+        regresiones = comparar(resultados, baseline, args.tolerancia, args.margen_ms)
+        for nombre, motivo in regresiones:
+            print(f"REGRESIÓN {nombre}: {motivo}")
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
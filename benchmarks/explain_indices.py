@@ -0,0 +1,200 @@
+"""
+Chequeo de planes: la query principal de cada endpoint caliente usa índice.
+
+Arma una base nueva con las migraciones (flask db upgrade, no create_all:
+se verifica el esquema que llega a producción), la siembra con
+benchmarks/carga_endpoints.py, pega a cada endpoint con el test client,
+captura el SQL que emite y le corre EXPLAIN a la query principal:
+
+- SQLite: EXPLAIN QUERY PLAN, alguna fila tiene que decir "USING ... INDEX <nombre>".
+- MySQL: EXPLAIN, la fila de la tabla tiene que tener key = <nombre> y type != ALL.
+
+    python benchmarks/explain_indices.py
+    python benchmarks/explain_indices.py --db "mysql+pymysql://root:@127.0.0.1:3306/ecommerce_explain?charset=utf8mb4"
+
+Sale con código 1 si algún plan no usa el índice esperado. La base de --db
+se borra entera: no apuntarlo a una base con datos. Corre también con los
+tests (tests/test_explain_indices.py).
+"""
+import argparse
+import os
+import re
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# el UNIQUE de favoritos en SQLite es un autoindex (las constraints no llevan nombre propio)
+FAVORITOS = ("uq_favoritos_usuario_producto", "sqlite_autoindex_favoritos_1")
+
+# (nombre, método, url, regex de la query principal, tabla, índices aceptados)
+CASOS = [
+    ("catálogo por vistas", "GET", "/productos/?sort=views&page=3",
+     r"FROM productos\b.*ORDER BY productos\.vistas DESC", "productos", ("ix_productos_activo_vistas",)),
+    ("catálogo por precio", "GET", "/productos/?sort=price_asc&page=3",
+     r"FROM productos\b.*ORDER BY productos\.precio ASC", "productos", ("ix_productos_activo_precio",)),
+    ("catálogo más nuevos", "GET", "/productos/?sort=newest&page=3",
+     r"FROM productos\b.*ORDER BY productos\.fecha_creacion DESC", "productos",
+     ("ix_productos_activo_fecha_creacion",)),
+    ("catálogo por categoría", "GET", "/productos/?categoria_ids=3&sort=views",
+     r"producto_categoria\.categoria_id IN", "producto_categoria", ("ix_producto_categoria_categoria",)),
+    ("primera imagen", "GET", "/productos/?sort=views&page=4",
+     r"min\(imagenes_productos\.id\)", "imagenes_productos", ("ix_imagenes_productos_producto",)),
+    ("pedidos del usuario", "GET", "/pedidos/",
+     r"FROM pedidos\s+WHERE pedidos\.usuario_id", "pedidos", ("ix_pedidos_usuario_id",)),
+    ("último pago", "GET", "/pedidos/",
+     r"max\(pagos\.fecha_creacion\)", "pagos", ("ix_pagos_pedido_fecha",)),
+    ("detalles de pedidos", "GET", "/pedidos/",
+     r"FROM pedido_detalle\b", "pedido_detalle", ("ix_pedido_detalle_pedido",)),
+    ("expirar reservas", "POST", "/pedidos/expirar",
+     r"pedidos\.expires_at <", "pedidos", ("ix_pedidos_estado_expires_at",)),
+    ("ids de favoritos", "GET", "/auth/me",
+     r"FROM favoritos\s+WHERE favoritos\.usuario_id", "favoritos", FAVORITOS),
+    ("productos favoritos", "GET", "/auth/mis-productos",
+     r"JOIN favoritos\b", "favoritos", FAVORITOS),
+]
+
+
+def recrear_esquema(app):
+    """Base vacía y `flask db upgrade` hasta head."""
+    from flask_migrate import upgrade
+    from database import db
+
+    with app.app_context():
+        url = db.engine.url
+        if url.get_backend_name() == "sqlite":
+            db.engine.dispose()
+            if url.database and url.database != ":memory:" and os.path.exists(url.database):
+                os.remove(url.database)
+        else:
+            db.drop_all()
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+        upgrade(directory=os.path.join(RAIZ, "migrations"))
+
+
+def sembrar_favoritos(app, usuario_id, cantidad=20):
+    from database import db
+    from models import Favorito
+
+    with app.app_context():
+        db.session.add_all(Favorito(usuario_id=usuario_id, producto_id=pid) for pid in range(1, cantidad + 1))
+        db.session.commit()
+
+
+def capturar(app, cliente, metodo, url, headers):
+    """[(statement, parámetros)] que emitió el request."""
+    from sqlalchemy import event
+    from database import db
+
+    capturadas = []
+
+    def escuchar(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            capturadas.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", escuchar)
+    try:
+        r = cliente.open(url, method=metodo, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", escuchar)
+    return r.status_code, capturadas
+
+
+def explicar(app, statement, parametros):
+    """Filas del plan: [(tabla, índice, detalle)]. En SQLite tabla/índice salen del texto."""
+    from database import db
+
+    with app.app_context():
+        with db.engine.connect() as conn:
+            if conn.dialect.name == "sqlite":
+                filas = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parametros).fetchall()
+                plan = []
+                for fila in filas:
+                    detalle = fila[-1]
+                    tabla = re.search(r"(?:SCAN|SEARCH) (\w+)", detalle)
+                    indice = re.search(r"USING (?:COVERING )?INDEX (\w+)", detalle)
+                    plan.append((tabla and tabla.group(1), indice and indice.group(1), detalle))
+                return plan
+            filas = conn.exec_driver_sql("EXPLAIN " + statement, parametros).mappings().fetchall()
+            return [
+                (f["table"], f["key"] if f["type"] != "ALL" else None, f"type={f['type']} key={f['key']}")
+                for f in filas
+            ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="sqlite:////tmp/loversplay_explain.db")
+    parser.add_argument("--productos", type=int, default=3000)
+    parser.add_argument("--pedidos", type=int, default=2000)
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("-v", "--verbose", action="store_true", help="mostrar el plan completo de cada caso")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.db
+    os.environ["RESERVAS_SCHEDULER"] = "false"
+    os.environ.setdefault("URL_BASE_IMG", "http://img.bench.local")
+    os.chdir(RAIZ)
+    from flask_jwt_extended import create_access_token
+    from app import app
+    from carga_endpoints import sembrar
+    from database import db
+    from models import Pedido
+
+    recrear_esquema(app)
+    sembrar(app, productos=args.productos, categorias=20, usuarios=args.usuarios, pedidos=args.pedidos,
+            recrear=False)
+    with app.app_context():
+        # el usuario con más pedidos: el caso interesante para /pedidos/
+        usuario_id = (
+            db.session.query(Pedido.usuario_id)
+            .group_by(Pedido.usuario_id)
+            .order_by(db.func.count().desc())
+            .limit(1)
+            .scalar()
+        )
+        tokens = {
+            "cliente": {"Authorization": "Bearer " + create_access_token(identity=str(usuario_id))},
+            "admin": {"Authorization": "Bearer " + create_access_token(identity="1")},
+        }
+    sembrar_favoritos(app, usuario_id)
+
+    cliente = app.test_client()
+    fallas = 0
+    print(f"{'caso':24} {'tabla':20} {'esperado':36} {'plan':8} resultado")
+    for nombre, metodo, url, patron, tabla, aceptados in CASOS:
+        headers = tokens["admin" if url == "/pedidos/expirar" else "cliente"]
+        status, capturadas = capturar(app, cliente, metodo, url, headers)
+        regex = re.compile(patron, re.S)
+        encontrada = next(((s, p) for s, p in capturadas if regex.search(s)), None)
+
+        if status >= 400 or encontrada is None:
+            fallas += 1
+            motivo = f"HTTP {status}" if status >= 400 else "no se encontró la query"
+            print(f"{nombre:24} {tabla:20} {aceptados[0]:36} {'-':8} FALLA ({motivo})")
+            continue
+
+        plan = explicar(app, *encontrada)
+        usados = {indice for t, indice, _ in plan if indice and (t is None or t == tabla)}
+        ok = bool(usados & set(aceptados))
+        fallas += not ok
+        usado = ", ".join(sorted(usados)) or "ninguno"
+        print(f"{nombre:24} {tabla:20} {aceptados[0]:36} {'ok' if ok else 'FALLA':8} {usado}")
+        if args.verbose or not ok:
+            for _, _, detalle in plan:
+                print(f"    {detalle}")
+
+    print()
+    if fallas:
+        print(f"{fallas} plan(es) sin el índice esperado")
+    else:
+        print(f"{len(CASOS)}/{len(CASOS)} planes con el índice esperado")
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
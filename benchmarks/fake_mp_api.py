@@ -0,0 +1,95 @@
+"""
+API de Mercado Pago falsa para probar el webhook y el worker en local.
+
+    python benchmarks/fake_mp_api.py --puerto 8090 --latencia 300
+    MP_API_URL=http://127.0.0.1:8090 flask mp procesar
+
+Pagos:
+    POST /_fake/payments   {"id": "123", "status": "approved", "external_reference": "7", ...}
+    GET  /v1/payments/<id> lo que se cargó (404 si no existe)
+    GET  /_fake/stats      cantidad de GET recibidos por pago
+
+--latencia simula un MP lento (ms por request). FALLAS[payment_id] = status
+hace que la consulta de ese pago responda ese error (desde los tests).
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGOS = {}
+CONSULTAS = {}
+FALLAS = {}
+_lock = threading.Lock()
+
+
+class FakeMP(BaseHTTPRequestHandler):
+    latencia = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latencia)
+        if self.path.startswith("/v1/payments/"):
+            pid = self.path.rsplit("/", 1)[-1]
+            with _lock:
+                CONSULTAS[pid] = CONSULTAS.get(pid, 0) + 1
+                pago = PAGOS.get(pid)
+                falla = FALLAS.get(pid)
+            if falla is not None:
+                return self._json(falla, {"message": "fake error", "status": falla})
+            if pago is None:
+                return self._json(404, {"message": "Payment not found", "status": 404})
+            return self._json(200, pago)
+        if self.path == "/_fake/stats":
+            with _lock:
+                return self._json(200, dict(CONSULTAS))
+        self._json(404, {"message": "not found"})
+
+    def do_POST(self):
+        if self.path != "/_fake/payments":
+            return self._json(404, {"message": "not found"})
+        largo = int(self.headers.get("Content-Length") or 0)
+        pago = json.loads(self.rfile.read(largo) or b"{}")
+        pago.setdefault("status_detail", "accredited")
+        pago.setdefault("transaction_amount", 0)
+        pago.setdefault("payment_method", {"id": "visa"})
+        pago.setdefault("payment_type_id", "credit_card")
+        pago.setdefault("order", {"id": None})
+        with _lock:
+            PAGOS[str(pago["id"])] = pago
+        self._json(201, pago)
+
+
+def servir(puerto, latencia_ms=0.0):
+    """Levanta la API en un thread (para usarla desde otro script). Devuelve el server."""
+    FakeMP.latencia = latencia_ms / 1000.0
+    server = ThreadingHTTPServer(("127.0.0.1", puerto), FakeMP)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puerto", type=int, default=8090)
+    parser.add_argument("--latencia", type=float, default=0.0, help="ms por request")
+    args = parser.parse_args()
+
+    FakeMP.latencia = args.latencia / 1000.0
+    print(f"fake MP en http://127.0.0.1:{args.puerto}")
+    ThreadingHTTPServer(("127.0.0.1", args.puerto), FakeMP).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
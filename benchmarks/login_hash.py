@@ -0,0 +1,220 @@
+"""
+Costo del hash de passwords y su efecto sobre el resto del tráfico.
+
+1) Logins/s por core para cada método/costo (check_password_hash en un thread).
+2) Ráfaga de logins contra la app servida con threads (werkzeug), midiendo
+   la latencia de un request de catálogo que no tiene nada que ver
+   (/productos/filtro) en tres situaciones: sin ráfaga, ráfaga con el hash
+   sin acotar (un thread de hash por request, como antes) y ráfaga con el
+   pool acotado de services/passwords.py.
+3) Con --gunicorn N: la misma ráfaga contra `gunicorn -w N` con workers
+   sync (un request por proceso, el semáforo por worker nunca se llena),
+   sin tope global (PASSWORD_HILOS_GLOBAL=0) y con el tope por máquina.
+
+    python benchmarks/login_hash.py
+    python benchmarks/login_hash.py --metodos scrypt:16384:8:1,scrypt:32768:8:1 --logins 32 --segundos 10
+    python benchmarks/login_hash.py --metodos scrypt:32768:8:1 --gunicorn 8
+
+Usa su propia base SQLite (--db) sembrada con benchmarks/carga_endpoints.py.
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+METODOS_DEFAULT = "pbkdf2:sha256:600000,scrypt:16384:8:1,scrypt:32768:8:1,scrypt:65536:8:1"
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)]
+
+
+def costo_por_metodo(metodos, repeticiones):
+    from werkzeug.security import check_password_hash, generate_password_hash
+
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'método':28} {'ms/verificación':>16} {'logins/s/core':>14}")
+    for metodo in metodos:
+        h = generate_password_hash("password-de-prueba", method=metodo)
+        t = time.perf_counter()
+        for _ in range(repeticiones):
+            check_password_hash(h, "password-de-prueba")
+        por_login = (time.perf_counter() - t) / repeticiones
+        print(f"{metodo:28} {por_login * 1000:>16.1f} {1 / por_login:>14.1f}")
+
+
+def rafaga(base, email, logins, segundos, sondas_por_segundo=20):
+    """Latencias del catálogo mientras `logins` threads se loguean sin parar."""
+    import requests
+
+    fin = time.monotonic() + segundos
+    ok, saturados = [0], [0]
+    lock = threading.Lock()
+
+    def logueador():
+        s = requests.Session()
+        while time.monotonic() < fin:
+            r = s.post(base + "/auth/login", json={"email": email, "password": "bench"}, timeout=60)
+            with lock:
+                if r.status_code == 200:
+                    ok[0] += 1
+                elif r.status_code == 503:
+                    saturados[0] += 1
+
+    hilos = [threading.Thread(target=logueador) for _ in range(logins)]
+    for h in hilos:
+        h.start()
+
+    latencias = []
+    s = requests.Session()
+    rnd = random.Random(1)
+    while time.monotonic() < fin:
+        t = time.perf_counter()
+        s.get(base + f"/productos/filtro?page={rnd.randint(1, 20)}", timeout=60)
+        latencias.append(time.perf_counter() - t)
+        time.sleep(1 / sondas_por_segundo)
+
+    for h in hilos:
+        h.join()
+    latencias.sort()
+    return {
+        "p50": _percentil(latencias, 50) * 1000,
+        "p95": _percentil(latencias, 95) * 1000,
+        "p99": _percentil(latencias, 99) * 1000,
+        "logins_s": ok[0] / segundos,
+        "saturados": saturados[0],
+    }
+
+
+@contextlib.contextmanager
+def gunicorn_sync(db, puerto, workers, env_extra):
+    """`gunicorn -w workers` (sync) sobre la misma base; devuelve la URL base."""
+    import requests
+
+    base = f"http://127.0.0.1:{puerto}"
+    env = dict(os.environ, DATABASE_URL=db, RESERVAS_SCHEDULER="false", **env_extra)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "sync", "-b", f"127.0.0.1:{puerto}", "app:app"],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        limite = time.monotonic() + 30
+        while True:
+            try:
+                if requests.get(base + "/categorias/", timeout=1).ok:
+                    break
+            except requests.RequestException:
+                pass
+            if time.monotonic() > limite:
+                sys.exit("gunicorn no levantó en 30s")
+            time.sleep(0.2)
+        yield base
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--metodos", default=METODOS_DEFAULT, help="separados por coma")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--db", default="sqlite:////tmp/loversplay_login.db")
+    parser.add_argument("--puerto", type=int, default=8097)
+    parser.add_argument("--logins", type=int, default=16, help="threads logueándose en la ráfaga")
+    parser.add_argument("--segundos", type=float, default=6)
+    parser.add_argument("--hilos", type=int, default=2, help="PASSWORD_HILOS del pool acotado")
+    parser.add_argument("--cola", type=int, default=8, help="PASSWORD_COLA_MAX del pool acotado")
+    parser.add_argument("--gunicorn", type=int, default=0, metavar="N",
+                        help="también contra gunicorn con N workers sync")
+    parser.add_argument("--hilos-global", type=int, default=2, help="PASSWORD_HILOS_GLOBAL con --gunicorn")
+    parser.add_argument("--cola-global", type=int, default=2, help="PASSWORD_COLA_GLOBAL con --gunicorn")
+    parser.add_argument("--solo-costo", action="store_true")
+    args = parser.parse_args()
+
+    metodos = [m.strip() for m in args.metodos.split(",") if m.strip()]
+    costo_por_metodo(metodos, args.repeticiones)
+    if args.solo_costo:
+        return
+
+    os.environ["DATABASE_URL"] = args.db
+    os.environ["RESERVAS_SCHEDULER"] = "false"
+    os.environ.setdefault("URL_BASE_IMG", "http://img.bench.local")
+    os.chdir(RAIZ)
+    from werkzeug.serving import make_server
+    from app import app
+    from carga_endpoints import sembrar
+    from database import db
+    from extension import passwords
+    from models import Usuario
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    sembrar(app, productos=2000, categorias=20, usuarios=50, pedidos=200)
+    servidor = make_server("127.0.0.1", args.puerto, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{args.puerto}"
+    email = "usuario2@bench.local"
+
+    print()
+    print(f"ráfaga: {args.logins} threads logueándose {args.segundos:g}s; latencia de /productos/filtro en ms")
+    print(f"{'método':20} {'escenario':22} {'p50':>8} {'p95':>8} {'p99':>8} {'logins/s':>9} {'503':>6}")
+    try:
+        for metodo in metodos:
+            with app.app_context():
+                u = Usuario.query.filter_by(email=email).first()
+                passwords.configurar(metodo=metodo)
+                u.password_hash = passwords.hashear("bench")
+                db.session.commit()
+
+            escenarios = [
+                ("sin ráfaga", None),
+                # un hilo de hash por request: lo que pasaba antes del pool
+                ("ráfaga sin acotar", (args.logins, args.logins)),
+                (f"ráfaga pool {args.hilos}+{args.cola}", (args.hilos, args.cola)),
+            ]
+            for nombre, pool in escenarios:
+                if pool is not None:
+                    # un solo proceso: el tope global se mide aparte, con --gunicorn
+                    passwords.configurar(hilos=pool[0], cola_max=pool[1], hilos_global=0)
+                # los "LOGIN SATURADO" del endpoint ensucian la tabla
+                with contextlib.redirect_stdout(io.StringIO()):
+                    r = rafaga(base, email, 0 if pool is None else args.logins, args.segundos)
+                print(
+                    f"{metodo:20} {nombre:22} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} "
+                    f"{r['logins_s']:>9.1f} {r['saturados']:>6}"
+                )
+
+            if not args.gunicorn:
+                continue
+            escenarios = [
+                (f"sync x{args.gunicorn} sin tope", {"PASSWORD_HILOS_GLOBAL": "0"}),
+                (f"sync x{args.gunicorn} tope {args.hilos_global}+{args.cola_global}", {
+                    "PASSWORD_HILOS_GLOBAL": str(args.hilos_global),
+                    "PASSWORD_COLA_GLOBAL": str(args.cola_global),
+                }),
+            ]
+            for nombre, env in escenarios:
+                env = dict(env, PASSWORD_METODO=metodo, PASSWORD_HILOS=str(args.hilos), PASSWORD_COLA_MAX=str(args.cola))
+                with gunicorn_sync(args.db, args.puerto + 1, args.gunicorn, env) as base_g:
+                    r = rafaga(base_g, email, args.logins, args.segundos)
+                print(
+                    f"{metodo:20} {nombre:22} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} "
+                    f"{r['logins_s']:>9.1f} {r['saturados']:>6}"
+                )
+    finally:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
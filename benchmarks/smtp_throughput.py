@@ -0,0 +1,122 @@
+"""
+Throughput de envío de emails contra un SMTP local de prueba.
+
+Compara el camino viejo (una sesión SMTP por email, `mail.send`) con
+`send_many` (una sola sesión para todo el lote).
+
+    python benchmarks/smtp_throughput.py --emails 200 --latencia-conexion 50
+
+--latencia-conexion simula el costo del handshake (TLS + login) del
+server real en milisegundos.
+"""
+import argparse
+import os
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _SMTPStub(socketserver.StreamRequestHandler):
+    """SMTP mínimo: acepta todo y cuenta mensajes (estilo aiosmtpd Sink)."""
+
+    latencia = 0.0
+    recibidos = 0
+    conexiones = 0
+    rechazados = set()  # destinatarios a los que responde 550 (para los tests)
+    _lock = threading.Lock()
+
+    def _w(self, linea):
+        self.wfile.write((linea + "\r\n").encode())
+
+    def handle(self):
+        with self._lock:
+            _SMTPStub.conexiones += 1
+        time.sleep(self.latencia)
+        self._w("220 stub ESMTP")
+        en_data = False
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            linea = linea.decode(errors="replace").rstrip("\r\n")
+            if en_data:
+                if linea == ".":
+                    en_data = False
+                    with self._lock:
+                        _SMTPStub.recibidos += 1
+                    self._w("250 OK")
+                continue
+            cmd = linea[:4].upper()
+            if cmd in ("EHLO", "HELO"):
+                self._w("250 stub")
+            elif cmd == "RCPT" and linea.split(":", 1)[-1].strip(" <>") in self.rechazados:
+                self._w("550 No such user")
+            elif cmd == "DATA":
+                en_data = True
+                self._w("354 End data with <CR><LF>.<CR><LF>")
+            elif cmd == "QUIT":
+                self._w("221 Bye")
+                return
+            else:
+                self._w("250 OK")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--puerto", type=int, default=2526)
+    parser.add_argument("--latencia-conexion", type=float, default=50.0, help="ms por conexión nueva")
+    args = parser.parse_args()
+
+    os.environ.update(
+        DB_TYPE="sqlite",
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=str(args.puerto),
+        MAIL_USE_TLS="false",
+        MAIL_USE_SSL="false",
+        MAIL_DEFAULT_SENDER="bench@localhost",
+    )
+    os.environ.pop("MAIL_USERNAME", None)
+    os.environ.pop("MAIL_PASSWORD", None)
+
+    _SMTPStub.latencia = args.latencia_conexion / 1000.0
+    server = _Server(("127.0.0.1", args.puerto), _SMTPStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    from app import app
+    from extension import mail
+    from services.email_service import build_message, send_many
+
+    with app.app_context():
+        mensajes = [
+            build_message(f"user{i}@localhost", f"Bench #{i}", "<p>hola</p>") for i in range(args.emails)
+        ]
+
+        resultados = []
+        for nombre, enviar in (
+            ("una sesión por email", lambda: [mail.send(m) for m in mensajes]),
+            ("send_many (sesión reutilizada)", lambda: send_many(mensajes)),
+        ):
+            _SMTPStub.recibidos = _SMTPStub.conexiones = 0
+            t0 = time.perf_counter()
+            enviar()
+            dt = time.perf_counter() - t0
+            resultados.append((nombre, _SMTPStub.recibidos, _SMTPStub.conexiones, dt))
+
+    server.shutdown()
+
+    print(f"{'modo':32} {'emails':>7} {'conex':>6} {'seg':>8} {'emails/s':>10}")
+    for nombre, recibidos, conexiones, dt in resultados:
+        print(f"{nombre:32} {recibidos:>7} {conexiones:>6} {dt:>8.3f} {recibidos / dt:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
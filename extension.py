@@ -1,3 +1,26 @@
 from flask_mail import Mail
+from services.cache import ResponseCache
+from services.vistas import VistasBuffer
+from services.sugeridos import SugeridosIndex
+from services.busqueda import BusquedaIndex, PrefijoIndex
+from services.cotizador import Cotizador
+from services.zonas import ZonasIndex
+from services.expirador import ExpiradorReservas
+from services.metricas import Metricas
+from services.identidad import Identidad
+from services.revocaciones import RevocacionTokens
+from services.passwords import Passwords
 
-mail = Mail()
\ No newline at end of file
+mail = Mail()
+cache = ResponseCache()
+vistas_buffer = VistasBuffer()
+sugeridos_index = SugeridosIndex()
+busqueda_index = BusquedaIndex()
+prefijo_index = PrefijoIndex()
+cotizador = Cotizador()
+zonas_index = ZonasIndex()
+expirador_reservas = ExpiradorReservas()
+metricas = Metricas()
+identidad = Identidad()
+revocaciones = RevocacionTokens()
+passwords = Passwords()
@@ -0,0 +1,35 @@
+"""texto_busqueda en productos + indice FULLTEXT
+
+Revision ID: 3f1c2a7d9b10
+Revises: 8e8e27a01502
+Create Date: 2026-10-18 10:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b10'
+down_revision = '8e8e27a01502'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('productos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('texto_busqueda', sa.Text(), nullable=True))
+
+    # FULLTEXT solo existe en MySQL; en SQLite se usa el índice en memoria
+    if op.get_bind().dialect.name == 'mysql':
+        op.create_index('ft_productos_texto_busqueda', 'productos', ['texto_busqueda'], mysql_prefix='FULLTEXT')
+
+    # después de migrar: flask productos reindexar-busqueda
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'mysql':
+        op.drop_index('ft_productos_texto_busqueda', table_name='productos')
+
+    with op.batch_alter_table('productos', schema=None) as batch_op:
+        batch_op.drop_column('texto_busqueda')
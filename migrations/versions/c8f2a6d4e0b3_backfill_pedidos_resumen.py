@@ -0,0 +1,114 @@
+"""backfill de pedidos_resumen
+
+Revision ID: c8f2a6d4e0b3
+Revises: b4c9e2f7a1d6
+Create Date: 2026-10-18 18:40:12.204417
+
+"""
+import json
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f2a6d4e0b3'
+down_revision = 'b4c9e2f7a1d6'
+branch_labels = None
+depends_on = None
+
+LOTE = 500
+
+# tablas tal como están en esta revisión (no los modelos: esos siguen a head)
+pedidos = sa.table(
+    'pedidos',
+    sa.column('id'), sa.column('usuario_id'), sa.column('fecha'), sa.column('estado'),
+    sa.column('total'), sa.column('costo_envio'),
+)
+usuarios = sa.table('usuarios', sa.column('id'), sa.column('email'))
+productos = sa.table('productos', sa.column('id'), sa.column('nombre'))
+pedido_detalle = sa.table(
+    'pedido_detalle',
+    sa.column('id'), sa.column('pedido_id'), sa.column('producto_id'), sa.column('cantidad'),
+    sa.column('subtotal', sa.Numeric(10, 2)),
+)
+pagos = sa.table('pagos', sa.column('id'), sa.column('pedido_id'), sa.column('estado'), sa.column('fecha_creacion'))
+pedidos_resumen = sa.table(
+    'pedidos_resumen',
+    sa.column('pedido_id'), sa.column('usuario_id'), sa.column('email'), sa.column('fecha'),
+    sa.column('estado'), sa.column('total'), sa.column('costo_envio'), sa.column('cantidad_items'),
+    sa.column('productos'), sa.column('detalles'), sa.column('estado_pago'), sa.column('actualizado'),
+)
+
+
+def upgrade():
+    # Recalcula pedidos_resumen entero (lo mismo que `flask pedidos reconstruir-resumen`,
+    # que sigue sirviendo para resincronizar a mano): sin esto el listado de admin
+    # queda vacío, o con emails/nombres viejos, hasta que alguien corra el CLI.
+    conn = op.get_bind()
+    ultimo_id = 0
+    while True:
+        filas = conn.execute(
+            sa.select(
+                pedidos.c.id, pedidos.c.usuario_id, pedidos.c.fecha, pedidos.c.estado,
+                pedidos.c.total, pedidos.c.costo_envio, usuarios.c.email,
+            )
+            .select_from(pedidos.outerjoin(usuarios, usuarios.c.id == pedidos.c.usuario_id))
+            .where(pedidos.c.id > ultimo_id)
+            .order_by(pedidos.c.id)
+            .limit(LOTE)
+        ).fetchall()
+        if not filas:
+            break
+        ids = [f.id for f in filas]
+
+        detalles = {}
+        for pedido_id, nombre, cantidad, subtotal in conn.execute(
+            sa.select(pedido_detalle.c.pedido_id, productos.c.nombre, pedido_detalle.c.cantidad, pedido_detalle.c.subtotal)
+            .select_from(pedido_detalle.outerjoin(productos, productos.c.id == pedido_detalle.c.producto_id))
+            .where(pedido_detalle.c.pedido_id.in_(ids))
+            .order_by(pedido_detalle.c.pedido_id, pedido_detalle.c.id)
+        ):
+            detalles.setdefault(pedido_id, []).append((nombre, cantidad, subtotal))
+
+        # último pago por fecha_creacion (empate: el último id)
+        estados_pago = {}
+        for pedido_id, estado in conn.execute(
+            sa.select(pagos.c.pedido_id, pagos.c.estado)
+            .where(pagos.c.pedido_id.in_(ids))
+            .order_by(pagos.c.pedido_id, pagos.c.fecha_creacion, pagos.c.id)
+        ):
+            estados_pago[pedido_id] = estado
+
+        ahora = datetime.utcnow()
+        conn.execute(pedidos_resumen.delete().where(pedidos_resumen.c.pedido_id.in_(ids)))
+        op.bulk_insert(pedidos_resumen, [
+            {
+                'pedido_id': f.id,
+                'usuario_id': f.usuario_id,
+                'email': f.email,
+                'fecha': f.fecha,
+                'estado': f.estado,
+                'total': f.total,
+                'costo_envio': f.costo_envio,
+                'cantidad_items': sum(int(c or 0) for _, c, _ in detalles.get(f.id, [])),
+                'productos': ", ".join(n or "" for n, _, _ in detalles.get(f.id, [])),
+                'detalles': json.dumps(
+                    [
+                        {"producto": n, "cantidad": c, "subtotal": str(s) if s is not None else None}
+                        for n, c, s in detalles.get(f.id, [])
+                    ],
+                    ensure_ascii=False,
+                ),
+                'estado_pago': estados_pago.get(f.id),
+                'actualizado': ahora,
+            }
+            for f in filas
+        ])
+        ultimo_id = ids[-1]
+
+
+def downgrade():
+    # solo datos: las filas se vuelven a calcular con la próxima escritura o con el CLI
+    pass
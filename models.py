@@ -1,6 +1,7 @@
 from datetime import datetime
 from database import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from services.passwords import hash_password
 
 class Usuario(db.Model):
     __tablename__ = "usuarios"
@@ -16,9 +17,9 @@ class Usuario(db.Model):
     resenas = db.relationship("Resena", backref="usuario", lazy=True, cascade="all, delete-orphan")
     direccion = db.relationship("Direccion",backref="usuario",uselist=False,cascade="all, delete-orphan")
     favoritos = db.relationship("Favorito", backref="usuario", lazy=True, cascade="all, delete-orphan")
-    # Guardar password en hash
+    # Guardar password en hash (costo: PASSWORD_METODO)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     # Verificar password
     def check_password(self, password):
@@ -45,10 +46,17 @@ class Favorito(db.Model):
     
     producto = db.relationship("Producto", backref="favoritos", lazy=True)
 
+    __table_args__ = (
+        # un favorito por usuario y producto; también sirve para leer los ids de un usuario
+        db.UniqueConstraint("usuario_id", "producto_id", name="uq_favoritos_usuario_producto"),
+    )
+
 producto_categoria = db.Table(
     "producto_categoria",
     db.Column("producto_id", db.Integer, db.ForeignKey("productos.id", ondelete="CASCADE"), primary_key=True),
     db.Column("categoria_id", db.Integer, db.ForeignKey("categorias.id", ondelete="CASCADE"), primary_key=True),
+    # filtro por categoría: la PK arranca por producto_id y no sirve
+    db.Index("ix_producto_categoria_categoria", "categoria_id"),
 )
 
 class Categoria(db.Model):
@@ -77,6 +85,10 @@ class Producto(db.Model):
     descripcion_larga = db.Column(db.Text) # Corresponde a 'description'
     stock = db.Column(db.Integer, default=0) # Mantenido, corresponde a 'stock'
     peso = db.Column(db.Numeric(10,2), default=0.4)  # en kg
+    # medidas del paquete de una unidad, en cm (null = medidas por defecto al cotizar)
+    alto_cm = db.Column(db.Numeric(10,2), nullable=True)
+    ancho_cm = db.Column(db.Numeric(10,2), nullable=True)
+    largo_cm = db.Column(db.Numeric(10,2), nullable=True)
     url_imagen_principal = db.Column(db.String(200)) # Podría usarse para la imagen principal de 'images'
     extra = db.Column(db.Text) #Medidas, Detalles importantes
     
@@ -85,18 +97,32 @@ class Producto(db.Model):
     
     vistas = db.Column(db.Integer, default=0) # Nuevo atributo para 'views'
     valoracion_promedio = db.Column(db.Numeric(10,2), default=0.0) # Nuevo atributo para 'rating'
+
+    # texto normalizado (nombre + categorías + descripción + extra) para FULLTEXT
+    texto_busqueda = db.Column(db.Text)
     
     categorias = db.relationship("Categoria", secondary=producto_categoria, back_populates="productos", lazy="selectin")
     imagenes = db.relationship("ImagenProducto", backref="producto", lazy=True, cascade="all, delete-orphan", passive_deletes=True,)
     resenas = db.relationship("Resena", backref="producto", lazy=True)
     detalles_pedido = db.relationship("PedidoDetalle", backref="producto", lazy=True)
 
+    __table_args__ = (
+        # listado de la tienda: activo + orden (el id desempata desde el propio índice)
+        db.Index("ix_productos_activo_vistas", "activo", "vistas"),
+        db.Index("ix_productos_activo_precio", "activo", "precio"),
+        db.Index("ix_productos_activo_fecha_creacion", "activo", "fecha_creacion"),
+    )
+
 class ImagenProducto(db.Model):
     __tablename__ = "imagenes_productos"
     id = db.Column(db.Integer, primary_key=True)
     producto_id = db.Column(db.Integer, db.ForeignKey("productos.id", ondelete="CASCADE"), nullable=False)
     url_imagen = db.Column(db.String(200), nullable=False)
 
+    __table_args__ = (
+        db.Index("ix_imagenes_productos_producto", "producto_id"),
+    )
+
 class Pedido(db.Model):
     __tablename__ = "pedidos"
     id = db.Column(db.Integer, primary_key=True)
@@ -119,6 +145,42 @@ class Pedido(db.Model):
 
     detalles = db.relationship("PedidoDetalle", backref="pedido", lazy=True, passive_deletes=True)
 
+    __table_args__ = (
+        # reservas vigentes por vencimiento (expirador de reservas)
+        db.Index("ix_pedidos_estado_expires_at", "estado", "expires_at"),
+        # pedidos del usuario logueado
+        db.Index("ix_pedidos_usuario_id", "usuario_id"),
+    )
+
+class PedidoResumen(db.Model):
+    """
+    Resumen desnormalizado de un pedido para el listado de admin: se mantiene
+    en cada escritura de pedidos/pagos (services/pedidos.refrescar_resumen) y
+    cuando cambia el email del cliente o el nombre de un producto.
+    """
+    __tablename__ = "pedidos_resumen"
+
+    pedido_id = db.Column(db.Integer, db.ForeignKey("pedidos.id", ondelete="CASCADE"), primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    email = db.Column(db.String(120), nullable=True)
+    fecha = db.Column(db.DateTime, nullable=True)
+    estado = db.Column(db.String(50), nullable=True)
+    total = db.Column(db.Numeric(10,2), default=0)
+    costo_envio = db.Column(db.Numeric(10,2), default=0)
+
+    cantidad_items = db.Column(db.Integer, default=0, nullable=False)
+    productos = db.Column(db.Text, nullable=True)   # nombres separados por ", "
+    detalles = db.Column(db.Text, nullable=True)    # JSON [{producto, cantidad, subtotal}]
+    estado_pago = db.Column(db.String(50), nullable=True)
+
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_pedidos_resumen_fecha", "fecha"),
+        db.Index("ix_pedidos_resumen_estado_fecha", "estado", "fecha"),
+        db.Index("ix_pedidos_resumen_usuario_fecha", "usuario_id", "fecha"),
+    )
+
 class PedidoDetalle(db.Model):
     __tablename__ = "pedido_detalle"
     id = db.Column(db.Integer, primary_key=True)
@@ -126,6 +188,10 @@ class PedidoDetalle(db.Model):
     producto_id = db.Column(db.Integer, db.ForeignKey("productos.id"), nullable=False)
     cantidad = db.Column(db.Integer, nullable=False)
     subtotal = db.Column(db.Numeric(10,2), nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_pedido_detalle_pedido", "pedido_id"),
+    )
     
 from datetime import datetime
 
@@ -163,6 +229,11 @@ class Pago(db.Model):
 
     pedido = db.relationship("Pedido", backref="pagos", lazy=True)
 
+    __table_args__ = (
+        # último pago de cada pedido (MAX(fecha_creacion) por pedido_id)
+        db.Index("ix_pagos_pedido_fecha", "pedido_id", "fecha_creacion"),
+    )
+
 class Resena(db.Model):
     __tablename__ = "resenas"
     id = db.Column(db.Integer, primary_key=True)
@@ -184,6 +255,10 @@ class ZonaEnvio(db.Model):
     precio = db.Column(db.Numeric(10,2), nullable=False)
 
     activa = db.Column(db.Boolean, default=True)
+
+    __table_args__ = (
+        db.Index("ix_zonas_envio_tipo_cp", "tipo_envio", "cp_inicio", "cp_fin"),
+    )
     
     def to_dict(self):
         return {
@@ -195,3 +270,75 @@ class ZonaEnvio(db.Model):
             "precio": self.precio,
             "activa": self.activa
         }
+
+class EmailOutbox(db.Model):
+    __tablename__ = "email_outbox"
+
+    id = db.Column(db.Integer, primary_key=True)
+    destinatario = db.Column(db.String(120), nullable=False)
+    asunto = db.Column(db.String(200), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    reply_to = db.Column(db.String(120), nullable=True)
+
+    # pendiente | enviado | fallido
+    estado = db.Column(db.String(20), default="pendiente", nullable=False)
+    intentos = db.Column(db.Integer, default=0, nullable=False)
+    proximo_intento = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    ultimo_error = db.Column(db.String(300), nullable=True)
+
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_envio = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_email_outbox_estado_proximo", "estado", "proximo_intento"),
+    )
+
+
+class MpNotificacion(db.Model):
+    """Notificación cruda del webhook de Mercado Pago, una fila por (payment_id, action)."""
+    __tablename__ = "mp_notificaciones"
+
+    id = db.Column(db.Integer, primary_key=True)
+    payment_id = db.Column(db.String(100), nullable=False)
+    action = db.Column(db.String(50), nullable=False, default="")
+    payload = db.Column(db.Text, nullable=True)
+
+    # pendiente | procesado | fallido
+    estado = db.Column(db.String(20), default="pendiente", nullable=False)
+    resultado = db.Column(db.String(50), nullable=True)  # ok, pago_not_found, ...
+    recibidas = db.Column(db.Integer, default=1, nullable=False)
+    intentos = db.Column(db.Integer, default=0, nullable=False)
+    proximo_intento = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    ultimo_error = db.Column(db.String(300), nullable=True)
+
+    fecha_recepcion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_proceso = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("payment_id", "action", name="uq_mp_notificacion_payment_action"),
+        db.Index("ix_mp_notificaciones_estado_proximo", "estado", "proximo_intento"),
+    )
+
+
+class LeaseTarea(db.Model):
+    """Lease para que una tarea de fondo corra en un solo worker (el dueño vigente)."""
+    __tablename__ = "leases_tareas"
+
+    nombre = db.Column(db.String(50), primary_key=True)
+    dueno = db.Column(db.String(100), nullable=False)
+    vence = db.Column(db.DateTime, nullable=False)
+
+
+class TokenRevocado(db.Model):
+    """JWT revocados (logout) por jti. Las filas sirven hasta que el token vence."""
+    __tablename__ = "tokens_revocados"
+
+    jti = db.Column(db.String(64), primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=True)
+    expira = db.Column(db.DateTime, nullable=False)
+    revocado_en = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_tokens_revocados_expira", "expira"),
+        db.Index("ix_tokens_revocados_revocado_en", "revocado_en"),
+    )
@@ -1,21 +1,20 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import (
     create_access_token, create_refresh_token,
-    jwt_required, get_jwt_identity
+    jwt_required, get_jwt_identity, get_jwt
 )
 from models import Usuario, Direccion, Favorito
 from database import db
 from services.notifications import send_user_welcome
+from services.identidad import require_admin, usuario_actual
+from extension import identidad, revocaciones, passwords
+from services.passwords import HashSaturado
+from services.pedidos import refrescar_resumen_de_usuario
+from services.favoritos import agregar_favorito, ids_favoritos, productos_favoritos
+from services.paginacion import CursorInvalido, modo_cursor, clave_filtros, paginar_cursor, total_cacheado
 
 auth_bp = Blueprint("auth", __name__,url_prefix="/auth")
 
-def require_admin():
-    user_id = get_jwt_identity()
-    user = Usuario.query.get(int(user_id))
-    if not user or user.rol != "admin":
-        return None
-    return user
-
 # -----------------------------------
 # REGISTER
 # -----------------------------------
@@ -40,9 +39,8 @@ def crear_usuario():
         usuario.set_password(data["password"])
 
         db.session.add(usuario)
+        send_user_welcome(usuario)  # se encola en la misma transacción
         db.session.commit()
-
-        send_user_welcome(usuario)
         
         return jsonify({"message": "Usuario creado con éxito"}), 201
     except Exception as e:
@@ -65,10 +63,18 @@ def login():
 
         user = Usuario.query.filter_by(email=email).first()
 
-        if not user or not user.check_password(password):
+        if not user or not passwords.verificar(user.password_hash, password):
             return jsonify({"error": "Credenciales inválidas"}), 401
 
-        access_token = create_access_token(identity=str(user.id))
+        # hash viejo (otro método o costo): se actualiza ahora que tenemos el password
+        if passwords.necesita_rehash(user.password_hash):
+            try:
+                user.password_hash = passwords.rehashear(password)
+                db.session.commit()
+            except HashSaturado:
+                pass  # queda para el próximo login
+
+        access_token = create_access_token(identity=str(user.id), additional_claims=identidad.claims(user))
         
         if isinstance(access_token, bytes):
             access_token = access_token.decode("utf-8")
@@ -78,19 +84,37 @@ def login():
             "id": user.id,
             "nombre": user.nombre
         }), 200
+    except HashSaturado as e:
+        db.session.rollback()
+        print("LOGIN SATURADO:", e)
+        return jsonify({"error": "Demasiados intentos, probá de nuevo en unos segundos"}), 503, {"Retry-After": "2"}
     except Exception as e:
         db.session.rollback()
         print("ERROR:", repr(e))
         return jsonify({"error": "Error interno"}), 500
     
+# -----------------------------------
+# LOGOUT
+# -----------------------------------
+@auth_bp.route("/logout", methods=["POST"])
+@jwt_required()
+def logout():
+    try:
+        claims = get_jwt()
+        revocaciones.revocar(claims["jti"], claims.get("exp"), int(get_jwt_identity()))
+        return jsonify({"message": "Sesión cerrada"}), 200
+    except Exception as e:
+        db.session.rollback()
+        print("ERROR:", repr(e))
+        return jsonify({"error": "Error interno"}), 500
+
 #Me
 @auth_bp.route("/me", methods=["GET"])
 @jwt_required()
 def obtener_usuario():
     try:
         
-        user_id = int(get_jwt_identity())
-        user = Usuario.query.get(user_id)
+        user = usuario_actual()
 
         if not user:
             return jsonify({"error": "Usuario no encontrado"}), 404
@@ -113,7 +137,7 @@ def obtener_usuario():
                 "pais": direccion.pais,
                 "extra": direccion.extra
             } if direccion else None,
-            "favoritos": [f.producto_id for f in user.favoritos]
+            "favoritos": ids_favoritos(user.id)
             
         }), 200
     except Exception as e:
@@ -126,8 +150,7 @@ def obtener_usuario():
 @jwt_required()
 def actualizar_usuario():
     try:  
-        user_id = int(get_jwt_identity())
-        user = Usuario.query.get(user_id)
+        user = usuario_actual()
 
         if not user:
             return jsonify({"error": "Usuario no encontrado"}), 404
@@ -144,6 +167,8 @@ def actualizar_usuario():
         if "email" in data:
             if Usuario.query.filter(Usuario.email == data["email"], Usuario.id != user.id).first():
                 return jsonify({"error": "Ese email ya está en uso por otro usuario"}), 400
+            if user.email != data["email"]:
+                refrescar_resumen_de_usuario(user.id, data["email"])
             user.email = data["email"]
 
         if "password" in data:
@@ -198,26 +223,28 @@ def protegido():
 @jwt_required()
 def agregarFavorito(id):
     try:
-        current = get_jwt_identity()  
-        user = Usuario.query.get(current)
+        acceso = identidad.acceso(get_jwt_identity())
 
-        if not user:
+        if not acceso:
             return jsonify({"error": "Usuario no encontrado"}), 404
         
-        favorito = Favorito(
-            usuario_id=user.id,
-            producto_id=id
-        )
-        db.session.add(favorito)
+        # repetir el POST no duplica: devuelve el favorito existente
+        favorito, nuevo = agregar_favorito(acceso.id, id)
+        if favorito is None:
+            db.session.rollback()
+            return jsonify({"error": "Producto no encontrado"}), 404
+
+        db.session.flush()
+        data = {
+            "id": favorito.id,
+            "usuario_id": favorito.usuario_id,
+            "producto_id": favorito.producto_id
+        }
         db.session.commit()
 
         return jsonify({
-            "message": "Producto agregado a favoritos",
-            "favorito": {
-                "id": favorito.id,
-                "usuario_id": favorito.usuario_id,
-                "producto_id": favorito.producto_id
-            }
+            "message": "Producto agregado a favoritos" if nuevo else "El producto ya estaba en favoritos",
+            "favorito": data
         }), 200
     except Exception as e:
         db.session.rollback()
@@ -228,26 +255,10 @@ def agregarFavorito(id):
 @jwt_required()
 def obtener_favoritos_completos():
     try:
-        user_id = get_jwt_identity()
-
-        favoritos = Favorito.query.filter_by(usuario_id=user_id).all()
-
-        productos = []
-        for f in favoritos:
-            p = f.producto  # ahora sí existe
-
-            productos.append({
-                "id": p.id,
-                "nombre": p.nombre,
-                "precio": p.precio,
-                "url_imagen_principal": p.url_imagen_principal,
-                "url_imagen_secundaria": p.imagenes[0].url_imagen if p.imagenes else None,
-                "stock": p.stock,
-                "vistas": p.vistas,
-                "valoracion_promedio": p.valoracion_promedio,
-            })
+        user_id = int(get_jwt_identity())
 
-        return jsonify(productos), 200
+        # productos + primera imagen secundaria en una sola query
+        return jsonify(productos_favoritos(user_id)), 200
     except Exception as e:
         db.session.rollback()
         print("ERROR:", repr(e))
@@ -298,16 +309,25 @@ def listar_usuarios():
             activo_bool = activo_param.lower() == "true"
             query = query.filter(Usuario.activo == activo_bool)
 
-        # Total con filtros aplicados
-        total = query.count()
-
-        usuarios = (
-            query
-            .order_by(Usuario.id.asc())
-            .limit(per_page)
-            .offset(offset_value)
-            .all()
-        )
+        if modo_cursor(request.args):
+            # keyset sobre id + total cacheado
+            total = total_cacheado(clave_filtros("usuarios", request.args), query)
+            usuarios, next_cursor = paginar_cursor(
+                query, Usuario.id, Usuario.id, False,
+                request.args.get("cursor"), per_page,
+                lambda u: (u.id, u.id),
+            )
+        else:
+            # Total con filtros aplicados
+            total = query.count()
+
+            usuarios = (
+                query
+                .order_by(Usuario.id.asc())
+                .limit(per_page)
+                .offset(offset_value)
+                .all()
+            )
 
         data = []
         for user in usuarios:
@@ -331,6 +351,14 @@ def listar_usuarios():
                 } if direccion else None
             })
 
+        if modo_cursor(request.args):
+            return jsonify({
+                "per_page": per_page,
+                "total": total,
+                "next_cursor": next_cursor,
+                "usuarios": data
+            }), 200
+
         return jsonify({
             "page": page,
             "per_page": per_page,
@@ -339,6 +367,8 @@ def listar_usuarios():
             "usuarios": data
         }), 200
 
+    except CursorInvalido as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -373,7 +403,7 @@ def obtener_usuario_admin(id):
                 "pais": direccion.pais,
                 "extra": direccion.extra
             } if direccion else None,
-            "favoritos": [f.producto_id for f in user.favoritos]
+            "favoritos": ids_favoritos(user.id)
             
         }), 200
     except Exception as e:
@@ -405,6 +435,8 @@ def actualizar_usuario_admin(id):
         if "email" in data:
             if Usuario.query.filter(Usuario.email == data["email"], Usuario.id != user.id).first():
                 return jsonify({"error": "Ese email ya está en uso por otro usuario"}), 400
+            if user.email != data["email"]:
+                refrescar_resumen_de_usuario(user.id, data["email"])
             user.email = data["email"]
 
         if "password" in data:
@@ -442,6 +474,7 @@ def actualizar_usuario_admin(id):
                 user.activo = False
         
         db.session.commit()
+        identidad.invalidar(id)
 
         return jsonify({"message": "Usuario actualizado con éxito"}), 200
     
@@ -463,6 +496,7 @@ def eliminar_usuario(id):
         user.activo = False
         db.session.add(user)
         db.session.commit()
+        identidad.invalidar(id)
         return jsonify({
             "msg":"Usuario eliminado correctamente"
         })    
@@ -4,6 +4,8 @@ from werkzeug.utils import secure_filename
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, Categoria, Producto
 from sqlalchemy import func, distinct
+from extension import cache
+from services.busqueda import actualizar_texto_busqueda
 
 categorias_bp = Blueprint("categorias", __name__, url_prefix="/categorias")
 
@@ -44,6 +46,7 @@ def crear_categoria():
                 categoria.url_imagen = f"/{filepath}"
 
         db.session.commit()
+        cache.bump()
         return jsonify({"id": categoria.id, "nombre": categoria.nombre, "url_imagen": categoria.url_imagen}), 201
     except Exception as e:
         db.session.rollback()
@@ -51,6 +54,7 @@ def crear_categoria():
         return jsonify({"error": "Error interno"}), 500
 
 @categorias_bp.route("/", methods=["GET"])
+@cache.cached("categorias")
 def listar_categorias():
     try:
         categorias = (
@@ -106,6 +110,7 @@ def actualizar_categoria(id):
     try:
         c = Categoria.query.get_or_404(id)
         nombre = request.form.get("nombre")
+        renombrada = bool(nombre) and nombre != c.nombre
         if nombre:
             c.nombre = nombre
             
@@ -121,7 +126,13 @@ def actualizar_categoria(id):
                 file.save(filepath)
                 c.url_imagen = f"/{filepath}"
 
+        # el nombre de la categoría es parte del texto de búsqueda de sus productos
+        if renombrada:
+            db.session.flush()
+            actualizar_texto_busqueda([p.id for p in c.productos])
+
         db.session.commit()
+        cache.bump()
         return jsonify({"msg": "Categoría actualizada", "id": c.id, "nombre": c.nombre, "url_imagen": c.url_imagen})
     except Exception as e:
         db.session.rollback()
@@ -146,8 +157,12 @@ def eliminar_categoria(id):
                 except Exception as e:
                     print(f"No se pudo eliminar la imagen: {e}")
         
+        producto_ids = [p.id for p in c.productos]
         db.session.delete(c)
+        db.session.flush()
+        actualizar_texto_busqueda(producto_ids)
         db.session.commit()
+        cache.bump()
         return jsonify({"msg": "Categoría eliminada"})
     except Exception as e:
         db.session.rollback()
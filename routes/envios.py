@@ -1,11 +1,17 @@
 from flask import Blueprint, request, jsonify
-from models import ZonaEnvio
+from models import ZonaEnvio, Producto
 from database import db
-import requests
+from flask_jwt_extended import jwt_required
+from extension import cache, cotizador, zonas_index
+from services.cotizador import CARRIER_POR_TIPO, CARRIER_DEFAULT, TIPO_POR_CARRIER, bulto_para_carrito
+from services.identidad import require_admin
+
+PESO_DEFAULT_KG = 0.4  # mismo default que Producto.peso
 
 envios_bp = Blueprint("zona_envios", __name__, url_prefix="/envios")
 
 @envios_bp.route("/", methods=["GET"])
+@cache.cached("zonas")
 def listar_zonas():
     try:
         zonas = ZonaEnvio.query.all()
@@ -43,6 +49,8 @@ def crear_zona():
 
         db.session.add(zona)
         db.session.commit()
+        cache.bump()
+        zonas_index.cargar()
 
         return jsonify({"message": "Zona creada", "zona": zona.to_dict()}), 201
     except Exception as e:
@@ -77,6 +85,8 @@ def actualizar_zona(zona_id):
             zona.activa = data.get("activa")
         
         db.session.commit()
+        cache.bump()
+        zonas_index.cargar()
 
         return jsonify({"message": "Zona actualizada", "zona": zona.to_dict()})
     except Exception as e:
@@ -93,6 +103,8 @@ def eliminar_zona(zona_id):
 
         db.session.delete(zona)
         db.session.commit()
+        cache.bump()
+        zonas_index.cargar()
 
         return jsonify({"message": "Zona eliminada"})
     except Exception as e:
@@ -100,8 +112,52 @@ def eliminar_zona(zona_id):
         print("ERROR:", repr(e))
         return jsonify({"error": "Error interno"}), 500
 
-ANDREANI_URL = "https://www.andreani.com/api/cotizador/prices"
-VIACARGO_URL = "https://ws.busplus.com.ar/alerce/cotizar"
+def _opcion_zona(zona):
+    return {
+        "source": "zona_envio",
+        "zona": zona["nombre"],
+        "tipo_envio": zona["tipo_envio"],
+        "precio": float(zona["precio"]),
+    }
+
+
+def _precio_orden(opcion):
+    precio = opcion["precio"]
+    return float(precio) if isinstance(precio, (int, float)) else float("inf")
+
+
+def _opciones(cotizaciones, zonas):
+    """
+    Opciones de un destino: cotizaciones online ({carrier: cot}) + zonas de
+    la DB ({tipo: zona}) para los tipos que no cotizaron. Ordenadas por precio.
+    """
+    opciones = [
+        dict(cot, tipo_envio=TIPO_POR_CARRIER[carrier]) for carrier, cot in cotizaciones.items()
+    ]
+    cubiertos = {o["tipo_envio"] for o in opciones}
+    for tipo, zona in zonas.items():
+        if tipo not in cubiertos:
+            opciones.append(_opcion_zona(zona))
+    opciones.sort(key=_precio_orden)
+    return opciones
+
+
+def _calcular_todos(cp, modo):
+    """
+    Cotiza todos los transportistas en paralelo (con deadline) y completa con
+    las zonas de la DB para los tipos que no respondieron o no cotizan online.
+    modo "todos" devuelve todas las opciones; "mejor", la más barata.
+    """
+    cotizaciones, errores = cotizador.cotizar_todos(cp)
+    opciones = _opciones(cotizaciones, zonas_index.buscar_todos(cp))
+
+    if not opciones:
+        return jsonify({"error": "No hay tarifas para este CP", "errores": errores}), 404
+
+    if modo == "mejor":
+        return jsonify(dict(opciones[0], errores=errores)), 200
+    return jsonify({"cp": cp, "opciones": opciones, "errores": errores}), 200
+
 
 @envios_bp.route("/calcular", methods=["POST"])
 def calcular_envio():
@@ -109,6 +165,12 @@ def calcular_envio():
         data = request.get_json() or {}
         cp = data.get("cp")
         tipo_envio = data.get("tipo_envio")
+        modo = data.get("modo")  # opcional: "todos" | "mejor"
+
+        if modo in ("todos", "mejor"):
+            if not cp:
+                return jsonify({"error": "cp es requerido"}), 400
+            return _calcular_todos(str(cp).strip(), modo)
 
         if not cp or not tipo_envio:
             return jsonify({"error": "cp y tipo_envio son requeridos"}), 400
@@ -117,134 +179,146 @@ def calcular_envio():
         tipo_envio_norm = str(tipo_envio).strip().lower()
 
         # -------------------------------------------------
-        # 1) Intento externo según tipo_envio
+        # 1) Cotización externa según tipo_envio (cacheada)
         # -------------------------------------------------
-        if tipo_envio_norm == "correo":
-            print("andreani")
-            # ===== Andreani (home) =====
-            try:
-                payload = {
-                    "codigoPostalOrigen": "5519",
-                    "codigoPostalDestino": cp,
-                    "tipoDeEnvioId": "9c16612c-a916-48cf-9fbb-dbad2b097e9e",
-                    "bultos": [
-                        {
-                            "itemId": "b1a076ac-5b7b-4b16-aec1-e0b90bae7c6c",
-                            "altoCm": "6",
-                            "anchoCm": "30",
-                            "largoCm": "50",
-                            "peso": "1000",
-                            "unidad": "grs",
-                            "valorDeclarado": "4500",
-                        }
-                    ],
-                }
-
-                res = requests.post(
-                    ANDREANI_URL,
-                    json=payload,
-                    headers={
-                        "Content-Type": "application/json",
-                        "User-Agent": "Mozilla/5.0",  # a veces evita bloqueos
-                    },
-                    timeout=7,
-                )
-                res.raise_for_status()
-
-                prices = res.json()
-                home_price = None
-                if isinstance(prices, list):
-                    home_price = next((p.get("price") for p in prices if p.get("type") == "home"), None)
-
-                if home_price is not None:
-                    return jsonify({
-                        "source": "andreani",
-                        "tipo_envio": tipo_envio,
-                        "precio": float(home_price),
-                    }), 200
-
-            except Exception as e:
-                print("Andreani failed, fallback ->", repr(e))
-
-        else:
-            # ===== ViaCargo =====
-            print("viacargo")
-            try:
-                payload = {
-                    "IdClienteRemitente": "00000511",
-                    "IdCentroRemitente": "02",
-                    "CodigoPostalRemitente": "5500",
-                    "CodigoPostalDestinatario": cp,
-                    "NumeroBultos": "1",
-                    "Kilos": "1",
-                    "Largo": "50",
-                    "Ancho": "30",
-                    "Alto": "6",
-                    "ImporteValorDeclarado": "50000",
-                }
-
-                res = requests.post(
-                    VIACARGO_URL,
-                    json=payload,
-                    headers={
-                        "Content-Type": "application/json",
-                        "User-Agent": "Mozilla/5.0",
-                    },
-                    timeout=10,
-                )
-
-                # ViaCargo a veces responde texto; validamos status y parseo
-                if not res.ok:
-                    raise RuntimeError(f"ViaCargo status={res.status_code} body={res.text[:300]}")
-
-                data_vc = res.json()  # si devuelve texto no-json, esto tira y cae al fallback
-                cot0 = (data_vc.get("Cotizacion") or [None])[0] or {}
-
-                precio = cot0.get("TOTAL")
-                descripcion = cot0.get("PRODUCTO_DESCRIPCION") or "Sin descripción"
-                tiempo_entrega = cot0.get("TIEMPO_ENTREGA")
-
-                if precio is not None:
-                    # TOTAL a veces puede venir string
-                    try:
-                        precio_num = float(str(precio).replace(",", "."))
-                    except:
-                        precio_num = precio
-
-                    return jsonify({
-                        "source": "viacargo",
-                        "tipo_envio": tipo_envio,
-                        "precio": precio_num,
-                        "descripcion": descripcion,
-                        "tiempo_entrega": tiempo_entrega,
-                    }), 200
-
-                raise RuntimeError("ViaCargo no devolvió TOTAL")
-
-            except Exception as e:
-                print("ViaCargo failed, fallback ->", repr(e))
+        carrier = CARRIER_POR_TIPO.get(tipo_envio_norm, CARRIER_DEFAULT)
+        try:
+            cotizacion = cotizador.cotizar(carrier, cp)
+            return jsonify(dict(cotizacion, tipo_envio=tipo_envio)), 200
+        except Exception as e:
+            print(f"{carrier} failed, fallback ->", repr(e))
 
         # -------------------------------------------------
         # 2) Fallback: lo que ya hacía tu endpoint (DB)
         # -------------------------------------------------
-        zona = ZonaEnvio.query.filter(
-            ZonaEnvio.cp_inicio <= cp,
-            ZonaEnvio.cp_fin >= cp,
-            ZonaEnvio.tipo_envio == tipo_envio,
-            ZonaEnvio.activa == True
-        ).first()
-
+        zona = zonas_index.buscar(cp, tipo_envio)
         if not zona:
             return jsonify({"error": "No hay tarifas para este CP y tipo de envío"}), 404
 
         return jsonify({
             "source": "zona_envio",
-            "zona": zona.nombre,
+            "zona": zona["nombre"],
             "tipo_envio": tipo_envio,
-            "precio": zona.precio
+            "precio": zona["precio"]
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        print("ERROR:", repr(e))
+        return jsonify({"error": "Error interno"}), 500
+
+
+# cada par destino x transportista puede ser una llamada saliente: pocos por request
+MAX_CPS_LOTE = 3
+MAX_PARES_LOTE = 6
+MAX_ITEMS_LOTE = 50
+
+
+@envios_bp.route("/cotizar-lote", methods=["POST"])
+@jwt_required(optional=True)
+def cotizar_lote():
+    """
+    Cotiza un carrito para uno o varios CPs en un solo request:
+    {"items": [{"producto_id", "cantidad"}], "cps": [...], "carriers": [opcional]}.
+    Peso y medidas salen de Producto (una query) y arman el bulto del
+    carrito; cada destino x transportista se cotiza en paralelo (cacheado)
+    y se completa con las zonas. Sin login, como /calcular (el checkout de
+    invitados lo usa): el fan-out lo acotan los topes de CPs y pares.
+    """
+    try:
+        data = request.get_json() or {}
+        items = data.get("items") or []
+        cps = data.get("cps") or ([data["cp"]] if data.get("cp") else [])
+        carriers = data.get("carriers") or list(cotizador.urls)
+
+        if not items or not cps:
+            return jsonify({"error": "items y cps son requeridos"}), 400
+        if not isinstance(items, list) or not isinstance(cps, list) or not isinstance(carriers, list):
+            return jsonify({"error": "items, cps y carriers tienen que ser listas"}), 400
+        if len(items) > MAX_ITEMS_LOTE:
+            return jsonify({"error": f"Máximo {MAX_ITEMS_LOTE} items por consulta"}), 400
+        cps = list(dict.fromkeys(str(cp).strip() for cp in cps))
+        carriers = list(dict.fromkeys(carriers))
+        if len(cps) > MAX_CPS_LOTE:
+            return jsonify({"error": f"Máximo {MAX_CPS_LOTE} CPs por consulta"}), 400
+        if len(cps) * len(carriers) > MAX_PARES_LOTE:
+            return jsonify({"error": f"Máximo {MAX_PARES_LOTE} combinaciones CP x transportista por consulta"}), 400
+        desconocidos = [c for c in carriers if c not in cotizador.urls]
+        if desconocidos:
+            return jsonify({"error": f"Transportista desconocido: {desconocidos[0]}"}), 400
+
+        # agrupar por producto (un mismo producto repetido se suma)
+        cantidades = {}
+        for item in items:
+            if not isinstance(item, dict):
+                return jsonify({"error": "Item inválido"}), 400
+            producto_id = item.get("producto_id")
+            cantidad = int(item.get("cantidad", 1))
+            if not producto_id or cantidad <= 0:
+                return jsonify({"error": "Item inválido"}), 400
+            producto_id = int(producto_id)
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+
+        filas = {
+            f.id: f for f in
+            db.session.query(Producto.id, Producto.peso, Producto.alto_cm, Producto.ancho_cm, Producto.largo_cm)
+            .filter(Producto.id.in_(list(cantidades)), Producto.activo.is_(True))
+            .all()
+        }
+        faltantes = [pid for pid in cantidades if pid not in filas]
+        if faltantes:
+            return jsonify({"error": f"Producto no encontrado: {faltantes[0]}"}), 404
+
+        unidades = [
+            (
+                filas[pid].peso if filas[pid].peso is not None else PESO_DEFAULT_KG,
+                filas[pid].alto_cm, filas[pid].ancho_cm, filas[pid].largo_cm,
+                cant,
+            )
+            for pid, cant in cantidades.items()
+        ]
+        peso_kg = sum(float(peso) * cant for peso, *_, cant in unidades)
+        bulto = bulto_para_carrito(unidades)
+
+        cotizaciones, errores = cotizador.cotizar_lote(
+            [(c, cp) for cp in cps for c in carriers], bulto
+        )
+        zonas = zonas_index.buscar_lote(cps)
+
+        destinos = {}
+        for cp in cps:
+            opciones = _opciones(
+                {c: cot for (c, cp_), cot in cotizaciones.items() if cp_ == cp},
+                zonas.get(cp) or {},
+            )
+            destinos[cp] = {
+                "opciones": opciones,
+                "mejor": opciones[0] if opciones else None,
+                "errores": {c: motivo for (c, cp_), motivo in errores.items() if cp_ == cp},
+            }
+
+        return jsonify({
+            "peso_kg": round(peso_kg, 3),
+            "bulto": bulto,
+            "destinos": destinos,
         }), 200
 
     except Exception as e:
         db.session.rollback()
         print("ERROR:", repr(e))
-        return jsonify({"error": "Error interno"}), 500
\ No newline at end of file
+        return jsonify({"error": "Error interno"}), 500
+
+
+@envios_bp.route("/solapamientos", methods=["GET"])
+@jwt_required()
+def zonas_solapadas():
+    """Pares de zonas activas del mismo tipo con rangos de CP que se pisan."""
+    if not require_admin():
+        return jsonify({"error": "Acceso denegado"}), 403
+    return jsonify(zonas_index.solapamientos())
+
+
+@envios_bp.route("/transportistas", methods=["GET"])
+def estado_transportistas():
+    """Estado del circuit breaker de cada transportista."""
+    return jsonify(cotizador.estado())
@@ -1,123 +1,46 @@
 from database import db
 import os
-import mercadopago
 from flask import Blueprint, request, jsonify
 from models import Pedido, Pago, Usuario, Producto
-from services.notifications import (
-    send_user_payment_approved,
-    send_user_payment_rejected,
-    send_admin_payment_approved,
-    send_user_transfer_instructions
-)
+from services.notifications import send_user_transfer_instructions
+from services.pagos_mp import sdk, registrar_notificacion
+from services.pedidos import refrescar_resumen
 
 pagos_bp = Blueprint("pagos", __name__, url_prefix="/pagos")
-sdk = mercadopago.SDK(str(os.getenv("MP_ACCESS_TOKEN")))
 
 @pagos_bp.route("/webhook", methods=["POST", "GET"])
 def webhook_mp():
-    try:
-        data = request.get_json(silent=True) or {}
-
-        # soporta payment.created / payment.updated y también "payment"
-        event_type = data.get("type")
-        action = data.get("action")
-
-        payment_id = None
-        if isinstance(data.get("data"), dict):
-            payment_id = data["data"].get("id")
+    """
+    Solo registra la notificación y responde 200 al toque: la consulta a MP,
+    el cambio de estado y los mails los hace el worker (flask mp procesar).
+    Así un MP lento no nos deja requests colgados ni dispara sus reintentos.
+    """
+    data = request.get_json(silent=True) or {}
 
-        # logs para ver qué llega
-        print("MP WEBHOOK:", {"action": action, "type": event_type, "payment_id": payment_id})
+    # soporta payment.created / payment.updated y también "payment"
+    event_type = data.get("type")
+    action = data.get("action")
 
-        if event_type != "payment" or not payment_id:
-            return jsonify({"status": "ignored"}), 200
+    payment_id = None
+    if isinstance(data.get("data"), dict):
+        payment_id = data["data"].get("id")
 
-        pago_info = sdk.payment().get(payment_id)
-        pago = (pago_info or {}).get("response") or {}
-        if not pago:
-            print("MP SDK sin response:", pago_info)
-            return jsonify({"status": "no_response"}), 200
+    # logs para ver qué llega
+    print("MP WEBHOOK:", {"action": action, "type": event_type, "payment_id": payment_id})
 
-        referencia = pago.get("external_reference")
-        if not referencia:
-            return jsonify({"status": "no_external_reference"}), 200
+    if event_type != "payment" or not payment_id:
+        return jsonify({"status": "ignored"}), 200
 
-        pago_reg = Pago.query.get(int(referencia))
-        if not pago_reg:
-            return jsonify({"status": "pago_not_found"}), 200
-
-        # idempotencia
-        if pago_reg.id_pago_mp == str(payment_id):
-            return jsonify({"status": "ok"}), 200
-
-        pedido = Pedido.query.get(pago_reg.pedido_id)
-        if not pedido:
-            return jsonify({"status": "pedido_not_found"}), 200
-        
-        previous_estado = pago_reg.estado #guardar para el mail
-        
-        estado = pago.get("status")
-        pago_reg.id_pago_mp = str(payment_id)
-        pago_reg.estado = estado
-        pago_reg.detalle_estado = pago.get("status_detail")
-        pago_reg.monto = pago.get("transaction_amount")
-        pago_reg.metodo_pago = (pago.get("payment_method") or {}).get("id")
-        pago_reg.tipo_pago = pago.get("payment_type_id")
-        pago_reg.id_orden_mercante = str((pago.get("order") or {}).get("id"))
-
-        if estado == "approved":
-            if pedido.estado == "EXPIRADO":
-                # pago aprobado pero pedido vencido → revisión manual
-                pedido.estado = "REVISAR"   # o "PAGO_TARDE"
-            else:
-                pedido.estado = "PAGADO"
-                pedido.stock_state = "confirmed"
-                pedido.expires_at = None
-
-        elif estado in ("pending", "in_process", "in_mediation"):
-            # Ojo: acá vos estabas usando "PENDIENTE" pero tu sistema usa "PENDIENTE_PAGO"
-            pedido.estado = "PENDIENTE_PAGO"
-
-        elif estado == "rejected":
-            pedido.estado = "RECHAZADO"
-        else:
-            pedido.estado = "PENDIENTE_PAGO"
-
-              
+    try:
+        nueva = registrar_notificacion(payment_id, action, data)
         db.session.commit()
-        
-        # ✅ Envío de mails solo si cambió el estado
-        if estado != previous_estado:
-            usuario = Usuario.query.get(pedido.usuario_id)
-
-            if estado == "approved":
-                # Usuario
-                if usuario and (pago_reg.ultimo_estado_notificado != "approved"):
-                    send_user_payment_approved(usuario, pedido, pago_reg)
-
-                # Admin
-                if usuario and not pago_reg.notificado_admin:
-                    send_admin_payment_approved(pedido, pago_reg, usuario)
-
-                pago_reg.ultimo_estado_notificado = "approved"
-                pago_reg.notificado_user = True
-                pago_reg.notificado_admin = True
-                db.session.commit()
-
-            elif estado == "rejected":
-                if usuario and (pago_reg.ultimo_estado_notificado != "rejected"):
-                    send_user_payment_rejected(usuario, pedido, pago_reg)
-
-                pago_reg.ultimo_estado_notificado = "rejected"
-                pago_reg.notificado_user = True
-                db.session.commit()
-                
-        return jsonify({"status": "ok"}), 200
-    
     except Exception as e:
-        # IMPORTANTÍSIMO: no tires 500 si querés evitar reintentos infinitos por algo que es tu bug
+        # no pudimos guardarla: que MP reintente
+        db.session.rollback()
         print("ERROR WEBHOOK:", repr(e))
-        return jsonify({"status": "error_logged"}), 200
+        return jsonify({"status": "error"}), 500
+
+    return jsonify({"status": "queued" if nueva else "duplicate"}), 200
 
 
 @pagos_bp.route("/preferencia", methods=["POST"])
@@ -152,7 +75,6 @@ def crear_preferencia_pago():
                 monto=pedido.total,
             )
             db.session.add(pago)
-            db.session.commit()
             
             instrucciones = {
                 "alias": "TU_ALIAS",
@@ -165,6 +87,10 @@ def crear_preferencia_pago():
             usuario = Usuario.query.get(pedido.usuario_id)
             if usuario:
                 send_user_transfer_instructions(usuario, pedido, pago, instrucciones)
+            refrescar_resumen([pedido.id])
+
+            # pago + mail (outbox) + resumen en la misma transacción
+            db.session.commit()
             return jsonify({
                 "mensaje": "Transferencia registrada",
                 "pedido_id": pedido_id,
@@ -235,6 +161,7 @@ def crear_preferencia_pago():
         )
 
         db.session.add(pago_mp)
+        refrescar_resumen([pedido.id])
         db.session.commit()
         
         # =====================================================
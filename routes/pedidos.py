@@ -1,23 +1,22 @@
+import click
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Pedido, PedidoDetalle, Producto, Usuario, Pago
+from models import Pedido, PedidoDetalle, PedidoResumen, Producto, Usuario, Pago
 from database import db
 from sqlalchemy import desc
 from services.notifications import send_admin_new_order, send_user_order_created
 from datetime import datetime, timedelta
-from sqlalchemy import update
+from sqlalchemy import update, case
 from decimal import Decimal
+from services.paginacion import CursorInvalido, modo_cursor, paginar_cursor, total_cacheado, clave_filtros
+from services.reservas import LOTE_EXPIRACION, expirar_vencidos
+from services.pedidos import ultimo_estado_pago_por_pedido, detalles_por_pedido, refrescar_resumen, resumen_a_dict
+from extension import cache, expirador_reservas
+from services.identidad import require_admin, usuario_actual
 from sqlalchemy import update
 
 pedidos_bp = Blueprint("pedidos", __name__,url_prefix="/pedidos")
 
-def require_admin():
-    user_id = get_jwt_identity()
-    user = Usuario.query.get(int(user_id))
-    if not user or user.rol != "admin":
-        return None
-    return user
-
 #1440 minutos = 24hs
 RESERVA_MINUTOS = 1440
 
@@ -34,6 +33,12 @@ def listar_pedidos():
             return jsonify({"error": "Usuario no autenticado"}), 401
         
         pedidos = Pedido.query.filter_by(usuario_id=usuario_id).all()
+
+        # pago más reciente y detalles de todos los pedidos: 1 query cada uno
+        ids = [p.id for p in pedidos]
+        estados_pago = ultimo_estado_pago_por_pedido(ids)
+        detalles = detalles_por_pedido(ids)
+
         return jsonify([
             {
                 "id": p.id,
@@ -41,25 +46,8 @@ def listar_pedidos():
                 "total": p.total,
                 "costo_envio": p.costo_envio,
                 "fecha": p.fecha.isoformat(),
-                "estado_pago": (
-                    (Pago.query
-                        .filter_by(pedido_id=p.id)
-                        .order_by(Pago.fecha_creacion.desc())
-                        .first()
-                    ).estado
-                    if (Pago.query
-                        .filter_by(pedido_id=p.id)
-                        .order_by(Pago.fecha_creacion.desc())
-                        .first()
-                    ) else None
-                ),
-                "detalles": [
-                    {
-                        "producto": i.producto.nombre,
-                        "cantidad": i.cantidad,
-                        "subtotal": i.subtotal
-                    } for i in p.detalles
-                ]
+                "estado_pago": estados_pago.get(p.id),
+                "detalles": detalles.get(p.id, [])
             } for p in pedidos
         ])
     except Exception as e:
@@ -85,13 +73,7 @@ def detalle_pedido(id):
             "costo_envio": pedido.costo_envio,
             "fecha": pedido.fecha.isoformat(),
             "estado_pago": pago.estado if pago else None,
-            "detalles": [
-                {
-                    "producto": i.producto.nombre,
-                    "cantidad": i.cantidad,
-                    "subtotal": i.subtotal
-                } for i in pedido.detalles
-            ]
+            "detalles": detalles_por_pedido([pedido.id]).get(pedido.id, [])
         })
     except Exception as e:
         db.session.rollback()
@@ -134,12 +116,11 @@ def crear_pedido():
             usuario_id = usuario.id
         else:
             usuario_id = int(usuario_id)
-            usuario = Usuario.query.get(usuario_id)
+            usuario = usuario_actual()
 
         # 2) reservar stock y armar detalles (todo en la misma transacción)
-        total = Decimal("0.00")
-        detalles_pedido = []
-
+        # 2.a) agrupar por producto (un mismo producto repetido se suma)
+        cantidades = {}
         for item in detalles:
             producto_id = item.get("producto_id")
             cantidad = int(item.get("cantidad", 1))
@@ -148,26 +129,49 @@ def crear_pedido():
                 db.session.rollback()
                 return jsonify({"error": "Detalle inválido"}), 400
 
-            # Traer producto (precio/nombre) - lectura
-            producto = Producto.query.get(producto_id)
+            producto_id = int(producto_id)
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+
+        # 2.b) traer todos los productos (precio/nombre) en una sola query
+        productos = {
+            p.id: p
+            for p in Producto.query.filter(Producto.id.in_(list(cantidades))).all()
+        }
+        for producto_id in cantidades:
+            producto = productos.get(producto_id)
             if not producto or not producto.activo:
                 db.session.rollback()
                 return jsonify({"error": f"Producto {producto_id} no encontrado"}), 404
 
-            # ✅ UPDATE ATÓMICO: descuenta solo si hay stock suficiente
-            stmt = (
-                update(Producto)
-                .where(Producto.id == producto_id, Producto.stock >= cantidad)
-                .values(stock=Producto.stock - cantidad)
+        # 2.c) ✅ UPDATE ATÓMICO EN BLOQUE: descuenta solo si TODOS tienen stock.
+        # Un solo statement bloquea las filas en orden de id (sin deadlocks entre pedidos)
+        delta = case(cantidades, value=Producto.id)
+        res = db.session.execute(
+            update(Producto)
+            .where(Producto.id.in_(list(cantidades)), Producto.stock >= delta)
+            .values(stock=Producto.stock - delta)
+            .execution_options(synchronize_session=False)
+        )
+
+        if res.rowcount != len(cantidades):
+            db.session.rollback()
+            stock_actual = dict(
+                db.session.query(Producto.id, Producto.stock)
+                .filter(Producto.id.in_(list(cantidades)))
+                .all()
+            )
+            sin_stock = next(
+                (pid for pid, cant in cantidades.items() if (stock_actual.get(pid) or 0) < cant),
+                next(iter(cantidades)),
             )
-            res = db.session.execute(stmt)
+            return jsonify({"error": f"Stock insuficiente para {productos[sin_stock].nombre}"}), 400
 
-            if res.rowcount == 0:
-                db.session.rollback()
-                return jsonify({"error": f"Stock insuficiente para {producto.nombre}"}), 400
+        total = Decimal("0.00")
+        detalles_pedido = []
 
+        for producto_id, cantidad in cantidades.items():
             # subtotal usando Decimal (evita errores float)
-            unit_price = Decimal(str(producto.precio))
+            unit_price = Decimal(str(productos[producto_id].precio))
             subtotal = (unit_price * Decimal(cantidad)).quantize(Decimal("0.01"))
             total += subtotal
 
@@ -193,15 +197,20 @@ def crear_pedido():
         )
 
         db.session.add(pedido)
+        db.session.flush()  # id del pedido para los mails
 
-        # ✅ un solo commit al final: usuario guest + stock + pedido + detalles
-        db.session.commit()
-
-        # mails
+        # mails (outbox: se guardan con el mismo commit)
         if usuario and usuario.email:
             send_user_order_created(usuario, pedido)
         send_admin_new_order(pedido, usuario)
 
+        refrescar_resumen([pedido.id])
+
+        # ✅ un solo commit al final: usuario guest + stock + pedido + detalles + mails + resumen
+        db.session.commit()
+        cache.bump_stock()
+        expirador_reservas.agendar(pedido.id, pedido.expires_at)
+
         return jsonify({
             "pedido_id": pedido.id,
             "total": float(total_final),
@@ -230,39 +239,45 @@ def listar_todos_pedidos():
         
         offset_value = (page - 1) * per_page
 
-        pedidos = (
-            Pedido.query
-            .order_by(desc(Pedido.fecha))
-            .limit(per_page)
-            .offset(offset_value)
-            .all()
-        )
-        total = Pedido.query.count()
+        # todo sale de pedidos_resumen: una lectura por índice (fecha),
+        # (estado, fecha) o (usuario_id, fecha) según el filtro
+        query = PedidoResumen.query
+        estado = request.args.get("estado")
+        if estado:
+            query = query.filter(PedidoResumen.estado == estado)
+        usuario_id = request.args.get("usuario_id", type=int)
+        if usuario_id:
+            query = query.filter(PedidoResumen.usuario_id == usuario_id)
+
+        if modo_cursor(request.args):
+            # keyset sobre (fecha, id) + total cacheado
+            total = total_cacheado(clave_filtros("pedidos", request.args), query)
+            resumenes, next_cursor = paginar_cursor(
+                query, PedidoResumen.fecha, PedidoResumen.pedido_id, True,
+                request.args.get("cursor"), per_page,
+                lambda r: (r.fecha, r.pedido_id),
+            )
+            paginado = {"per_page": per_page, "total": total, "next_cursor": next_cursor}
+        else:
+            resumenes = (
+                query
+                .order_by(desc(PedidoResumen.fecha), desc(PedidoResumen.pedido_id))
+                .limit(per_page)
+                .offset(offset_value)
+                .all()
+            )
+            total = query.order_by(None).count()
+            paginado = {"page": page, "per_page": per_page, "total": total}
         
         return jsonify(
             {
-                "page": page,
-                "per_page": per_page,
-                "total": total,
-                "pedidos": [
-                    {
-                        "id": p.id,
-                        "estado": p.estado,
-                        "total": p.total,
-                        "costo_envio": p.costo_envio,
-                        "fecha": p.fecha.isoformat(),
-                        "detalles": [
-                            {
-                                "producto": i.producto.nombre,
-                                "cantidad": i.cantidad,
-                                "subtotal": i.subtotal
-                            } for i in p.detalles
-                            ]
-                    }for p in pedidos
-                ]
+                **paginado,
+                "pedidos": [resumen_a_dict(r) for r in resumenes]
             } 
                 
         )
+    except CursorInvalido as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -281,6 +296,7 @@ def actualizar_pedido(id):
         if "estado" in data:
             pedido.estado = data["estado"]
 
+        refrescar_resumen([pedido.id])
         db.session.commit()
         return jsonify({"message": "Pedido actualizado", "estado": pedido.estado})
     except Exception as e:
@@ -301,6 +317,7 @@ def eliminar_pedido(id):
         if not pedido:
             return jsonify({"error": "Pedido no encontrado"}), 404
         db.session.delete(pedido)
+        PedidoResumen.query.filter_by(pedido_id=id).delete()
         db.session.commit()
         return jsonify({"message": "Pedido eliminado"}), 204
     except Exception as e:
@@ -315,41 +332,12 @@ def expirar_pedidos():
     try:
         now = datetime.utcnow()
 
-        expirables = (
-            Pedido.query
-            .filter(Pedido.estado == "PENDIENTE_PAGO")
-            .filter(Pedido.expires_at.isnot(None))
-            .filter(Pedido.expires_at < now)
-            .all()
-        )
-
-        expired_ids = []
-        released_stock_for = []
-
-        for pedido in expirables:
-            # idempotencia: si ya liberaste stock, no repetir
-            if pedido.stock_state != "reserved":
-                pedido.estado = "EXPIRADO"
-                expired_ids.append(pedido.id)
-                continue
-
-            # devolver stock según detalles
-            for d in pedido.detalles:
-                prod = Producto.query.get(d.producto_id)
-                if prod:
-                    prod.stock += int(d.cantidad)
-
-            pedido.stock_state = "released"
-            pedido.estado = "EXPIRADO"
-
-            expired_ids.append(pedido.id)
-            released_stock_for.append(pedido.id)
-
-        db.session.commit()
+        # de a LOTE_EXPIRACION pedidos por transacción (ver services/reservas.py)
+        expired_ids, released_stock_for = expirar_vencidos(now)
 
         return jsonify({
             "now_utc": now.isoformat(),
-            "found": len(expirables),
+            "found": len(expired_ids),
             "expired": len(expired_ids),
             "released_stock_for": released_stock_for,
             "expired_ids": expired_ids
@@ -358,5 +346,31 @@ def expirar_pedidos():
         db.session.rollback()
         print("ERROR:", repr(e))
         return jsonify({"error": "Error interno"}), 500
-    
-    
\ No newline at end of file
+
+
+@pedidos_bp.cli.command("expirar-reservas")
+@click.option("--lote", default=LOTE_EXPIRACION, show_default=True, help="Pedidos por transacción.")
+def expirar_reservas_cli(lote):
+    """Expira los pedidos PENDIENTE_PAGO vencidos y devuelve su stock (para cron)."""
+    expired_ids, released = expirar_vencidos(limite=lote)
+    print(f"{len(expired_ids)} pedidos expirados, stock devuelto de {len(released)}")
+
+
+@pedidos_bp.cli.command("reconstruir-resumen")
+@click.option("--lote", default=500, show_default=True, help="Pedidos por transacción.")
+def reconstruir_resumen_cli(lote):
+    """Recalcula pedidos_resumen para todos los pedidos (resincronizar a mano; la migración ya lo carga)."""
+    ultimo_id, total = 0, 0
+    while True:
+        ids = [
+            pid for (pid,) in db.session.query(Pedido.id)
+            .filter(Pedido.id > ultimo_id)
+            .order_by(Pedido.id)
+            .limit(lote)
+        ]
+        if not ids:
+            break
+        refrescar_resumen(ids)
+        db.session.commit()
+        ultimo_id, total = ids[-1], total + len(ids)
+    print(f"{total} pedidos resumidos")
@@ -1,10 +1,19 @@
 import os
-from flask import Blueprint, json, request, jsonify
-from models import ImagenProducto, Producto, Usuario, Categoria, Pedido, PedidoDetalle
+from flask import Blueprint, json, request, jsonify, make_response
+from models import ImagenProducto, Producto, Usuario, Categoria, Pedido, PedidoDetalle, producto_categoria
 from werkzeug.utils import secure_filename
 from database import db
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import desc, asc, func, or_
+from sqlalchemy import desc, asc, func, or_, type_coerce, Float
+from sqlalchemy.orm import lazyload
+from services.catalogo import primera_imagen_por_producto, categoria_ids_por_producto, fix_encoding
+from extension import cache, vistas_buffer, sugeridos_index, busqueda_index, prefijo_index
+from services.busqueda import buscar, actualizar_texto_busqueda
+from services.pedidos import refrescar_resumen_de_producto
+from services.identidad import require_admin
+from services.paginacion import (
+    CursorInvalido, modo_cursor, clave_filtros, aplicar_orden, paginar_cursor, total_cacheado
+)
 
 productos_bp = Blueprint("productos", __name__, url_prefix="/productos")
 
@@ -17,31 +26,6 @@ def allowed_file(filename):
 def nombreArchivoFinal(filename, nombre, id, indice):
     return str(id) + "_" + nombre + "_" + str(indice) + "." + filename.rsplit('.', 1)[1].lower()
 
-def fix_encoding(texto: str) -> str:
-    if not texto:
-        return texto
-    reemplazos = {
-        "├¡": "í", "├í": "í", "Ã­": "í",
-        "├®": "é", "Ã©": "é",
-        "├│": "ó", "Ã³": "ó",
-        "├║": "ú", "Ãº": "ú",
-        "Ã¡": "á", "├í": "á",
-        "Ã±": "ñ",
-        "┬á": " ",
-        "┬": "",
-        "├▒": "ñ"
-    }
-    for roto, bien in reemplazos.items():
-        texto = texto.replace(roto, bien)
-    return texto
-
-def require_admin():
-    user_id = get_jwt_identity()
-    user = Usuario.query.get(int(user_id))
-    if not user or user.rol != "admin":
-        return None
-    return user
-
 #------------------
 #------USER--------
 #------------------
@@ -49,6 +33,7 @@ def require_admin():
 #REVISAR-----v
 
 @productos_bp.route("/", methods=["GET"])
+@cache.cached("productos", stock=True)
 def listar_productos():
     try:
         preUrl = os.getenv("URL_BASE_IMG")
@@ -76,11 +61,12 @@ def listar_productos():
         if categorias_param:
             categoria_ids = [int(c) for c in categorias_param.split(",") if c.isdigit()]
             if categoria_ids:
-                query = (
-                    query
-                    .join(Producto.categorias)
-                    .filter(Categoria.id.in_(categoria_ids))
-                    .distinct()
+                # subquery sobre la pivote en vez de JOIN + DISTINCT
+                query = query.filter(
+                    Producto.id.in_(
+                        db.select(producto_categoria.c.producto_id)
+                        .where(producto_categoria.c.categoria_id.in_(categoria_ids))
+                    )
                 )
 
         # ------------------------
@@ -99,36 +85,69 @@ def listar_productos():
             min_price = 0
             max_price = 100000
 
-        query = query.filter(Producto.precio.between(min_price, max_price))
+        # El rango filtra siempre: sin max_price igual quedan afuera los
+        # productos de más de 100000.
+        #
+        # `precio + 0` NO es un error: con el rango por defecto (nadie filtró
+        # por precio) la condición es la misma, pero escrita como expresión
+        # el motor no la puede resolver con ix_productos_activo_precio. Con
+        # la columna sola, MySQL/SQLite ven un rango sobre (activo, precio),
+        # eligen ese índice aunque el orden sea por vistas o por fecha y
+        # terminan ordenando todo el catálogo aparte (filesort / "USE TEMP
+        # B-TREE FOR ORDER BY") en vez de recorrer ix_productos_activo_vistas
+        # o ix_productos_activo_fecha_creacion ya ordenados.
+        # Si el cliente sí manda un rango, es selectivo y ahí conviene el
+        # índice de precio: va sobre la columna.
+        # Lo cubre tests/test_explain_indices.py.
+        if min_price > 0 or max_price < 100000:
+            query = query.filter(Producto.precio.between(min_price, max_price))
+        else:
+            query = query.filter((Producto.precio + 0).between(min_price, max_price))
 
         # ------------------------
         # Orden
         # ------------------------
-        if sort == "price_asc":
-            query = query.order_by(Producto.precio.asc())
-        elif sort == "price_desc":
-            query = query.order_by(Producto.precio.desc())
-        elif sort == "rating":
-            query = query.order_by(desc(Producto.valoracion_promedio))
-        elif sort == "newest":
-            query = query.order_by(
-                desc(Producto.fecha_creacion),
-                desc(Producto.id)
-            )
-        else:
-            query = query.order_by(desc(Producto.vistas))
+        # (columna, descendente); el id desempata
+        ordenes = {
+            "price_asc": (Producto.precio, False),
+            "price_desc": (Producto.precio, True),
+            "rating": (Producto.valoracion_promedio, True),
+            "newest": (Producto.fecha_creacion, True),
+        }
+        columna_orden, descendente = ordenes.get(sort, (Producto.vistas, True))
+
+        # categorías e imágenes se cargan abajo en bloque (evita N+1)
+        query = query.options(lazyload(Producto.categorias), lazyload(Producto.imagenes))
 
         # ------------------------
         # Paginado
         # ------------------------
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        productos = pagination.items
+        if modo_cursor(request.args):
+            # keyset: sin OFFSET y con total cacheado
+            total = total_cacheado(clave_filtros("productos", request.args), query)
+            productos, next_cursor = paginar_cursor(
+                query, columna_orden, Producto.id, descendente,
+                request.args.get("cursor"), per_page,
+                lambda p: (getattr(p, columna_orden.key), p.id),
+            )
+            paginado = {"per_page": per_page, "total": total, "next_cursor": next_cursor}
+        else:
+            query = aplicar_orden(query, columna_orden, Producto.id, descendente)
+            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+            productos = pagination.items
+            paginado = {
+                "page": page,
+                "per_page": per_page,
+                "total": pagination.total,
+                "pages": pagination.pages,
+            }
+
+        ids = [p.id for p in productos]
+        imagenes_map = primera_imagen_por_producto(ids)
+        categorias_map = categoria_ids_por_producto(ids)
 
         return jsonify({
-            "page": page,
-            "per_page": per_page,
-            "total": pagination.total,
-            "pages": pagination.pages,
+            **paginado,
 
             # ✅ volvemos a lo que el front espera
             "productos": [
@@ -138,11 +157,11 @@ def listar_productos():
                     "precio": float(p.precio) if p.precio is not None else 0,
                     "extra": p.extra,
                     "url_imagen_principal": (preUrl + p.url_imagen_principal) if p.url_imagen_principal else None,
-                    "url_imagen_secundaria": (preUrl + p.imagenes[0].url_imagen) if p.imagenes else None,
+                    "url_imagen_secundaria": (preUrl + imagenes_map[p.id]) if p.id in imagenes_map else None,
                     "stock": p.stock,
                     "vistas": p.vistas,
                     "valoracion_promedio": float(p.valoracion_promedio) if p.valoracion_promedio is not None else 0,
-                    "categoria_ids": [c.id for c in (p.categorias or [])],
+                    "categoria_ids": categorias_map.get(p.id, []),
                 }
                 for p in productos
             ],
@@ -157,6 +176,9 @@ def listar_productos():
             # }
         }), 200
 
+    except CursorInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
     except Exception as e:
         return jsonify({"msg": "Error interno", "error": str(e)}), 500
 
@@ -166,22 +188,44 @@ def listar_nombres_productos():
         productos = (
             Producto.query
             .filter(Producto.activo == True)
-            .with_entities(Producto.id, Producto.nombre, Producto.categoria_id, Producto.url_imagen_principal)
+            .with_entities(Producto.id, Producto.nombre, Producto.url_imagen_principal)
             .all()
         )
+        # Producto ya no tiene categoria_id: se informa la primera categoría (N:N)
+        categorias_map = categoria_ids_por_producto([p.id for p in productos])
         return jsonify([
             {
                 "id": p.id,
                 "nombre": fix_encoding(p.nombre),
-                "categoria_id": p.categoria_id,
+                "categoria_id": (categorias_map.get(p.id) or [None])[0],
                 "url_imagen_principal": p.url_imagen_principal
             } for p in productos
         ])
     except Exception as e:
         return jsonify({"msg": "Error al listar nombres de productos", "error": str(e)}), 500
 
+@productos_bp.route("/sugerir", methods=["GET"])
+def sugerir_productos():
+    try:
+        q = request.args.get("q", "")
+        # un k que no es entero (?k=abc) usa el default en vez de dar 500
+        k = min(max(request.args.get("k", 8, type=int), 1), 20)
+        return jsonify(prefijo_index.sugerir(q, k)), 200
+    except Exception as e:
+        return jsonify({"msg": "Error al sugerir productos", "error": str(e)}), 500
+
 @productos_bp.route("/<int:id>", methods=["GET"])
 def detalle_producto(id):
+    respuesta = make_response(_detalle_producto(id))
+    # sumar vista (fuera del cache: se cuenta también en los HIT), solo de
+    # productos que existen: un id cualquiera no engorda el buffer.
+    # Se acumula en memoria y se escribe en lote (services/vistas.py)
+    if respuesta.status_code == 200:
+        vistas_buffer.sumar(id)
+    return respuesta
+
+@cache.cached("producto", stock=True)
+def _detalle_producto(id):
     try:
         urlImg = os.getenv("URL_BASE_IMG")
         
@@ -190,40 +234,19 @@ def detalle_producto(id):
         if not p or not p.activo:
             return jsonify({"msg": "Producto no encontrado"}), 404
 
-        # sumar vista
-        p.vistas = (p.vistas or 0) + 1
-        db.session.commit()
-
-        cat_ids = [c.id for c in (p.categorias or [])]
-
-        sugeridos = []
-        if cat_ids:
-            sugeridos = (
-                Producto.query
-                .join(Producto.categorias)  # requiere relationship bien definido
-                .filter(
-                    Categoria.id.in_(cat_ids),
-                    Producto.id != p.id,
-                    Producto.activo.is_(True)
-                )
-                .distinct()
-                .order_by(Producto.vistas.desc(), Producto.valoracion_promedio.desc())
-                .limit(8)
-                .all()
-            )
+        # sugeridos precalculados (services/sugeridos.py) + imágenes en bloque
+        sugeridos = sugeridos_index.sugeridos(p.id)
+        imagenes_map = primera_imagen_por_producto([s["id"] for s in sugeridos])
 
         sugeridos_data = [
             {
-                "id": s.id,
-                "precio": s.precio,
-                "nombre": s.nombre,
-                "extra": s.extra,
-                "url_imagen_principal": urlImg + s.url_imagen_principal,
-                "url_imagen_secundaria": urlImg + s.imagenes[0].url_imagen if s.imagenes else None,
-                "categorias": [
-                    {"id": c.id, "nombre": c.nombre, "slug": getattr(c, "slug", None)}
-                    for c in (s.categorias or [])
-                ],
+                "id": s["id"],
+                "precio": s["precio"],
+                "nombre": s["nombre"],
+                "extra": s["extra"],
+                "url_imagen_principal": urlImg + s["url_imagen_principal"] if s["url_imagen_principal"] else None,
+                "url_imagen_secundaria": urlImg + imagenes_map[s["id"]] if s["id"] in imagenes_map else None,
+                "categorias": s["categorias"],
             }
             for s in sugeridos
         ]
@@ -234,6 +257,9 @@ def detalle_producto(id):
             "extra": p.extra,
             "precio": p.precio,
             "peso": p.peso,
+            "alto_cm": p.alto_cm,
+            "ancho_cm": p.ancho_cm,
+            "largo_cm": p.largo_cm,
             "stock": p.stock,
             "url_imagen_principal": urlImg + p.url_imagen_principal,
 
@@ -257,46 +283,72 @@ def buscar_por_nombre():
     try:
         page = int(request.args.get("page", 1))
         per_page = int(request.args.get("per_page", 10))
-        filtro = request.args.get("filtro", "")
+        filtro = request.args.get("filtro", "").strip()
         categoria_id = request.args.get("id", None)
+        categoria_id = int(categoria_id) if categoria_id and categoria_id.isdigit() else None
 
         offset_value = (page - 1) * per_page
 
-        # Base query
-        query = Producto.query.filter(Producto.activo == True)
-
         # -----------------------------
-        # APLICAR FILTRO POR NOMBRE
+        # BÚSQUEDA POR TEXTO (services/busqueda.py)
         # -----------------------------
         if filtro:
-            query = query.filter(
-                Producto.nombre.ilike(f"%{filtro}%")
+            productos, total, next_cursor = buscar(
+                filtro, categoria_id, page=page, per_page=per_page,
+                cursor=request.args.get("cursor"), usar_cursor=modo_cursor(request.args),
             )
+            if modo_cursor(request.args):
+                paginado = {"per_page": per_page, "total": total, "next_cursor": next_cursor}
+            else:
+                paginado = {"page": page, "per_page": per_page, "total": total}
 
         # -----------------------------
-        # APLICAR FILTRO POR CATEGORIA
+        # SIN TEXTO: por popularidad
         # -----------------------------
-        if categoria_id:
-            query = query.filter(
-                Producto.categoria_id == categoria_id
+        else:
+            query = Producto.query.filter(Producto.activo == True)
+
+            if categoria_id:
+                query = query.filter(
+                    Producto.id.in_(
+                        db.select(producto_categoria.c.producto_id)
+                        .where(producto_categoria.c.categoria_id == categoria_id)
+                    )
+                )
+
+            score = type_coerce(
+                func.coalesce(Producto.vistas, 0) * 0.7 + func.coalesce(Producto.valoracion_promedio, 0) * 0.3,
+                Float,
             )
 
-        # TOTAL PARA PAGINACIÓN
-        total = query.count()
+            if modo_cursor(request.args):
+                # keyset sobre el score (id desempata) + total cacheado
+                total = total_cacheado(clave_filtros("filtro", request.args), query)
+                filas, next_cursor = paginar_cursor(
+                    query.add_columns(score.label("score")), score, Producto.id, True,
+                    request.args.get("cursor"), per_page,
+                    lambda f: (f.score, f[0].id),
+                )
+                productos = [f[0] for f in filas]
+                paginado = {"per_page": per_page, "total": total, "next_cursor": next_cursor}
+            else:
+                # TOTAL PARA PAGINACIÓN
+                total = query.count()
 
-        # ORDEN + PAGINADO
-        productos = (
-            query
-            .order_by(desc(Producto.vistas * 0.7 + Producto.valoracion_promedio * 0.3))
-            .limit(per_page)
-            .offset(offset_value)
-            .all()
-        )
+                # ORDEN + PAGINADO
+                productos = (
+                    query
+                    .order_by(desc(score), desc(Producto.id))
+                    .limit(per_page)
+                    .offset(offset_value)
+                    .all()
+                )
+                paginado = {"page": page, "per_page": per_page, "total": total}
+
+        imagenes_map = primera_imagen_por_producto([p.id for p in productos])
 
         return jsonify({
-            "page": page,
-            "per_page": per_page,
-            "total": total,
+            **paginado,
             "productos": [
                 {
                     "id": p.id,
@@ -304,7 +356,7 @@ def buscar_por_nombre():
                     "extra": p.extra,
                     "precio": p.precio,
                     "url_imagen_principal": p.url_imagen_principal,
-                    "url_imagen_secundaria": p.imagenes[0].url_imagen if p.imagenes else None,
+                    "url_imagen_secundaria": imagenes_map.get(p.id),
                     "stock": p.stock,
                     "vistas": p.vistas,
                     "valoracion_promedio": p.valoracion_promedio,
@@ -313,6 +365,9 @@ def buscar_por_nombre():
             ]
         })
 
+    except CursorInvalido as e:
+        return jsonify({"msg": str(e)}), 400
+
     except Exception as e:
         return jsonify({"msg": "Error al listar productos", "error": str(e)}), 500
 
@@ -373,6 +428,7 @@ def crear_producto():
         precio = request.form.get("precio", type=float)
         stock = request.form.get("stock", type=int, default=0)
         peso = request.form.get("peso")
+        medidas = {k: request.form.get(k, type=float) for k in ("alto_cm", "ancho_cm", "largo_cm")}
 
         # ✅ NUEVO: extra
         extra = request.form.get("extra")
@@ -392,6 +448,7 @@ def crear_producto():
             precio=precio,
             stock=stock,
             peso=peso,
+            **medidas,
             extra=extra,                # ✅
             categoria_id=categoria_id,  # legacy (opcional)
             slug=slug,
@@ -451,7 +508,11 @@ def crear_producto():
             except:
                 return jsonify({"msg": "Características no es un JSON válido"}), 400
 
+        actualizar_texto_busqueda([producto.id])
         db.session.commit()  # Commit final
+        cache.bump()
+        sugeridos_index.actualizar(producto.id)
+        busqueda_index.actualizar([producto.id])
 
         return jsonify({"message": "Producto creado", "id": producto.id}), 201
     except Exception as e:
@@ -473,6 +534,7 @@ def actualizar_producto(id):
 
         form = request.form
 
+        renombrado = "nombre" in form and producto.nombre != form.get("nombre")
         if "nombre" in form:
             producto.nombre = form.get("nombre")
 
@@ -494,6 +556,10 @@ def actualizar_producto(id):
         if "peso" in form:
             producto.peso = float(form.get("peso"))
 
+        for campo in ("alto_cm", "ancho_cm", "largo_cm"):
+            if campo in form:
+                setattr(producto, campo, float(form.get(campo)) if form.get(campo) else None)
+
         # ✅ NUEVO: extra
         if "extra" in form:
             producto.extra = form.get("extra")
@@ -543,7 +609,15 @@ def actualizar_producto(id):
                 else:
                     return jsonify({"msg": "Imagen secundaria no permitida"}), 400
 
+        db.session.flush()
+        actualizar_texto_busqueda([producto.id])
+        if renombrado:
+            # el listado de admin guarda los nombres en pedidos_resumen
+            refrescar_resumen_de_producto(producto.id)
         db.session.commit()
+        cache.bump()
+        sugeridos_index.actualizar(producto.id)
+        busqueda_index.actualizar([producto.id])
         return jsonify({"message": "Producto actualizado"}), 200
     except Exception as e:
         db.session.rollback()
@@ -562,6 +636,9 @@ def eliminar_producto(id):
         producto = Producto.query.get_or_404(id)
         producto.activo=False
         db.session.commit()
+        cache.bump()
+        sugeridos_index.actualizar(producto.id)
+        busqueda_index.actualizar([producto.id])
         return jsonify({"message": "Producto desactivado"}), 200
     except Exception as e:
         db.session.rollback()
@@ -571,6 +648,17 @@ def eliminar_producto(id):
 from sqlalchemy import text
 from flask import jsonify
 
+@productos_bp.cli.command("reindexar-busqueda")
+def reindexar_busqueda():
+    """Recalcula productos.texto_busqueda de todo el catálogo (flask productos reindexar-busqueda)."""
+    ids = [pid for (pid,) in db.session.query(Producto.id).all()]
+    for i in range(0, len(ids), 500):
+        actualizar_texto_busqueda(ids[i:i + 500])
+        db.session.commit()
+    cache.bump()
+    print(f"texto_busqueda actualizado para {len(ids)} productos")
+
+
 @productos_bp.route("/reparar_textos", methods=["POST"])
 def reparar_textos():
     # Traemos columnas reales
@@ -612,7 +700,10 @@ def reparar_textos():
             corregidos += 1
             ids_corregidos.append(pid)
 
+    actualizar_texto_busqueda(ids_corregidos)
     db.session.commit()
+    if corregidos:
+        cache.bump()
 
     return jsonify({
         "productos_corregidos": ids_corregidos,
@@ -0,0 +1,478 @@
+# services/busqueda.py
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+from sqlalchemy import Float, Integer, func, literal_column, text, type_coerce
+
+from services.catalogo import fix_encoding
+
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "lo", "los",
+    "para", "por", "que", "se", "sin", "su", "un", "una", "y", "o",
+}
+
+# peso de cada campo en el ranking
+PESOS = {"nombre": 3.0, "categorias": 2.0, "descripcion_corta": 1.0, "extra": 1.0}
+
+MAX_EXPANSION_PREFIJO = 50
+
+# el cursor de búsqueda guarda la relevancia como entero (millonésimas): un
+# float no da una posición estable para el seek (igualdad exacta entre lo que
+# calcula el motor y lo que vuelve en el cursor)
+ESCALA_RELEVANCIA = 1_000_000
+
+_TOKEN_RE = re.compile(r"[a-z0-9ñ]+")
+
+
+def normalizar(texto):
+    """fix_encoding + minúsculas + sin tildes (la ñ se conserva)."""
+    if not texto:
+        return ""
+    texto = fix_encoding(texto).lower().replace("ñ", "\0")
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return texto.replace("\0", "ñ")
+
+
+def tokenizar(texto):
+    return [t for t in _TOKEN_RE.findall(normalizar(texto)) if t not in STOPWORDS]
+
+
+def texto_busqueda(nombre, descripcion_corta, extra, categorias):
+    """Contenido de productos.texto_busqueda (lo usa el índice FULLTEXT de MySQL)."""
+    partes = [nombre, " ".join(categorias or []), descripcion_corta, extra]
+    return " ".join(tokenizar(" ".join(p for p in partes if p)))
+
+
+def actualizar_texto_busqueda(producto_ids):
+    """Recalcula productos.texto_busqueda para los ids dados (no hace commit)."""
+    from database import db
+    from models import Producto, Categoria, producto_categoria
+
+    if not producto_ids:
+        return
+
+    productos = (
+        db.session.query(Producto.id, Producto.nombre, Producto.descripcion_corta, Producto.extra)
+        .filter(Producto.id.in_(producto_ids))
+        .all()
+    )
+    cats = {}
+    for pid, nombre in (
+        db.session.query(producto_categoria.c.producto_id, Categoria.nombre)
+        .join(Categoria, Categoria.id == producto_categoria.c.categoria_id)
+        .filter(producto_categoria.c.producto_id.in_(producto_ids))
+        .all()
+    ):
+        cats.setdefault(pid, []).append(nombre)
+
+    for p in productos:
+        db.session.execute(
+            Producto.__table__.update()
+            .where(Producto.id == p.id)
+            .values(texto_busqueda=texto_busqueda(p.nombre, p.descripcion_corta, p.extra, cats.get(p.id)))
+        )
+
+
+class BusquedaIndex:
+    """
+    Índice invertido en memoria (por worker) sobre nombre, categorías,
+    descripcion_corta y extra. Pensado para SQLite; en MySQL se usa el
+    índice FULLTEXT sobre productos.texto_busqueda (BUSQUEDA_BACKEND).
+
+    Todos los términos tienen que aparecer; el último se busca como prefijo.
+    Se recarga cuando cambia la versión del catálogo o vence el TTL.
+    """
+
+    def __init__(self, app=None):
+        self.backend = "memoria"
+        self.ttl = 300
+        self._lock = threading.RLock()
+        self._postings = {}     # token -> {pid: peso}
+        self._vocabulario = []  # tokens ordenados (para prefijos)
+        self._docs = {}         # pid -> {"tokens": set, "vistas": int, "cats": set}
+        self._version = None
+        self._cargado_en = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        default = "fulltext" if app.config["SQLALCHEMY_DATABASE_URI"].startswith("mysql") else "memoria"
+        app.config.setdefault("BUSQUEDA_BACKEND", default)  # memoria | fulltext
+        app.config.setdefault("BUSQUEDA_TTL", 300)
+        self.backend = app.config["BUSQUEDA_BACKEND"]
+        self.ttl = float(app.config["BUSQUEDA_TTL"])
+        app.extensions["busqueda_index"] = self
+
+    # ------------------------
+    # Carga
+    # ------------------------
+    def _indexar(self, pid, nombre, descripcion_corta, extra, categorias, vistas, cat_ids):
+        pesos = {}
+        campos = {
+            "nombre": nombre,
+            "categorias": " ".join(categorias),
+            "descripcion_corta": descripcion_corta,
+            "extra": extra,
+        }
+        for campo, valor in campos.items():
+            for tok in tokenizar(valor):
+                pesos[tok] = pesos.get(tok, 0.0) + PESOS[campo]
+
+        for tok, peso in pesos.items():
+            self._postings.setdefault(tok, {})[pid] = peso
+        self._docs[pid] = {"tokens": set(pesos), "vistas": vistas or 0, "cats": set(cat_ids)}
+
+    def _desindexar(self, pid):
+        doc = self._docs.pop(pid, None)
+        if doc is None:
+            return
+        for tok in doc["tokens"]:
+            posting = self._postings.get(tok)
+            if posting is not None:
+                posting.pop(pid, None)
+                if not posting:
+                    del self._postings[tok]
+
+    def _filas(self, producto_ids=None):
+        from database import db
+        from models import Producto, Categoria, producto_categoria
+
+        q = db.session.query(
+            Producto.id, Producto.nombre, Producto.descripcion_corta, Producto.extra, Producto.vistas
+        ).filter(Producto.activo.is_(True))
+        pq = (
+            db.session.query(producto_categoria.c.producto_id, Categoria.id, Categoria.nombre)
+            .join(Categoria, Categoria.id == producto_categoria.c.categoria_id)
+        )
+        if producto_ids is not None:
+            q = q.filter(Producto.id.in_(producto_ids))
+            pq = pq.filter(producto_categoria.c.producto_id.in_(producto_ids))
+
+        cats = {}
+        for pid, cid, nombre in pq.all():
+            cats.setdefault(pid, []).append((cid, nombre))
+        return q.all(), cats
+
+    def cargar(self):
+        from extension import cache
+
+        productos, cats = self._filas()
+        with self._lock:
+            self._postings = {}
+            self._docs = {}
+            for p in productos:
+                pc = cats.get(p.id, [])
+                self._indexar(
+                    p.id, p.nombre, p.descripcion_corta, p.extra,
+                    [n for _, n in pc], p.vistas, [c for c, _ in pc],
+                )
+            self._vocabulario = sorted(self._postings)
+            self._version = cache.version()
+            self._cargado_en = time.monotonic()
+
+    def _asegurar_cargado(self):
+        from extension import cache
+
+        if self._version != cache.version() or time.monotonic() - self._cargado_en > self.ttl:
+            self.cargar()
+
+    def actualizar(self, producto_ids):
+        """Reindexa productos puntuales después de una escritura de admin."""
+        from extension import cache
+
+        if self._version is None:
+            return
+
+        productos, cats = self._filas(producto_ids)
+        with self._lock:
+            for pid in producto_ids:
+                self._desindexar(pid)
+            for p in productos:
+                pc = cats.get(p.id, [])
+                self._indexar(
+                    p.id, p.nombre, p.descripcion_corta, p.extra,
+                    [n for _, n in pc], p.vistas, [c for c, _ in pc],
+                )
+            self._vocabulario = sorted(self._postings)
+            # el bump de esta escritura ya quedó reflejado; si hubo otros en el
+            # medio (otros workers, con Redis) no: que `_asegurar_cargado` recargue
+            version = cache.version()
+            if self._version == version - 1:
+                self._version = version
+
+    # ------------------------
+    # Búsqueda
+    # ------------------------
+    def _expandir_prefijo(self, prefijo):
+        i = bisect_left(self._vocabulario, prefijo)
+        tokens = []
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(prefijo):
+            tokens.append(self._vocabulario[i])
+            if len(tokens) >= MAX_EXPANSION_PREFIJO:
+                break
+            i += 1
+        return tokens
+
+    def rankear(self, consulta, categoria_id=None):
+        """Lista [(score, pid)] ordenada por score desc, id desc."""
+        self._asegurar_cargado()
+        tokens = tokenizar(consulta)
+        if not tokens:
+            return []
+
+        with self._lock:
+            n_docs = max(len(self._docs), 1)
+            scores = None
+            for i, tok in enumerate(tokens):
+                variantes = self._expandir_prefijo(tok) if i == len(tokens) - 1 else [tok]
+                parcial = {}
+                for v in variantes:
+                    posting = self._postings.get(v, {})
+                    idf = math.log(1 + n_docs / (1 + len(posting)))
+                    # coincidencia exacta pesa más que una completada por prefijo
+                    factor = 1.0 if v == tok else 0.8
+                    for pid, peso in posting.items():
+                        parcial[pid] = max(parcial.get(pid, 0.0), peso * idf * factor)
+
+                if scores is None:
+                    scores = parcial
+                else:
+                    scores = {pid: s + parcial[pid] for pid, s in scores.items() if pid in parcial}
+                if not scores:
+                    return []
+
+            resultado = []
+            for pid, s in scores.items():
+                doc = self._docs[pid]
+                if categoria_id is not None and categoria_id not in doc["cats"]:
+                    continue
+                # la popularidad desempata entre relevancias parecidas
+                score = round(s + 0.1 * math.log1p(doc["vistas"]), 6)
+                resultado.append((score, pid))
+
+        resultado.sort(key=lambda r: (-r[0], -r[1]))
+        return resultado
+
+
+def _consulta_booleana(consulta):
+    # InnoDB no indexa tokens de menos de 3 letras (innodb_ft_min_token_size)
+    tokens = [t for t in tokenizar(consulta) if len(t) >= 3]
+    if not tokens:
+        return ""
+    return " ".join(f"+{t}" for t in tokens[:-1]) + f" +{tokens[-1]}*"
+
+
+def buscar(consulta, categoria_id=None, page=1, per_page=10, cursor=None, usar_cursor=False):
+    """
+    Busca productos activos. Devuelve (productos, total, next_cursor), con
+    total y resultados en una sola pasada.
+    """
+    from database import db
+    from extension import busqueda_index
+    from models import Producto, producto_categoria
+    from services.paginacion import (
+        CursorInvalido, codificar_cursor, decodificar_cursor, paginar_cursor, total_cacheado
+    )
+
+    # ------------------------
+    # MySQL FULLTEXT
+    # ------------------------
+    if busqueda_index.backend == "fulltext":
+        booleana = _consulta_booleana(consulta)
+        if not booleana:
+            return [], 0, None
+
+        score = type_coerce(
+            text("MATCH (productos.texto_busqueda) AGAINST (:q IN BOOLEAN MODE)").bindparams(q=booleana),
+            Float,
+        )
+        query = Producto.query.filter(Producto.activo.is_(True), score > 0)
+        if categoria_id is not None:
+            query = query.filter(
+                Producto.id.in_(
+                    db.select(producto_categoria.c.producto_id)
+                    .where(producto_categoria.c.categoria_id == categoria_id)
+                )
+            )
+
+        if usar_cursor:
+            total = total_cacheado(f"busqueda:{booleana}:{categoria_id}", query)
+            relevancia = type_coerce(func.floor(score * ESCALA_RELEVANCIA), Integer)
+            filas, next_cursor = paginar_cursor(
+                query.add_columns(relevancia.label("relevancia")), relevancia, Producto.id, True,
+                cursor, per_page, lambda f: (int(f.relevancia), f[0].id),
+            )
+            return [f[0] for f in filas], total, next_cursor
+
+        filas = (
+            query.add_columns(func.count().over().label("total"))
+            .order_by(score.desc(), Producto.id.desc())
+            .limit(per_page)
+            .offset((page - 1) * per_page)
+            .all()
+        )
+        total = filas[0].total if filas else (query.count() if page > 1 else 0)
+        return [f[0] for f in filas], total, None
+
+    # ------------------------
+    # Índice en memoria
+    # ------------------------
+    ranking = busqueda_index.rankear(consulta, categoria_id)
+    total = len(ranking)
+
+    if usar_cursor:
+        # mismo orden que el ranking (score desc, id desc) con la relevancia entera
+        claves = [(-round(s * ESCALA_RELEVANCIA), -pid) for s, pid in ranking]
+        inicio = 0
+        if cursor:
+            relevancia, id_ = decodificar_cursor(cursor, literal_column("relevancia", Integer))
+            if relevancia is None:
+                raise CursorInvalido("cursor inválido")
+            inicio = bisect_right(claves, (-relevancia, -id_))
+        pagina = ranking[inicio:inicio + per_page]
+        next_cursor = None
+        if inicio + per_page < total and pagina:
+            next_cursor = codificar_cursor(-claves[inicio + len(pagina) - 1][0], pagina[-1][1])
+    else:
+        inicio = (page - 1) * per_page
+        pagina = ranking[inicio:inicio + per_page]
+        next_cursor = None
+
+    ids = [pid for _, pid in pagina]
+    por_id = {p.id: p for p in Producto.query.filter(Producto.id.in_(ids)).all()} if ids else {}
+    return [por_id[pid] for pid in ids if pid in por_id], total, next_cursor
+
+
+class PrefijoIndex:
+    """
+    Autocompletado por prefijo sobre cada sufijo de palabra del nombre
+    normalizado (así "rosa" encuentra "Vibrador Rosa"). Los prefijos de una
+    palabra (hasta PREFIJO_MAX letras) que matchean más de K_MAX productos
+    tienen el top por vistas precalculado (una búsqueda en dict); el resto
+    se resuelve con bisect sobre el array ordenado de sufijos.
+
+    Por worker; se reconstruye cuando cambia la versión del catálogo o vence
+    el TTL. La reconstrucción corre en un thread aparte y mientras tanto se
+    sigue respondiendo con el índice anterior (solo la primera carga bloquea).
+    """
+
+    K_MAX = 20
+    PREFIJO_MAX = 12
+
+    def __init__(self, app=None):
+        self.app = None
+        self.ttl = 120
+        self._lock = threading.Lock()
+        self._hilo = None     # reconstrucción en curso
+        self._claves = []     # sufijos normalizados, ordenados
+        self._ids = []        # producto de cada clave (mismo índice)
+        self._productos = {}  # pid -> (vistas, nombre, url_imagen_principal)
+        self._top = {}        # prefijo popular -> [pid] por vistas desc
+        self._version = None
+        self._cargado_en = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SUGERIR_TTL", 120)
+        self.app = app
+        self.ttl = float(app.config["SUGERIR_TTL"])
+        app.extensions["prefijo_index"] = self
+
+    @staticmethod
+    def _orden(productos):
+        return lambda pid: (-productos[pid][0], pid)
+
+    def cargar(self):
+        from database import db
+        from extension import cache
+        from models import Producto
+
+        # antes de leer: un bump durante la carga dispara otra
+        version = cache.version()
+        filas = (
+            db.session.query(Producto.id, Producto.nombre, Producto.vistas, Producto.url_imagen_principal)
+            .filter(Producto.activo.is_(True))
+            .all()
+        )
+
+        entradas = []
+        productos = {}
+        por_prefijo = {}
+        for f in filas:
+            productos[f.id] = (f.vistas or 0, fix_encoding(f.nombre), f.url_imagen_principal)
+            palabras = normalizar(f.nombre).split()
+            for i, palabra in enumerate(palabras):
+                entradas.append((" ".join(palabras[i:]), f.id))
+                for largo in range(1, min(len(palabra), self.PREFIJO_MAX) + 1):
+                    por_prefijo.setdefault(palabra[:largo], set()).add(f.id)
+        entradas.sort()
+
+        orden = self._orden(productos)
+        top = {
+            pref: heapq.nsmallest(self.K_MAX, ids, key=orden)
+            for pref, ids in por_prefijo.items()
+            if len(ids) > self.K_MAX
+        }
+
+        with self._lock:
+            self._claves = [c for c, _ in entradas]
+            self._ids = [pid for _, pid in entradas]
+            self._productos = productos
+            self._top = top
+            self._version = version
+            self._cargado_en = time.monotonic()
+
+    def _asegurar_cargado(self):
+        from extension import cache
+
+        if self._version is None:
+            self.cargar()
+        elif self._version != cache.version() or time.monotonic() - self._cargado_en > self.ttl:
+            self._recargar_en_fondo()
+
+    def _recargar_en_fondo(self):
+        with self._lock:
+            if self.app is None or (self._hilo is not None and self._hilo.is_alive()):
+                return
+            self._hilo = threading.Thread(target=self._recargar, name="prefijo-index", daemon=True)
+            self._hilo.start()
+
+    def _recargar(self):
+        from database import db
+
+        try:
+            with self.app.app_context():
+                try:
+                    self.cargar()
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            print("ERROR PREFIJO INDEX:", repr(e))
+
+    def sugerir(self, consulta, k=8):
+        """Top-k productos (por vistas) cuyo nombre tiene una palabra que empieza con `consulta`."""
+        prefijo = " ".join(normalizar(consulta).split())
+        if not prefijo:
+            return []
+        k = min(k, self.K_MAX)
+
+        self._asegurar_cargado()
+        with self._lock:
+            if prefijo in self._top:
+                ids = self._top[prefijo][:k]
+            else:
+                i = bisect_left(self._claves, prefijo)
+                j = bisect_left(self._claves, prefijo + "\uffff", lo=i)
+                ids = heapq.nsmallest(k, set(self._ids[i:j]), key=self._orden(self._productos))
+
+            return [
+                {"id": pid, "nombre": self._productos[pid][1], "url_imagen_principal": self._productos[pid][2]}
+                for pid in ids
+            ]
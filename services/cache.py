@@ -0,0 +1,199 @@
+# services/cache.py
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response
+
+VERSION_KEY = "catalogo:version"
+STOCK_KEY = "catalogo:stock"
+
+
+class MemoryBackend:
+    """LRU en memoria del proceso (cada worker de gunicorn tiene la suya)."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            expires = time.monotonic() + ttl if ttl else None
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+            return self._counters[name]
+
+    def get_int(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """Store compartido entre workers. Requiere el paquete `redis` (opcional)."""
+
+    def __init__(self, url, prefix="lp:"):
+        import redis  # dependencia opcional, solo si CACHE_BACKEND=redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=int(ttl) if ttl else None)
+
+    def incr(self, name):
+        return int(self.client.incr(self.prefix + name))
+
+    def get_int(self, name):
+        raw = self.client.get(self.prefix + name)
+        return int(raw) if raw is not None else 0
+
+    def clear(self):
+        for k in self.client.scan_iter(self.prefix + "resp:*"):
+            self.client.delete(k)
+
+
+class ResponseCache:
+    """
+    Cache de respuestas GET del catálogo.
+
+    La clave incluye la versión del catálogo: cada escritura de admin la
+    incrementa (bump) y las entradas viejas dejan de usarse solas. Los
+    endpoints que muestran stock (cached(..., stock=True)) suman además la
+    versión del stock, que mueven los pedidos y la expiración de reservas
+    (bump_stock) sin recargar los índices en memoria, que siguen a la del
+    catálogo.
+    Con el backend en memoria la versión es por worker, así que los demás
+    workers ven el cambio recién cuando vence el TTL.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 60
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("CACHE_BACKEND", "memory")  # memory | redis
+        app.config.setdefault("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+        app.config.setdefault("CACHE_TTL", 60)
+        app.config.setdefault("CACHE_MAX_ENTRIES", 1024)
+
+        self.ttl = int(app.config["CACHE_TTL"])
+        if app.config["CACHE_BACKEND"] == "redis":
+            self.backend = RedisBackend(app.config["CACHE_REDIS_URL"])
+        else:
+            self.backend = MemoryBackend(int(app.config["CACHE_MAX_ENTRIES"]))
+
+        app.extensions["response_cache"] = self
+
+    # ------------------------
+    # Versión del catálogo
+    # ------------------------
+    def version(self):
+        return self.backend.get_int(VERSION_KEY) if self.backend else 0
+
+    def bump(self):
+        """Invalida todo lo cacheado del catálogo (llamar después del commit)."""
+        return self.backend.incr(VERSION_KEY) if self.backend else 0
+
+    def version_stock(self):
+        return self.backend.get_int(STOCK_KEY) if self.backend else 0
+
+    def bump_stock(self):
+        """Cambió el stock (pedido, expiración): invalida solo las respuestas con stock."""
+        return self.backend.incr(STOCK_KEY) if self.backend else 0
+
+    # ------------------------
+    # Contadores
+    # ------------------------
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "version": self.version(),
+            }
+
+    # ------------------------
+    # Decorador
+    # ------------------------
+    def make_key(self, prefix, stock=False):
+        view_args = sorted((request.view_args or {}).items())
+        params = sorted(
+            (k, v.strip()) for k, v in request.args.items(multi=True) if v.strip() != ""
+        )
+        version = f"v{self.version()}" + (f".s{self.version_stock()}" if stock else "")
+        return f"resp:{prefix}:{version}:{view_args}:{params}"
+
+    def cached(self, prefix, stock=False):
+        """Cachea solo respuestas 200 del endpoint decorado (stock=True: la respuesta muestra stock)."""
+
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return fn(*args, **kwargs)
+
+                key = self.make_key(prefix, stock)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self._count(True)
+                    status, mimetype, body = entry
+                    resp = make_response(body, status)
+                    resp.mimetype = mimetype
+                    resp.headers["X-Cache"] = "HIT"
+                    return resp
+
+                self._count(False)
+                resp = make_response(fn(*args, **kwargs))
+                if resp.status_code == 200:
+                    self.backend.set(key, (resp.status_code, resp.mimetype, resp.get_data()), self.ttl)
+                resp.headers["X-Cache"] = "MISS"
+                return resp
+
+            return wrapper
+
+        return decorator
+
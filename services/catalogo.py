@@ -0,0 +1,58 @@
+# services/catalogo.py
+from sqlalchemy import func
+from database import db
+from models import ImagenProducto, producto_categoria
+
+
+def fix_encoding(texto: str) -> str:
+    if not texto:
+        return texto
+    reemplazos = {
+        "├¡": "í", "├í": "í", "Ã­": "í",
+        "├®": "é", "Ã©": "é",
+        "├│": "ó", "Ã³": "ó",
+        "├║": "ú", "Ãº": "ú",
+        "Ã¡": "á", "├í": "á",
+        "Ã±": "ñ",
+        "┬á": " ",
+        "┬": "",
+        "├▒": "ñ"
+    }
+    for roto, bien in reemplazos.items():
+        texto = texto.replace(roto, bien)
+    return texto
+
+
+def primera_imagen_por_producto(producto_ids):
+    """{producto_id: url_imagen} con la primera imagen secundaria de cada producto (1 query)."""
+    if not producto_ids:
+        return {}
+
+    primeras = (
+        db.session.query(func.min(ImagenProducto.id))
+        .filter(ImagenProducto.producto_id.in_(producto_ids))
+        .group_by(ImagenProducto.producto_id)
+    )
+    rows = (
+        db.session.query(ImagenProducto.producto_id, ImagenProducto.url_imagen)
+        .filter(ImagenProducto.id.in_(primeras))
+        .all()
+    )
+    return {pid: url for pid, url in rows}
+
+
+def categoria_ids_por_producto(producto_ids):
+    """{producto_id: [categoria_id, ...]} leyendo solo la tabla pivote (1 query)."""
+    if not producto_ids:
+        return {}
+
+    rows = db.session.execute(
+        db.select(producto_categoria.c.producto_id, producto_categoria.c.categoria_id)
+        .where(producto_categoria.c.producto_id.in_(producto_ids))
+        .order_by(producto_categoria.c.producto_id, producto_categoria.c.categoria_id)
+    ).all()
+
+    resultado = {}
+    for pid, cid in rows:
+        resultado.setdefault(pid, []).append(cid)
+    return resultado
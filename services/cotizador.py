@@ -0,0 +1,426 @@
+# services/cotizador.py
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+ANDREANI_URL = "https://www.andreani.com/api/cotizador/prices"
+VIACARGO_URL = "https://ws.busplus.com.ar/alerce/cotizar"
+
+# paquete que se cotizaba fijo hasta ahora (1 kg, 50x30x6)
+BULTO_DEFAULT = {"peso_g": 1000, "alto": 6, "ancho": 30, "largo": 50}
+
+# el peso del carrito se redondea hacia arriba a este paso: las tarifas van
+# por tramos y así carritos parecidos comparten la cotización cacheada
+PASO_PESO_G = 250
+PASO_CM = 5
+
+# medidas (cm) de una unidad sin alto/ancho/largo cargados
+MEDIDAS_DEFAULT_CM = (6, 15, 20)
+
+# tipo_envio de ZonaEnvio -> transportista que lo cotiza online
+CARRIER_POR_TIPO = {"correo": "andreani"}
+CARRIER_DEFAULT = "viacargo"
+TIPO_POR_CARRIER = {"andreani": "correo", "viacargo": "viacargo"}
+
+
+class CarrierNoDisponible(RuntimeError):
+    """El circuito del transportista está abierto: ni se intenta."""
+
+
+class CotizadorSaturado(RuntimeError):
+    """El pool de consultas tiene la cola llena: se corta en vez de encolar."""
+
+
+class DeadlineVencido(RuntimeError):
+    """Se terminó el deadline del lote (esperando en cola o esperando al carrier)."""
+
+
+class CircuitBreaker:
+    """
+    Después de `fallas` errores seguidos deja de llamar al transportista por
+    `abierto` segundos. Pasado ese tiempo deja pasar una sola prueba
+    (half-open): si sale bien se cierra, si falla vuelve a abrirse.
+    """
+
+    def __init__(self, fallas=3, abierto=60):
+        self.fallas = fallas
+        self.abierto = abierto
+        self._errores = 0
+        self._hasta = 0.0
+        self._probando = False
+        self._lock = threading.Lock()
+
+    def permite(self):
+        with self._lock:
+            if self._errores < self.fallas:
+                return True
+            if time.monotonic() < self._hasta or self._probando:
+                return False
+            self._probando = True
+            return True
+
+    def exito(self):
+        with self._lock:
+            self._errores = 0
+            self._probando = False
+
+    def falla(self):
+        with self._lock:
+            self._errores += 1
+            self._probando = False
+            if self._errores >= self.fallas:
+                self._hasta = time.monotonic() + self.abierto
+
+    def soltar(self):
+        """Ni éxito ni falla (cortó nuestro deadline): libera la prueba half-open."""
+        with self._lock:
+            self._probando = False
+
+    def estado(self):
+        with self._lock:
+            if self._errores < self.fallas:
+                return "cerrado"
+            return "abierto" if time.monotonic() < self._hasta else "half-open"
+
+
+def _bulto(bulto):
+    b = dict(BULTO_DEFAULT)
+    b.update({k: v for k, v in (bulto or {}).items() if v is not None})
+    return b
+
+
+def _redondear(valor, paso):
+    return max(int(math.ceil(float(valor) / paso)) * paso, paso)
+
+
+def bulto_para_carrito(unidades):
+    """
+    Bulto del carrito a partir de [(peso_kg, alto, ancho, largo, cantidad)]
+    (medidas en cm, None = MEDIDAS_DEFAULT_CM). Las unidades se apilan por su
+    lado más chico: largo y ancho son los máximos, alto la suma. Peso y
+    medidas se redondean hacia arriba al paso para compartir el cache.
+    """
+    peso_kg = alto = ancho = largo = 0.0
+    for peso, *medidas, cantidad in unidades:
+        if any(m is None for m in medidas):
+            medidas = MEDIDAS_DEFAULT_CM
+        chico, medio, grande = sorted(float(m) for m in medidas)
+        peso_kg += float(peso) * cantidad
+        alto += chico * cantidad
+        ancho = max(ancho, medio)
+        largo = max(largo, grande)
+    return {
+        "peso_g": _redondear(peso_kg * 1000, PASO_PESO_G),
+        "alto": _redondear(alto, PASO_CM),
+        "ancho": _redondear(ancho, PASO_CM),
+        "largo": _redondear(largo, PASO_CM),
+    }
+
+
+def _precio(valor):
+    # TOTAL a veces puede venir string
+    try:
+        return float(str(valor).replace(",", "."))
+    except (TypeError, ValueError):
+        return valor
+
+
+class Cotizador:
+    """
+    Cotizaciones de Andreani / ViaCargo con cache, stale-while-revalidate y
+    circuit breaker por transportista.
+
+    La cotización depende solo de (transportista, CP destino, bulto), así que
+    se guarda en el backend de `cache` (memoria del worker o Redis) por
+    ENVIOS_COTIZACION_TTL segundos. Vencida, se sigue sirviendo hasta
+    ENVIOS_COTIZACION_STALE segundos más mientras se refresca en segundo plano.
+
+    Las consultas en paralelo y los refresh van a un pool de ENVIOS_HILOS
+    threads con como mucho ENVIOS_COLA_MAX esperando; con la cola llena se
+    responde "saturado" al toque en vez de encolar detrás de trabajo viejo.
+    """
+
+    def __init__(self, app=None):
+        self.urls = {"andreani": ANDREANI_URL, "viacargo": VIACARGO_URL}
+        self.timeouts = {"andreani": 7, "viacargo": 10}
+        self.ttl = 3600
+        self.stale = 86400
+        self.deadline = 4.0
+        self.hilos = 8
+        self.cola_max = 16
+        self.breakers = {c: CircuitBreaker() for c in self.urls}
+        self._pool = None
+        self._cupos = threading.BoundedSemaphore(self.hilos + self.cola_max)
+        self._refrescando = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("ENVIOS_ANDREANI_URL", ANDREANI_URL)
+        app.config.setdefault("ENVIOS_VIACARGO_URL", VIACARGO_URL)
+        app.config.setdefault("ENVIOS_COTIZACION_TTL", 3600)
+        app.config.setdefault("ENVIOS_COTIZACION_STALE", 86400)
+        app.config.setdefault("ENVIOS_DEADLINE", 4.0)
+        app.config.setdefault("ENVIOS_BREAKER_FALLAS", 3)
+        app.config.setdefault("ENVIOS_BREAKER_ABIERTO", 60)
+        app.config.setdefault("ENVIOS_HILOS", 8)
+        app.config.setdefault("ENVIOS_COLA_MAX", 16)
+
+        self.urls = {
+            "andreani": app.config["ENVIOS_ANDREANI_URL"],
+            "viacargo": app.config["ENVIOS_VIACARGO_URL"],
+        }
+        self.ttl = int(app.config["ENVIOS_COTIZACION_TTL"])
+        self.stale = int(app.config["ENVIOS_COTIZACION_STALE"])
+        self.deadline = float(app.config["ENVIOS_DEADLINE"])
+        self.configurar(int(app.config["ENVIOS_HILOS"]), int(app.config["ENVIOS_COLA_MAX"]))
+        self.breakers = {
+            c: CircuitBreaker(int(app.config["ENVIOS_BREAKER_FALLAS"]), float(app.config["ENVIOS_BREAKER_ABIERTO"]))
+            for c in self.urls
+        }
+        app.extensions["cotizador"] = self
+
+    def configurar(self, hilos=None, cola_max=None):
+        with self._lock:
+            if hilos is not None:
+                self.hilos = hilos
+            if cola_max is not None:
+                self.cola_max = cola_max
+            # el pool se rearma al próximo uso con los valores nuevos
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = None
+            self._cupos = threading.BoundedSemaphore(self.hilos + self.cola_max)
+
+    @property
+    def pool(self):
+        # threads propios por worker (se crean recién al primer uso)
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="cotizador")
+        return self._pool
+
+    def _en_pool(self, fn, *args):
+        """Future de fn(*args) en el pool, o CotizadorSaturado si no hay cupo (no bloquea)."""
+        cupos = self._cupos
+        if not cupos.acquire(blocking=False):
+            raise CotizadorSaturado("demasiadas cotizaciones en curso")
+        try:
+            futuro = self.pool.submit(fn, *args)
+        except Exception:
+            cupos.release()
+            raise
+        futuro.add_done_callback(lambda _: cupos.release())
+        return futuro
+
+    # ------------------------
+    # Llamadas a los transportistas
+    # ------------------------
+    def _andreani(self, cp, b, timeout):
+        payload = {
+            "codigoPostalOrigen": "5519",
+            "codigoPostalDestino": cp,
+            "tipoDeEnvioId": "9c16612c-a916-48cf-9fbb-dbad2b097e9e",
+            "bultos": [
+                {
+                    "itemId": "b1a076ac-5b7b-4b16-aec1-e0b90bae7c6c",
+                    "altoCm": str(b["alto"]),
+                    "anchoCm": str(b["ancho"]),
+                    "largoCm": str(b["largo"]),
+                    "peso": str(b["peso_g"]),
+                    "unidad": "grs",
+                    "valorDeclarado": "4500",
+                }
+            ],
+        }
+        res = requests.post(
+            self.urls["andreani"],
+            json=payload,
+            headers={
+                "Content-Type": "application/json",
+                "User-Agent": "Mozilla/5.0",  # a veces evita bloqueos
+            },
+            timeout=timeout,
+        )
+        res.raise_for_status()
+
+        prices = res.json()
+        home_price = None
+        if isinstance(prices, list):
+            home_price = next((p.get("price") for p in prices if p.get("type") == "home"), None)
+        if home_price is None:
+            raise RuntimeError("Andreani no devolvió precio home")
+
+        return {"source": "andreani", "precio": float(home_price)}
+
+    def _viacargo(self, cp, b, timeout):
+        payload = {
+            "IdClienteRemitente": "00000511",
+            "IdCentroRemitente": "02",
+            "CodigoPostalRemitente": "5500",
+            "CodigoPostalDestinatario": cp,
+            "NumeroBultos": "1",
+            "Kilos": f"{b['peso_g'] / 1000:g}",
+            "Largo": str(b["largo"]),
+            "Ancho": str(b["ancho"]),
+            "Alto": str(b["alto"]),
+            "ImporteValorDeclarado": "50000",
+        }
+        res = requests.post(
+            self.urls["viacargo"],
+            json=payload,
+            headers={
+                "Content-Type": "application/json",
+                "User-Agent": "Mozilla/5.0",
+            },
+            timeout=timeout,
+        )
+
+        # ViaCargo a veces responde texto; validamos status y parseo
+        if not res.ok:
+            raise RuntimeError(f"ViaCargo status={res.status_code} body={res.text[:300]}")
+
+        data_vc = res.json()  # si devuelve texto no-json, esto tira y cae al fallback
+        cot0 = (data_vc.get("Cotizacion") or [None])[0] or {}
+        precio = cot0.get("TOTAL")
+        if precio is None:
+            raise RuntimeError("ViaCargo no devolvió TOTAL")
+
+        return {
+            "source": "viacargo",
+            "precio": _precio(precio),
+            "descripcion": cot0.get("PRODUCTO_DESCRIPCION") or "Sin descripción",
+            "tiempo_entrega": cot0.get("TIEMPO_ENTREGA"),
+        }
+
+    def _consultar(self, carrier, cp, b, hasta=None):
+        """
+        Consulta en línea. `hasta` (time.monotonic) acota el timeout HTTP a lo
+        que le queda al deadline del lote; sin `hasta`, el timeout del carrier.
+        """
+        timeout = self.timeouts[carrier]
+        if hasta is not None:
+            restante = hasta - time.monotonic()
+            if restante <= 0:
+                raise DeadlineVencido(f"{carrier}: deadline vencido en cola")
+            timeout = min(timeout, restante)
+
+        breaker = self.breakers[carrier]
+        if not breaker.permite():
+            raise CarrierNoDisponible(f"{carrier}: circuito abierto")
+        try:
+            cotizacion = (self._andreani if carrier == "andreani" else self._viacargo)(cp, b, timeout)
+        except requests.Timeout:
+            # cortado por nuestro deadline, no por el carrier: no cuenta como falla
+            if timeout < self.timeouts[carrier]:
+                breaker.soltar()
+                raise DeadlineVencido(f"{carrier}: sin respuesta antes del deadline") from None
+            breaker.falla()
+            raise
+        except Exception:
+            breaker.falla()
+            raise
+        breaker.exito()
+
+        from extension import cache
+        if cache.backend is not None:
+            cache.backend.set(self._key(carrier, cp, b), (time.time(), cotizacion), self.ttl + self.stale)
+        return cotizacion
+
+    # ------------------------
+    # Cache
+    # ------------------------
+    @staticmethod
+    def _key(carrier, cp, b):
+        return f"envio:{carrier}:{cp}:{b['peso_g']}:{b['alto']}x{b['ancho']}x{b['largo']}"
+
+    def _refrescar(self, carrier, cp, b):
+        key = self._key(carrier, cp, b)
+        with self._lock:
+            if key in self._refrescando:
+                return
+            self._refrescando.add(key)
+
+        def tarea():
+            try:
+                self._consultar(carrier, cp, b)
+            except Exception as e:
+                print(f"{carrier} refresh failed ->", repr(e))
+            finally:
+                with self._lock:
+                    self._refrescando.discard(key)
+
+        try:
+            self._en_pool(tarea)
+        except CotizadorSaturado:
+            # se sigue sirviendo la vencida; el próximo hit lo vuelve a intentar
+            with self._lock:
+                self._refrescando.discard(key)
+
+    def cotizar(self, carrier, cp, bulto=None, hasta=None):
+        """
+        Cotización de un transportista. Sirve del cache si puede (vencida
+        dispara un refresh en segundo plano); si no, consulta en línea.
+        Tira excepción si el transportista falla o tiene el circuito abierto.
+        """
+        b = _bulto(bulto)
+        cp = str(cp).strip()
+
+        from extension import cache
+        entry = cache.backend.get(self._key(carrier, cp, b)) if cache.backend is not None else None
+        if entry is not None:
+            guardada, cotizacion = entry
+            if time.time() - guardada > self.ttl:
+                self._refrescar(carrier, cp, b)
+            return dict(cotizacion, cache=True)
+
+        return dict(self._consultar(carrier, cp, b, hasta), cache=False)
+
+    def cotizar_lote(self, pares, bulto=None, deadline=None):
+        """
+        Consulta en paralelo varios (carrier, cp) y espera como mucho
+        `deadline` segundos en total. Devuelve ({(carrier, cp): cotización},
+        {(carrier, cp): motivo}). El timeout HTTP de cada consulta es lo que
+        le queda al deadline, así ningún thread del pool sigue ocupado después;
+        sin cupo en el pool el par vuelve como "saturado".
+        """
+        deadline = self.deadline if deadline is None else deadline
+        hasta = time.monotonic() + deadline
+
+        futuros, errores = {}, {}
+        for c, cp in pares:
+            try:
+                futuros[self._en_pool(self.cotizar, c, cp, bulto, hasta)] = (c, cp)
+            except CotizadorSaturado:
+                errores[(c, cp)] = "saturado"
+        listos, _ = wait(futuros, timeout=deadline)
+
+        cotizaciones = {}
+        for futuro, par in futuros.items():
+            if futuro not in listos:
+                errores[par] = "deadline"
+                continue
+            try:
+                cotizaciones[par] = futuro.result()
+            except DeadlineVencido:
+                errores[par] = "deadline"
+            except Exception as e:
+                errores[par] = repr(e)
+        return cotizaciones, errores
+
+    def cotizar_todos(self, cp, bulto=None, carriers=None, deadline=None):
+        """Todos los transportistas para un CP: ({carrier: cotización}, {carrier: motivo})."""
+        pares = [(c, cp) for c in (carriers or self.urls)]
+        cotizaciones, errores = self.cotizar_lote(pares, bulto, deadline)
+        return (
+            {c: cot for (c, _), cot in cotizaciones.items()},
+            {c: motivo for (c, _), motivo in errores.items()},
+        )
+
+    def estado(self):
+        return {c: b.estado() for c, b in self.breakers.items()}
@@ -1,8 +1,13 @@
+import smtplib
+import threading
+import time
+
 from flask_mail import Message
 from flask import current_app
 from extension import mail
-def send_email(to: str, subject: str, html: str, cc=None, bcc=None,reply_to=None):
-    msg = Message(
+
+def build_message(to: str, subject: str, html: str, cc=None, bcc=None, reply_to=None) -> Message:
+    return Message(
         subject=subject,
         recipients=[to],
         html=html,
@@ -11,4 +16,93 @@ def send_email(to: str, subject: str, html: str, cc=None, bcc=None,reply_to=None
         sender=current_app.config.get("MAIL_DEFAULT_SENDER"),
         reply_to=reply_to,
     )
-    mail.send(msg)
\ No newline at end of file
+
+
+class SMTPPool:
+    """
+    Una conexión SMTP persistente por thread (TLS + login una sola vez).
+    Si estuvo ociosa más de MAIL_POOL_CHECK segundos se verifica con NOOP
+    antes de usarla y se reconecta si el server la cerró.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _abrir(self):
+        conn = mail.connect()
+        conn.__enter__()
+        self._local.conn = conn
+        self._local.usada = time.monotonic()
+        return conn
+
+    def descartar(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None and conn.host is not None:
+            try:
+                conn.host.quit()
+            except Exception:
+                try:
+                    conn.host.close()
+                except Exception:
+                    pass
+
+    def _sana(self, conn):
+        if conn.host is None:  # MAIL_SUPPRESS_SEND
+            return True
+        ociosa = time.monotonic() - getattr(self._local, "usada", 0)
+        if ociosa < current_app.config.get("MAIL_POOL_CHECK", 30):
+            return True
+        try:
+            return conn.host.noop()[0] == 250
+        except Exception:
+            return False
+
+    def conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return self._abrir()
+        if not self._sana(conn):
+            self.descartar()
+            return self._abrir()
+        return conn
+
+    def enviar(self, msg):
+        """Envía por la conexión del thread; si se cayó, reconecta y reintenta una vez."""
+        conn = self.conexion()
+        try:
+            conn.send(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            self.descartar()
+            conn = self._abrir()
+            conn.send(msg)
+        self._local.usada = time.monotonic()
+
+
+_pool = SMTPPool()
+
+
+def send_email(to: str, subject: str, html: str, cc=None, bcc=None,reply_to=None):
+    msg = build_message(to, subject, html, cc=cc, bcc=bcc, reply_to=reply_to)
+    _pool.enviar(msg)
+
+
+def send_many(messages):
+    """
+    Envía varios mensajes por la misma sesión SMTP.
+    Devuelve una lista alineada con `messages`: None si salió, o la excepción.
+    """
+    try:
+        _pool.conexion()
+    except Exception as e:
+        # sin conexión: ninguno sale, no tiene sentido reintentar uno por uno
+        return [e] * len(messages)
+
+    resultados = []
+    for msg in messages:
+        try:
+            _pool.enviar(msg)
+            resultados.append(None)
+        except Exception as e:
+            resultados.append(e)
+    return resultados
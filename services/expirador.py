@@ -0,0 +1,243 @@
+# services/expirador.py
+import atexit
+import heapq
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class ExpiradorReservas:
+    """
+    Libera el stock de los pedidos vencidos apenas vence su reserva, sin
+    depender de que alguien llame a /pedidos/expirar.
+
+    Guarda un min-heap de (expires_at, pedido_id) y duerme hasta el próximo
+    vencimiento. Cuando vence, corre la expiración por lotes de
+    services/reservas.py (que vuelve a chequear todo contra la DB).
+
+    Corre en un solo worker: el que tiene el lease "reservas" en la tabla
+    leases_tareas (se renueva cada pocos segundos; si el worker muere, otro
+    lo toma cuando vence). El heap se siembra desde la DB al tomar el lease
+    (índice estado + expires_at) y después solo se leen los pedidos nuevos
+    (id > último visto); cada RESERVAS_RESIEMBRA segundos se resiembra completo.
+
+    Un pedido pagado no se saca del heap: los pagos se aplican en otro
+    proceso (`flask mp procesar`), que no ve este heap. Cuando su vencimiento
+    llega, la expiración solo toca pedidos todavía en PENDIENTE_PAGO (lo
+    vuelve a chequear en el UPDATE), así que el costo es una consulta de más.
+    """
+
+    NOMBRE_LEASE = "reservas"
+
+    def __init__(self, app=None):
+        self.app = None
+        self.habilitado = True
+        self.lease = 30
+        self.refresco = 10
+        self.resiembra = 600
+        self.dueno = f"{socket.gethostname()}:{os.getpid()}"
+        self.lider = False
+        self._heap = []
+        self._agendados = set()
+        self._ultimo_id = 0
+        self._sembrado_en = 0.0
+        self._cond = threading.Condition()
+        self._thread_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RESERVAS_SCHEDULER", True)
+        app.config.setdefault("RESERVAS_LEASE_SEGUNDOS", 30)
+        app.config.setdefault("RESERVAS_REFRESCO_SEGUNDOS", 10)
+        app.config.setdefault("RESERVAS_RESIEMBRA", 600)
+
+        self.app = app
+        self.habilitado = bool(app.config["RESERVAS_SCHEDULER"])
+        self.lease = float(app.config["RESERVAS_LEASE_SEGUNDOS"])
+        self.refresco = min(float(app.config["RESERVAS_REFRESCO_SEGUNDOS"]), self.lease / 3)
+        self.resiembra = float(app.config["RESERVAS_RESIEMBRA"])
+        app.extensions["expirador_reservas"] = self
+
+        if self.habilitado:
+            # arranca con el primer request del worker (no en el master ni en `flask db ...`)
+            app.before_request(self._asegurar_thread)
+            atexit.register(self._soltar_lease)
+
+    # ------------------------
+    # Avisos desde los endpoints (solo tienen efecto en el worker líder;
+    # los demás pedidos se levantan con el refresco incremental)
+    # ------------------------
+    def agendar(self, pedido_id, expires_at):
+        if expires_at is None:
+            return
+        with self._cond:
+            if not self.lider or pedido_id in self._agendados:
+                return
+            self._agendados.add(pedido_id)
+            heapq.heappush(self._heap, (expires_at, pedido_id))
+            self._cond.notify()
+
+    def proximo(self):
+        with self._cond:
+            return self._heap[0][0] if self._heap else None
+
+    # ------------------------
+    # Lease
+    # ------------------------
+    def _tomar_lease(self, ahora):
+        from sqlalchemy import or_
+        from sqlalchemy.exc import IntegrityError
+        from database import db
+        from models import LeaseTarea
+
+        n = (
+            LeaseTarea.query
+            .filter(
+                LeaseTarea.nombre == self.NOMBRE_LEASE,
+                or_(LeaseTarea.vence < ahora, LeaseTarea.dueno == self.dueno),
+            )
+            .update(
+                {LeaseTarea.dueno: self.dueno, LeaseTarea.vence: ahora + timedelta(seconds=self.lease)},
+                synchronize_session=False,
+            )
+        )
+        db.session.commit()
+        if n:
+            return True
+
+        if db.session.get(LeaseTarea, self.NOMBRE_LEASE) is not None:
+            db.session.rollback()
+            return False
+        try:
+            db.session.add(LeaseTarea(
+                nombre=self.NOMBRE_LEASE, dueno=self.dueno, vence=ahora + timedelta(seconds=self.lease)
+            ))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    def _soltar_lease(self):
+        if not self.lider or self.app is None:
+            return
+        try:
+            from database import db
+            from models import LeaseTarea
+
+            with self.app.app_context():
+                LeaseTarea.query.filter_by(nombre=self.NOMBRE_LEASE, dueno=self.dueno).update(
+                    {LeaseTarea.vence: datetime.utcnow()}, synchronize_session=False
+                )
+                db.session.commit()
+        except Exception as e:
+            print("ERROR SOLTAR LEASE:", repr(e))
+
+    # ------------------------
+    # Heap
+    # ------------------------
+    def _sembrar(self, completo):
+        from database import db
+        from models import Pedido
+
+        query = (
+            db.session.query(Pedido.id, Pedido.expires_at)
+            .filter(Pedido.estado == "PENDIENTE_PAGO")
+            .filter(Pedido.stock_state == "reserved")
+            .filter(Pedido.expires_at.isnot(None))
+        )
+        if not completo:
+            query = query.filter(Pedido.id > self._ultimo_id)
+        filas = query.all()
+
+        with self._cond:
+            if completo:
+                self._heap = [(exp, pid) for pid, exp in filas]
+                heapq.heapify(self._heap)
+                self._agendados = {pid for pid, _ in filas}
+                self._sembrado_en = time.monotonic()
+            else:
+                for pid, exp in filas:
+                    if pid not in self._agendados:
+                        self._agendados.add(pid)
+                        heapq.heappush(self._heap, (exp, pid))
+            if filas:
+                self._ultimo_id = max(self._ultimo_id, max(pid for pid, _ in filas))
+
+        if completo:
+            # pedidos nuevos posteriores a la siembra: por id
+            self._ultimo_id = max(self._ultimo_id, db.session.query(db.func.max(Pedido.id)).scalar() or 0)
+
+    def _sacar_vencidos(self, ahora):
+        """Saca del heap lo vencido. True si había alguno todavía agendado."""
+        hay = False
+        with self._cond:
+            while self._heap and self._heap[0][0] <= ahora:
+                _, pid = heapq.heappop(self._heap)
+                if pid in self._agendados:
+                    self._agendados.discard(pid)
+                    hay = True
+        return hay
+
+    # ------------------------
+    # Loop
+    # ------------------------
+    def tick(self):
+        """Una vuelta del scheduler (requiere app context). Devuelve cuántos segundos dormir."""
+        from services.reservas import expirar_vencidos
+
+        ahora = datetime.utcnow()
+        if not self._tomar_lease(ahora):
+            if self.lider:
+                print("expirador de reservas: lease perdido")
+                with self._cond:
+                    self._heap, self._agendados = [], set()
+            self.lider = False
+            return self.lease / 2
+
+        if not self.lider or time.monotonic() - self._sembrado_en > self.resiembra:
+            self.lider = True
+            self._sembrar(completo=True)
+        else:
+            self._sembrar(completo=False)
+
+        if self._sacar_vencidos(ahora):
+            expired_ids, released = expirar_vencidos(ahora)
+            if expired_ids:
+                print(f"expirador de reservas: {len(expired_ids)} pedidos expirados, stock devuelto de {len(released)}")
+
+        espera = self.refresco
+        proximo = self.proximo()
+        if proximo is not None:
+            espera = min(espera, max((proximo - datetime.utcnow()).total_seconds(), 0.05))
+        return espera
+
+    def _asegurar_thread(self):
+        # el thread se arranca en el proceso del worker (no en el master de gunicorn)
+        if self._thread_pid == os.getpid() or self.app is None:
+            return
+        with self._cond:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self.dueno = f"{socket.gethostname()}:{os.getpid()}"
+        threading.Thread(target=self._loop, name="expirador-reservas", daemon=True).start()
+
+    def _loop(self):
+        from database import db
+
+        while True:
+            try:
+                with self.app.app_context():
+                    try:
+                        espera = self.tick()
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                print("ERROR EXPIRADOR RESERVAS:", repr(e))
+                espera = self.refresco
+            with self._cond:
+                self._cond.wait(timeout=espera)
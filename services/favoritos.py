@@ -0,0 +1,67 @@
+# services/favoritos.py
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import Favorito, ImagenProducto, Producto
+
+
+def ids_favoritos(usuario_id):
+    """[producto_id, ...] de los favoritos del usuario (1 query sobre el índice único)."""
+    return [
+        pid for (pid,) in
+        db.session.query(Favorito.producto_id)
+        .filter(Favorito.usuario_id == usuario_id)
+        .order_by(Favorito.id)
+    ]
+
+
+def productos_favoritos(usuario_id):
+    """
+    Productos favoritos del usuario con la primera imagen secundaria, en una
+    sola query y solo con las columnas que se muestran.
+    """
+    primera_imagen = (
+        select(ImagenProducto.url_imagen)
+        .where(ImagenProducto.producto_id == Producto.id)
+        .order_by(ImagenProducto.id)
+        .limit(1)
+        .correlate(Producto)
+        .scalar_subquery()
+    )
+    rows = (
+        db.session.query(
+            Producto.id,
+            Producto.nombre,
+            Producto.precio,
+            Producto.url_imagen_principal,
+            primera_imagen.label("url_imagen_secundaria"),
+            Producto.stock,
+            Producto.vistas,
+            Producto.valoracion_promedio,
+        )
+        .join(Favorito, Favorito.producto_id == Producto.id)
+        .filter(Favorito.usuario_id == usuario_id)
+        .order_by(Favorito.id)
+        .all()
+    )
+    return [dict(r._mapping) for r in rows]
+
+
+def agregar_favorito(usuario_id, producto_id):
+    """
+    Upsert idempotente: inserta el favorito o devuelve el que ya estaba
+    (el índice único resuelve la carrera). Devuelve (favorito, nuevo) o
+    (None, False) si el producto no existe (SQLite no chequea la FK). No
+    hace commit.
+    """
+    if db.session.get(Producto, producto_id) is None:
+        return None, False
+    try:
+        with db.session.begin_nested():
+            favorito = Favorito(usuario_id=usuario_id, producto_id=producto_id)
+            db.session.add(favorito)
+        return favorito, True
+    except IntegrityError:
+        favorito = Favorito.query.filter_by(usuario_id=usuario_id, producto_id=producto_id).first()
+        return favorito, False
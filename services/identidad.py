@@ -0,0 +1,127 @@
+# services/identidad.py
+import threading
+import time
+
+from flask import g
+from flask_jwt_extended import get_jwt, get_jwt_identity
+
+
+class Acceso:
+    """Lo mínimo para autorizar: id, rol y si está activo (sin cargar el Usuario)."""
+
+    __slots__ = ("id", "rol", "activo")
+
+    def __init__(self, id, rol, activo):
+        self.id = id
+        self.rol = rol
+        self.activo = activo
+
+    @property
+    def es_admin(self):
+        return self.rol == "admin" and self.activo
+
+
+class Identidad:
+    """
+    Quién hace el request, sin ir a la DB en cada endpoint.
+
+    - El rol viaja en el JWT (additional claims desde el login): un token de
+      cliente se rechaza para rutas de admin sin consultar nada.
+    - Rol/activo por usuario quedan en un cache TTL en memoria (por worker),
+      así un admin desactivado o degradado pierde el acceso como mucho a los
+      IDENTIDAD_TTL segundos; en el worker que hizo el cambio, al instante
+      (`invalidar`).
+    - El Usuario completo se carga una sola vez por request y queda en flask.g.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 60
+        self.max_entradas = 10000
+        self._estados = {}  # usuario_id -> (vence, rol, activo)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("IDENTIDAD_TTL", 60)
+        app.config.setdefault("IDENTIDAD_MAX_ENTRADAS", 10000)
+        self.ttl = float(app.config["IDENTIDAD_TTL"])
+        self.max_entradas = int(app.config["IDENTIDAD_MAX_ENTRADAS"])
+        app.extensions["identidad"] = self
+
+    @staticmethod
+    def claims(usuario):
+        """additional_claims para create_access_token."""
+        return {"rol": usuario.rol or "cliente"}
+
+    def invalidar(self, usuario_id):
+        with self._lock:
+            self._estados.pop(int(usuario_id), None)
+
+    def _guardar(self, usuario_id, rol, activo):
+        with self._lock:
+            if len(self._estados) >= self.max_entradas:
+                ahora = time.monotonic()
+                self._estados = {k: v for k, v in self._estados.items() if v[0] > ahora}
+                if len(self._estados) >= self.max_entradas:
+                    self._estados.clear()
+            self._estados[usuario_id] = (time.monotonic() + self.ttl, rol, activo)
+
+    def acceso(self, usuario_id):
+        """Acceso(id, rol, activo) del usuario, o None si no existe."""
+        from database import db
+        from models import Usuario
+
+        usuario_id = int(usuario_id)
+        with self._lock:
+            entrada = self._estados.get(usuario_id)
+        if entrada is not None and entrada[0] > time.monotonic():
+            return Acceso(usuario_id, entrada[1], entrada[2])
+
+        usuario = g.get("identidad_usuario")
+        if usuario is not None and usuario.id == usuario_id:
+            fila = (usuario.rol, usuario.activo)
+        else:
+            fila = db.session.query(Usuario.rol, Usuario.activo).filter(Usuario.id == usuario_id).first()
+            if fila is None:
+                return None
+        self._guardar(usuario_id, fila[0], fila[1])
+        return Acceso(usuario_id, fila[0], fila[1])
+
+    def usuario_actual(self):
+        """Usuario del token (cargado una vez por request) o None."""
+        from database import db
+        from models import Usuario
+
+        identity = get_jwt_identity()
+        if identity is None:
+            return None
+        usuario = g.get("identidad_usuario")
+        if usuario is None or usuario.id != int(identity):
+            usuario = db.session.get(Usuario, int(identity))
+            g.identidad_usuario = usuario
+        return usuario
+
+    def require_admin(self):
+        """Acceso del admin logueado, o None (el endpoint responde 403)."""
+        identity = get_jwt_identity()
+        if identity is None:
+            return None
+        # tokens con rol en el claim: un cliente ni llega a la DB
+        rol = get_jwt().get("rol")
+        if rol is not None and rol != "admin":
+            return None
+        acceso = self.acceso(identity)
+        if acceso is None or not acceso.es_admin:
+            return None
+        return acceso
+
+
+def require_admin():
+    from extension import identidad
+    return identidad.require_admin()
+
+
+def usuario_actual():
+    from extension import identidad
+    return identidad.usuario_actual()
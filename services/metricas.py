@@ -0,0 +1,204 @@
+# services/metricas.py
+import hmac
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_QUERIES = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+class Histograma:
+    """Histograma acumulativo estilo Prometheus (buckets fijos + sum + count)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.cuentas = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.cuentas[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def lineas(self, nombre, labels):
+        acumulado = 0
+        for le, n in zip(list(self.buckets) + ["+Inf"], self.cuentas):
+            acumulado += n
+            yield f'{nombre}_bucket{{{labels},le="{le}"}} {acumulado}'
+        yield f"{nombre}_sum{{{labels}}} {self.suma:.6f}"
+        yield f"{nombre}_count{{{labels}}} {self.total}"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class Metricas:
+    """
+    Instrumentación de requests: latencia por endpoint, cantidad de
+    statements y tiempo de DB por request (eventos de SQLAlchemy), log de
+    statements lentos, header Server-Timing y /metrics en formato Prometheus.
+
+    Los números son por proceso: con varios workers de gunicorn, Prometheus
+    ve el worker que atendió el scrape.
+
+    /metrics pide METRICAS_TOKEN (?token= o Authorization: Bearer); sin token
+    configurado responde 403, salvo METRICAS_PUBLICAS=true (desarrollo).
+    """
+
+    def __init__(self, app=None):
+        self.slow_ms = 0
+        self.server_timing = True
+        self.token = None
+        self.publicas = False
+        self._lock = threading.Lock()
+        self._latencia = {}     # (metodo, endpoint, status) -> Histograma
+        self._queries = {}      # (metodo, endpoint) -> Histograma
+        self._db_segundos = {}  # (metodo, endpoint) -> float
+        self._lentos = 0
+        self._escuchando = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("METRICAS_HABILITADAS", True)
+        app.config.setdefault("METRICAS_SLOW_MS", 0)  # 0 = no loguear statements
+        app.config.setdefault("METRICAS_SERVER_TIMING", True)
+        app.config.setdefault("METRICAS_TOKEN", None)
+        app.config.setdefault("METRICAS_PUBLICAS", False)
+
+        app.extensions["metricas"] = self
+        if not app.config["METRICAS_HABILITADAS"]:
+            return
+
+        self.slow_ms = float(app.config["METRICAS_SLOW_MS"] or 0)
+        self.server_timing = bool(app.config["METRICAS_SERVER_TIMING"])
+        self.token = app.config["METRICAS_TOKEN"]
+        self.publicas = bool(app.config["METRICAS_PUBLICAS"])
+
+        if not self._escuchando:
+            # a nivel clase Engine: cubre el engine que Flask-SQLAlchemy cree después
+            event.listen(Engine, "before_cursor_execute", self._antes_sql)
+            event.listen(Engine, "after_cursor_execute", self._despues_sql)
+            self._escuchando = True
+
+        app.before_request(self._antes_request)
+        app.after_request(self._despues_request)
+        app.add_url_rule("/metrics", "metricas", self._vista_metrics, methods=["GET"])
+
+    # ------------------------
+    # SQLAlchemy
+    # ------------------------
+    def _antes_sql(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    def _despues_sql(self, conn, cursor, statement, parameters, context, executemany):
+        pila = conn.info.get("metricas_inicio")
+        if not pila:
+            return
+        dur = time.perf_counter() - pila.pop()
+
+        if has_request_context() and "metricas_t0" in g:
+            g.metricas_queries += 1
+            g.metricas_db += dur
+
+        if self.slow_ms and dur * 1000 >= self.slow_ms:
+            with self._lock:
+                self._lentos += 1
+            donde = f"{request.method} {request.path}" if has_request_context() else "-"
+            # solo el statement: los parámetros traen emails, hashes, tokens
+            print(f"SQL LENTO ({dur * 1000:.1f} ms) [{donde}]: {statement}"[:2000])
+
+    # ------------------------
+    # Flask
+    # ------------------------
+    def _antes_request(self):
+        g.metricas_t0 = time.perf_counter()
+        g.metricas_queries = 0
+        g.metricas_db = 0.0
+
+    def _despues_request(self, response):
+        if "metricas_t0" not in g:
+            return response
+
+        dur = time.perf_counter() - g.metricas_t0
+        endpoint = request.url_rule.rule if request.url_rule is not None else "<sin ruta>"
+        if endpoint == "/metrics":
+            return response
+        metodo = request.method
+
+        with self._lock:
+            clave = (metodo, endpoint, response.status_code)
+            self._latencia.setdefault(clave, Histograma(BUCKETS_SEGUNDOS)).observar(dur)
+            self._queries.setdefault((metodo, endpoint), Histograma(BUCKETS_QUERIES)).observar(g.metricas_queries)
+            self._db_segundos[(metodo, endpoint)] = self._db_segundos.get((metodo, endpoint), 0.0) + g.metricas_db
+
+        if self.server_timing:
+            response.headers.add(
+                "Server-Timing",
+                f'app;dur={dur * 1000:.1f}, db;dur={g.metricas_db * 1000:.1f};desc="{g.metricas_queries} queries"',
+            )
+        return response
+
+    # ------------------------
+    # Exposición
+    # ------------------------
+    def texto(self):
+        from extension import cache
+
+        lineas = [
+            "# HELP http_request_duration_seconds Latencia de requests por endpoint.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (metodo, endpoint, status), h in sorted(self._latencia.items()):
+                labels = f'method="{metodo}",endpoint="{_escapar(endpoint)}",status="{status}"'
+                lineas += h.lineas("http_request_duration_seconds", labels)
+
+            lineas += [
+                "# HELP http_request_db_statements Statements SQL por request.",
+                "# TYPE http_request_db_statements histogram",
+            ]
+            for (metodo, endpoint), h in sorted(self._queries.items()):
+                lineas += h.lineas("http_request_db_statements", f'method="{metodo}",endpoint="{_escapar(endpoint)}"')
+
+            lineas += [
+                "# HELP http_request_db_seconds_total Tiempo total en la DB por endpoint.",
+                "# TYPE http_request_db_seconds_total counter",
+            ]
+            for (metodo, endpoint), seg in sorted(self._db_segundos.items()):
+                lineas.append(
+                    f'http_request_db_seconds_total{{method="{metodo}",endpoint="{_escapar(endpoint)}"}} {seg:.6f}'
+                )
+
+            lineas += [
+                "# HELP db_slow_statements_total Statements por encima de METRICAS_SLOW_MS.",
+                "# TYPE db_slow_statements_total counter",
+                f"db_slow_statements_total {self._lentos}",
+            ]
+
+        stats = cache.stats()
+        lineas += [
+            "# HELP response_cache_hits_total Hits del cache de respuestas.",
+            "# TYPE response_cache_hits_total counter",
+            f"response_cache_hits_total {stats['hits']}",
+            "# HELP response_cache_misses_total Misses del cache de respuestas.",
+            "# TYPE response_cache_misses_total counter",
+            f"response_cache_misses_total {stats['misses']}",
+        ]
+        return "\n".join(lineas) + "\n"
+
+    def _vista_metrics(self):
+        if self.token:
+            enviado = request.args.get("token") or request.headers.get("Authorization", "").removeprefix("Bearer ")
+            if not hmac.compare_digest(enviado.encode(), self.token.encode()):
+                return Response("forbidden\n", status=403, mimetype="text/plain")
+        elif not self.publicas:
+            return Response("forbidden: falta METRICAS_TOKEN\n", status=403, mimetype="text/plain")
+        return Response(self.texto(), mimetype="text/plain; version=0.0.4")
@@ -3,20 +3,18 @@ import os
 from flask import current_app
 from models import Usuario, Pedido, Pago
 
-from services.email_service import send_email  # tu función que ya funciona
+from services.outbox import encolar_email
 
 def _admin_email():
     return current_app.config.get("ADMIN_EMAIL") or os.getenv("ADMIN_EMAIL")
 
 def _safe_send(to, subject, html):
+    # No envía: encola en la outbox dentro de la transacción actual.
+    # El commit lo hace quien llama; el envío lo hace `flask emails procesar`.
     if not to:
         print("EMAIL: destinatario vacío, se ignora:", subject)
         return
-    try:
-        send_email(to=to, subject=subject, html=html)
-    except Exception as e:
-        # IMPORTANTÍSIMO: que no rompa la request
-        print("EMAIL ERROR:", subject, repr(e))
+    encolar_email(to=to, subject=subject, html=html)
 
 def send_user_welcome(usuario: Usuario):
     html = f"""
@@ -0,0 +1,139 @@
+# services/outbox.py
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+
+from database import db
+from models import EmailOutbox
+from services.email_service import build_message, send_many
+
+MAX_INTENTOS = 8
+BACKOFF_BASE_SEGUNDOS = 30
+# un lote reclamado queda fuera de la cola este tiempo; si el worker muere, se retoma
+LEASE_SEGUNDOS = 300
+
+emails_cli = AppGroup("emails", help="Outbox de emails (envío en segundo plano).")
+
+
+def encolar_email(to, subject, html, reply_to=None):
+    """
+    Agrega el email a la outbox en la sesión actual: se guarda con el mismo
+    commit que el cambio de negocio y lo envía el worker (flask emails procesar).
+    """
+    email = EmailOutbox(destinatario=to, asunto=subject, html=html, reply_to=reply_to)
+    db.session.add(email)
+    return email
+
+
+def _backoff(intentos):
+    return timedelta(seconds=BACKOFF_BASE_SEGUNDOS * (2 ** (intentos - 1)))
+
+
+def _reclamar(limite):
+    """
+    Toma un lote de pendientes vencidos y lo commitea con proximo_intento =
+    ahora + LEASE_SEGUNDOS: los demás workers no lo ven y no queda ningún lock
+    tomado mientras se envía. En MySQL el SELECT va con SKIP LOCKED; en el
+    resto el UPDATE condicional decide quién se queda con cada fila.
+    Devuelve [(id, destinatario, asunto, html, reply_to)].
+    """
+    ahora = datetime.utcnow()
+    query = (
+        db.session.query(EmailOutbox.id)
+        .filter(EmailOutbox.estado == "pendiente", EmailOutbox.proximo_intento <= ahora)
+        .order_by(EmailOutbox.proximo_intento, EmailOutbox.id)
+        .limit(limite)
+    )
+    if db.engine.dialect.name == "mysql":
+        query = query.with_for_update(skip_locked=True)
+    ids = [i for (i,) in query.all()]
+    if not ids:
+        db.session.commit()
+        return []
+
+    lease = ahora + timedelta(seconds=LEASE_SEGUNDOS)
+    if db.engine.dialect.name == "mysql":
+        # DATETIME sin fracción: para compararlo abajo (ahí las filas ya están lockeadas)
+        lease = lease.replace(microsecond=0)
+    (
+        EmailOutbox.query
+        .filter(
+            EmailOutbox.id.in_(ids),
+            EmailOutbox.estado == "pendiente",
+            EmailOutbox.proximo_intento <= ahora,
+        )
+        .update({EmailOutbox.proximo_intento: lease}, synchronize_session=False)
+    )
+    filas = (
+        db.session.query(
+            EmailOutbox.id, EmailOutbox.destinatario, EmailOutbox.asunto, EmailOutbox.html, EmailOutbox.reply_to,
+        )
+        .filter(EmailOutbox.id.in_(ids), EmailOutbox.proximo_intento == lease)
+        .order_by(EmailOutbox.id)
+        .all()
+    )
+    db.session.commit()
+    return filas
+
+
+def procesar_lote(limite=50):
+    """
+    Envía un lote por la conexión SMTP persistente. Devuelve (enviados, fallidos).
+    El lote se reclama y commitea antes de abrir SMTP: ninguna transacción
+    queda abierta durante el envío. Los que fallan se reintentan con backoff
+    exponencial hasta MAX_INTENTOS.
+    """
+    lote = _reclamar(limite)
+    if not lote:
+        return 0, 0
+
+    mensajes = [
+        build_message(destinatario, asunto, html, reply_to=reply_to)
+        for _, destinatario, asunto, html, reply_to in lote
+    ]
+    resultados = send_many(mensajes)
+
+    ok = [fila.id for fila, error in zip(lote, resultados) if error is None]
+    errores = {fila.id: error for fila, error in zip(lote, resultados) if error is not None}
+    if ok:
+        (
+            EmailOutbox.query
+            .filter(EmailOutbox.id.in_(ok))
+            .update({EmailOutbox.estado: "enviado", EmailOutbox.fecha_envio: datetime.utcnow()},
+                    synchronize_session=False)
+        )
+    if errores:
+        for email in EmailOutbox.query.filter(EmailOutbox.id.in_(list(errores))):
+            _marcar_error(email, errores[email.id])
+
+    db.session.commit()
+    return len(ok), len(errores)
+
+
+def _marcar_error(email, error):
+    email.intentos = (email.intentos or 0) + 1
+    email.ultimo_error = repr(error)[:300]
+    if email.intentos >= MAX_INTENTOS:
+        email.estado = "fallido"
+    else:
+        email.proximo_intento = datetime.utcnow() + _backoff(email.intentos)
+    print("EMAIL ERROR:", email.asunto, repr(error))
+
+
+@emails_cli.command("procesar")
+@click.option("--lote", default=50, show_default=True, help="Emails por conexión SMTP.")
+@click.option("--intervalo", default=5.0, show_default=True, help="Segundos de espera si la cola está vacía.")
+@click.option("--una-vez", is_flag=True, help="Procesa un solo lote y termina.")
+def procesar(lote, intervalo, una_vez):
+    """Worker: vacía la outbox de emails."""
+    print("worker de emails iniciado")
+    while True:
+        enviados, fallidos = procesar_lote(lote)
+        if enviados or fallidos:
+            print(f"emails: {enviados} enviados, {fallidos} con error")
+        if una_vez:
+            break
+        if enviados + fallidos < lote:
+            time.sleep(intervalo)
@@ -0,0 +1,123 @@
+# services/paginacion.py
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import and_, or_, DateTime, Float, Integer, Numeric
+
+TOTAL_TTL = 60
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def modo_cursor(args):
+    """Paginado por cursor es opt-in: alcanza con mandar ?cursor= (vacío = primera página)."""
+    return "cursor" in args
+
+
+def _a_json(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def codificar_cursor(valor, id_):
+    raw = json.dumps([_a_json(valor), id_], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor, columna):
+    """Devuelve (valor, id) con el valor convertido al tipo de la columna de orden."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valor, id_ = json.loads(raw)
+        id_ = int(id_)
+        if valor is not None:
+            if isinstance(columna.type, DateTime):
+                valor = datetime.fromisoformat(valor)
+            elif isinstance(columna.type, Float):
+                valor = float(valor)
+            elif isinstance(columna.type, Numeric):
+                valor = Decimal(str(valor))
+            elif isinstance(columna.type, Integer) and not isinstance(valor, int):
+                raise ValueError(valor)
+        return valor, id_
+    except Exception:
+        raise CursorInvalido("cursor inválido")
+
+
+def aplicar_orden(query, columna, col_id, descendente):
+    if descendente:
+        return query.order_by(columna.desc(), col_id.desc())
+    return query.order_by(columna.asc(), col_id.asc())
+
+
+def predicado_seek(columna, col_id, valor, id_, descendente):
+    """
+    WHERE para "después de (valor, id)" en el orden (columna, id).
+    NULL se toma como el menor valor (igual que MySQL y SQLite al ordenar).
+    """
+    if descendente:
+        if valor is None:
+            return and_(columna.is_(None), col_id < id_)
+        return or_(
+            columna < valor,
+            columna.is_(None),
+            and_(columna == valor, col_id < id_),
+        )
+
+    if valor is None:
+        return or_(columna.isnot(None), and_(columna.is_(None), col_id > id_))
+    return or_(columna > valor, and_(columna == valor, col_id > id_))
+
+
+def paginar_cursor(query, columna, col_id, descendente, cursor, per_page, clave_de):
+    """
+    Aplica orden + seek y trae per_page + 1 filas para saber si hay más.
+    `clave_de(fila)` devuelve (valor de la columna de orden, id) de una fila.
+    Devuelve (filas, next_cursor).
+    """
+    if cursor:
+        valor, id_ = decodificar_cursor(cursor, columna)
+        query = query.filter(predicado_seek(columna, col_id, valor, id_, descendente))
+
+    filas = aplicar_orden(query, columna, col_id, descendente).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(filas) > per_page:
+        filas = filas[:per_page]
+        next_cursor = codificar_cursor(*clave_de(filas[-1]))
+    return filas, next_cursor
+
+
+def clave_filtros(prefijo, args):
+    """Clave estable de los filtros de un listado (sin cursor ni tamaño de página)."""
+    params = sorted(
+        (k, v.strip()) for k, v in args.items(multi=True)
+        if k not in ("cursor", "page", "per_page") and v.strip() != ""
+    )
+    return f"{prefijo}:{params}"
+
+
+def total_cacheado(clave, query):
+    """
+    COUNT(*) cacheado por TOTAL_TTL segundos para el modo cursor: el scroll
+    infinito no paga un count por página. Es un total aproximado.
+    """
+    from extension import cache
+
+    key = f"count:{clave}"
+    if cache.backend is not None:
+        total = cache.backend.get(key)
+        if total is not None:
+            return total
+
+    total = query.order_by(None).count()
+    if cache.backend is not None:
+        cache.backend.set(key, total, TOTAL_TTL)
+    return total
@@ -0,0 +1,326 @@
+# services/pagos_mp.py
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+import mercadopago
+from flask.cli import AppGroup
+from mercadopago.http.http_client import HttpClient
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import MpNotificacion, Pago, Pedido, Usuario
+from services.pedidos import refrescar_resumen
+from services.notifications import (
+    send_user_payment_approved,
+    send_user_payment_rejected,
+    send_admin_payment_approved,
+)
+
+MP_API_URL = "https://api.mercadopago.com"
+MAX_INTENTOS = 8
+BACKOFF_BASE_SEGUNDOS = 30
+# un lote reclamado queda fuera de la cola este tiempo; si el worker muere, se retoma
+LEASE_SEGUNDOS = 300
+
+mp_cli = AppGroup("mp", help="Notificaciones de Mercado Pago (procesamiento en segundo plano).")
+
+
+class _HttpClientBaseUrl(HttpClient):
+    """HttpClient del SDK apuntando a otra base (MP_API_URL), p. ej. una API fake local."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        if url.startswith(MP_API_URL):
+            url = self.base_url + url[len(MP_API_URL):]
+        return super().request(method, url, maxretries=maxretries, **kwargs)
+
+
+def crear_sdk():
+    base_url = os.getenv("MP_API_URL")
+    http_client = _HttpClientBaseUrl(base_url) if base_url else None
+    return mercadopago.SDK(str(os.getenv("MP_ACCESS_TOKEN")), http_client=http_client)
+
+
+sdk = crear_sdk()
+
+
+# =====================================================
+# Ingesta (lo que corre dentro del webhook)
+# =====================================================
+def registrar_notificacion(payment_id, action, data):
+    """
+    Guarda la notificación cruda, una fila por (payment_id, action).
+    Si ya existía se vuelve a dejar pendiente: MP reintenta y manda varios
+    payment.updated, el worker los junta en una sola consulta del pago.
+    No hace commit.
+    """
+    payment_id = str(payment_id)
+    action = action or ""
+    payload = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    ahora = datetime.utcnow()
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(MpNotificacion(
+                payment_id=payment_id,
+                action=action,
+                payload=payload,
+                proximo_intento=ahora,
+                fecha_recepcion=ahora,
+            ))
+        return True
+    except IntegrityError:
+        pass
+
+    (
+        MpNotificacion.query
+        .filter_by(payment_id=payment_id, action=action)
+        .update({
+            MpNotificacion.estado: "pendiente",
+            MpNotificacion.recibidas: MpNotificacion.recibidas + 1,
+            MpNotificacion.intentos: 0,
+            MpNotificacion.proximo_intento: ahora,
+            MpNotificacion.fecha_recepcion: ahora,
+            MpNotificacion.payload: payload,
+        }, synchronize_session=False)
+    )
+    return False
+
+
+# =====================================================
+# Transiciones (lo que antes hacía el webhook en línea)
+# =====================================================
+def aplicar_pago(payment_id, pago):
+    """
+    Aplica el pago de MP (dict de /v1/payments/{id}) sobre Pago y Pedido y
+    encola los mails. No hace commit. Devuelve un estado corto para el log.
+    """
+    if not pago:
+        return "no_response"
+
+    referencia = pago.get("external_reference")
+    if not referencia:
+        return "no_external_reference"
+
+    pago_reg = Pago.query.get(int(referencia))
+    if not pago_reg:
+        return "pago_not_found"
+
+    # idempotencia
+    if pago_reg.id_pago_mp == str(payment_id):
+        return "ok"
+
+    pedido = Pedido.query.get(pago_reg.pedido_id)
+    if not pedido:
+        return "pedido_not_found"
+
+    previous_estado = pago_reg.estado #guardar para el mail
+
+    estado = pago.get("status")
+    pago_reg.id_pago_mp = str(payment_id)
+    pago_reg.estado = estado
+    pago_reg.detalle_estado = pago.get("status_detail")
+    pago_reg.monto = pago.get("transaction_amount")
+    pago_reg.metodo_pago = (pago.get("payment_method") or {}).get("id")
+    pago_reg.tipo_pago = pago.get("payment_type_id")
+    pago_reg.id_orden_mercante = str((pago.get("order") or {}).get("id"))
+
+    if estado == "approved":
+        if pedido.estado == "EXPIRADO":
+            # pago aprobado pero pedido vencido → revisión manual
+            pedido.estado = "REVISAR"   # o "PAGO_TARDE"
+        else:
+            pedido.estado = "PAGADO"
+            pedido.stock_state = "confirmed"
+            pedido.expires_at = None
+
+    elif estado in ("pending", "in_process", "in_mediation"):
+        pedido.estado = "PENDIENTE_PAGO"
+
+    elif estado == "rejected":
+        pedido.estado = "RECHAZADO"
+    else:
+        pedido.estado = "PENDIENTE_PAGO"
+
+    # ✅ Envío de mails solo si cambió el estado.
+    # Se encolan en la outbox y se guardan en el mismo commit que el pago,
+    # junto con los flags de deduplicación.
+    if estado != previous_estado:
+        usuario = Usuario.query.get(pedido.usuario_id)
+
+        if estado == "approved":
+            # Usuario
+            if usuario and (pago_reg.ultimo_estado_notificado != "approved"):
+                send_user_payment_approved(usuario, pedido, pago_reg)
+
+            # Admin
+            if usuario and not pago_reg.notificado_admin:
+                send_admin_payment_approved(pedido, pago_reg, usuario)
+
+            pago_reg.ultimo_estado_notificado = "approved"
+            pago_reg.notificado_user = True
+            pago_reg.notificado_admin = True
+
+        elif estado == "rejected":
+            if usuario and (pago_reg.ultimo_estado_notificado != "rejected"):
+                send_user_payment_rejected(usuario, pedido, pago_reg)
+
+            pago_reg.ultimo_estado_notificado = "rejected"
+            pago_reg.notificado_user = True
+
+    refrescar_resumen([pedido.id])
+    return "ok"
+
+
+# =====================================================
+# Worker
+# =====================================================
+def _backoff(intentos):
+    return timedelta(seconds=BACKOFF_BASE_SEGUNDOS * (2 ** (intentos - 1)))
+
+
+def _reclamar(limite):
+    """
+    Toma un lote de notificaciones vencidas y lo commitea con proximo_intento =
+    ahora + LEASE_SEGUNDOS: los demás workers no lo ven y no queda ningún lock
+    tomado mientras se consulta MP. En MySQL el SELECT va con SKIP LOCKED; en
+    el resto el UPDATE condicional decide quién se queda con cada fila.
+    Devuelve [(id, payment_id)].
+    """
+    ahora = datetime.utcnow()
+    query = (
+        db.session.query(MpNotificacion.id)
+        .filter(MpNotificacion.estado == "pendiente", MpNotificacion.proximo_intento <= ahora)
+        .order_by(MpNotificacion.proximo_intento, MpNotificacion.id)
+        .limit(limite)
+    )
+    if db.engine.dialect.name == "mysql":
+        query = query.with_for_update(skip_locked=True)
+    ids = [i for (i,) in query.all()]
+    if not ids:
+        db.session.commit()
+        return []
+
+    lease = ahora + timedelta(seconds=LEASE_SEGUNDOS)
+    if db.engine.dialect.name == "mysql":
+        # DATETIME sin fracción: para compararlo abajo (ahí las filas ya están lockeadas)
+        lease = lease.replace(microsecond=0)
+    (
+        MpNotificacion.query
+        .filter(
+            MpNotificacion.id.in_(ids),
+            MpNotificacion.estado == "pendiente",
+            MpNotificacion.proximo_intento <= ahora,
+        )
+        .update({MpNotificacion.proximo_intento: lease}, synchronize_session=False)
+    )
+    filas = (
+        db.session.query(MpNotificacion.id, MpNotificacion.payment_id)
+        .filter(MpNotificacion.id.in_(ids), MpNotificacion.proximo_intento == lease)
+        .order_by(MpNotificacion.id)
+        .all()
+    )
+    db.session.commit()
+    return filas
+
+
+def _marcar_error(notificaciones, error):
+    for n in notificaciones:
+        n.intentos = (n.intentos or 0) + 1
+        n.ultimo_error = repr(error)[:300]
+        if n.intentos >= MAX_INTENTOS:
+            n.estado = "fallido"
+        else:
+            n.proximo_intento = datetime.utcnow() + _backoff(n.intentos)
+    if notificaciones:
+        print("ERROR WEBHOOK:", notificaciones[0].payment_id, repr(error))
+
+
+def _consultar(payment_id):
+    """GET /v1/payments/{id}. Sin transacción abierta: puede tardar lo que tarde MP."""
+    pago_info = sdk.payment().get(payment_id) or {}
+    status = pago_info.get("status")
+    if status is not None and (status == 429 or status >= 500):
+        raise RuntimeError(f"MP respondió {status}")
+    return pago_info.get("response") or {}
+
+
+def procesar_lote(limite=50):
+    """
+    Procesa un lote de notificaciones. Las de un mismo pago se juntan: se
+    consulta MP una vez y se aplica el estado actual.
+
+    El lote se reclama y commitea antes de llamar a MP, y cada pago se aplica
+    en su propia transacción corta después de la consulta: ningún lock queda
+    tomado durante el HTTP y un error en un pago no pisa los demás. Si llega
+    otra notificación del pago mientras se consulta, queda pendiente para la
+    próxima vuelta.
+    Devuelve (pagos procesados, pagos con error).
+    """
+    lote = _reclamar(limite)
+    if not lote:
+        return 0, 0
+
+    por_pago = {}
+    for id_, payment_id in lote:
+        por_pago.setdefault(payment_id, []).append(id_)
+
+    procesados = errores = 0
+    for payment_id, ids in por_pago.items():
+        consultado = datetime.utcnow()
+        try:
+            pago = _consultar(payment_id)
+            resultado = aplicar_pago(payment_id, pago)
+
+            # las reclamadas y otras del mismo pago recibidas antes de la
+            # consulta (p. ej. en backoff) quedan cubiertas por este estado
+            (
+                MpNotificacion.query
+                .filter(
+                    MpNotificacion.payment_id == payment_id,
+                    or_(MpNotificacion.id.in_(ids), MpNotificacion.estado == "pendiente"),
+                    MpNotificacion.fecha_recepcion <= consultado,
+                )
+                .update({
+                    MpNotificacion.estado: "procesado",
+                    MpNotificacion.resultado: resultado,
+                    MpNotificacion.fecha_proceso: consultado,
+                }, synchronize_session=False)
+            )
+            db.session.commit()
+            procesados += 1
+        except Exception as e:
+            db.session.rollback()
+            _marcar_error(
+                MpNotificacion.query
+                .filter(MpNotificacion.id.in_(ids), MpNotificacion.fecha_recepcion <= consultado)
+                .all(),
+                e,
+            )
+            db.session.commit()
+            errores += 1
+
+    return procesados, errores
+
+
+@mp_cli.command("procesar")
+@click.option("--lote", default=50, show_default=True, help="Notificaciones por vuelta.")
+@click.option("--intervalo", default=2.0, show_default=True, help="Segundos de espera si la cola está vacía.")
+@click.option("--una-vez", is_flag=True, help="Procesa un solo lote y termina.")
+def procesar(lote, intervalo, una_vez):
+    """Worker: aplica las notificaciones de pago pendientes."""
+    print("worker de Mercado Pago iniciado")
+    while True:
+        procesados, errores = procesar_lote(lote)
+        if procesados or errores:
+            print(f"mp: {procesados} pagos procesados, {errores} con error")
+        if una_vez:
+            break
+        if procesados + errores == 0:
+            time.sleep(intervalo)
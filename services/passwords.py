@@ -0,0 +1,216 @@
+# services/passwords.py
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock, queda solo el límite por worker
+    fcntl = None
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# default de werkzeug 3.x (~150 ms por verificación en un core moderno)
+METODO_DEFAULT = "scrypt:32768:8:1"
+
+
+class HashSaturado(RuntimeError):
+    """Hay demasiadas verificaciones en cola: el login responde 503 en vez de apilarse."""
+
+
+class CuposArchivo:
+    """
+    Semáforo entre procesos de la misma máquina: `n` archivos en
+    `directorio`, un cupo por archivo tomado con flock no bloqueante. El
+    lock es del descriptor abierto, así que también separa threads del mismo
+    proceso, y el sistema lo suelta solo si el worker muere.
+    """
+
+    def __init__(self, directorio, nombre, n):
+        os.makedirs(directorio, exist_ok=True)
+        self.rutas = [os.path.join(directorio, f"{nombre}.{i}") for i in range(n)]
+
+    def tomar(self, hasta=None, espera=0.01):
+        """Descriptor del cupo tomado, o None si no hubo lugar (antes de `hasta`, monotonic)."""
+        inicio = os.getpid() % len(self.rutas)
+        orden = self.rutas[inicio:] + self.rutas[:inicio]
+        while True:
+            for ruta in orden:
+                fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except BlockingIOError:
+                    os.close(fd)
+            if hasta is None or time.monotonic() >= hasta:
+                return None
+            time.sleep(espera)
+
+    @staticmethod
+    def soltar(fd):
+        os.close(fd)  # cerrar suelta el flock
+
+
+class Passwords:
+    """
+    Hash de passwords con costo configurable (PASSWORD_METODO, formato de
+    werkzeug: "scrypt:N:r:p" o "pbkdf2:sha256:iteraciones").
+
+    Las verificaciones del login corren en un pool propio de PASSWORD_HILOS
+    threads por worker, con como mucho PASSWORD_COLA_MAX esperando: una ráfaga
+    de logins usa a lo sumo esos cores y el resto del tráfico sigue
+    respondiendo. Pasado el límite (o PASSWORD_TIMEOUT esperando) se corta
+    con HashSaturado. hashlib suelta el GIL mientras calcula scrypt/pbkdf2.
+
+    Con workers sync de gunicorn (un request por proceso) ese semáforo nunca
+    se llena, así que además hay un tope por máquina entre todos los
+    workers: PASSWORD_HILOS_GLOBAL hashes a la vez y PASSWORD_COLA_GLOBAL
+    esperando, con cupos de archivo (flock) en PASSWORD_CUPOS_DIR. Sin lugar
+    en la cola, o sin cupo antes de PASSWORD_TIMEOUT, también HashSaturado.
+    0 hilos globales lo apaga (y en Windows no hay flock: queda apagado).
+    Con sync conviene HILOS_GLOBAL + COLA_GLOBAL menor que la cantidad de
+    workers, para que siempre queden workers libres para el resto del
+    tráfico (benchmarks/login_hash.py --gunicorn N).
+
+    Los hashes con otro método/costo se rehashean en el próximo login exitoso.
+    """
+
+    def __init__(self, app=None):
+        self.metodo = METODO_DEFAULT
+        self.hilos = 2
+        self.cola_max = 32
+        self.timeout = 5.0
+        self.hilos_global = 2
+        self.cola_global = 2
+        self.cupos_dir = os.path.join(tempfile.gettempdir(), "loversplay-passwords")
+        self._prefijo = None
+        self._pool = None
+        self._cupos = None
+        self._cupos_global = None
+        self._cola_global = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("PASSWORD_METODO", METODO_DEFAULT)
+        app.config.setdefault("PASSWORD_HILOS", 2)
+        app.config.setdefault("PASSWORD_COLA_MAX", 32)
+        app.config.setdefault("PASSWORD_TIMEOUT", 5.0)
+        app.config.setdefault("PASSWORD_HILOS_GLOBAL", 2)
+        app.config.setdefault("PASSWORD_COLA_GLOBAL", 2)
+        app.config.setdefault("PASSWORD_CUPOS_DIR", self.cupos_dir)
+        self.configurar(
+            app.config["PASSWORD_METODO"],
+            int(app.config["PASSWORD_HILOS"]),
+            int(app.config["PASSWORD_COLA_MAX"]),
+            float(app.config["PASSWORD_TIMEOUT"]),
+            int(app.config["PASSWORD_HILOS_GLOBAL"]),
+            int(app.config["PASSWORD_COLA_GLOBAL"]),
+            app.config["PASSWORD_CUPOS_DIR"],
+        )
+        app.extensions["passwords"] = self
+
+    def configurar(self, metodo=None, hilos=None, cola_max=None, timeout=None,
+                   hilos_global=None, cola_global=None, cupos_dir=None):
+        with self._lock:
+            if metodo is not None:
+                self.metodo = metodo
+                self._prefijo = None
+            if hilos is not None:
+                self.hilos = hilos
+            if cola_max is not None:
+                self.cola_max = cola_max
+            if timeout is not None:
+                self.timeout = timeout
+            if hilos_global is not None:
+                self.hilos_global = hilos_global
+            if cola_global is not None:
+                self.cola_global = cola_global
+            if cupos_dir is not None:
+                self.cupos_dir = cupos_dir
+            # el pool se rearma al próximo uso con los valores nuevos
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = None
+            self._cupos = threading.BoundedSemaphore(self.hilos + self.cola_max)
+            if self.hilos_global > 0 and fcntl is not None:
+                # "cola": cuántos logins pueden estar adentro (esperando o hasheando) en toda la máquina
+                self._cola_global = CuposArchivo(self.cupos_dir, "cola", self.hilos_global + self.cola_global)
+                self._cupos_global = CuposArchivo(self.cupos_dir, "hash", self.hilos_global)
+            else:
+                self._cola_global = self._cupos_global = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="passwords")
+        return self._pool
+
+    # ------------------------
+    # Hash
+    # ------------------------
+    def hashear(self, password):
+        return generate_password_hash(password, method=self.metodo)
+
+    def necesita_rehash(self, password_hash):
+        if self._prefijo is None:
+            # "scrypt" -> "scrypt:32768:8:1": el prefijo que werkzeug guarda en el hash
+            self._prefijo = generate_password_hash("", method=self.metodo).split("$", 1)[0]
+        return (password_hash or "").split("$", 1)[0] != self._prefijo
+
+    def _en_pool(self, fn, *args):
+        cupos = self._cupos
+        if not cupos.acquire(blocking=False):
+            raise HashSaturado("demasiados logins en cola")
+        tomados = []
+        try:
+            if self._cupos_global is not None:
+                tomados += self._tomar_global(time.monotonic() + self.timeout)
+            futuro = self.pool.submit(fn, *args)
+        except Exception:
+            self._soltar(cupos, tomados)
+            raise
+        futuro.add_done_callback(lambda _: self._soltar(cupos, tomados))
+        try:
+            return futuro.result(timeout=self.timeout)
+        except FuturoTimeout:
+            raise HashSaturado("la verificación tardó demasiado") from None
+
+    def _tomar_global(self, hasta):
+        """[fd de la cola, fd del cupo de hash] entre todos los workers, o HashSaturado."""
+        cola = self._cola_global.tomar()
+        if cola is None:
+            raise HashSaturado("demasiados logins en cola (todos los workers)")
+        cupo = self._cupos_global.tomar(hasta)
+        if cupo is None:
+            CuposArchivo.soltar(cola)
+            raise HashSaturado("la verificación tardó demasiado")
+        return [cola, cupo]
+
+    @staticmethod
+    def _soltar(cupos, tomados):
+        for fd in tomados:
+            CuposArchivo.soltar(fd)
+        cupos.release()
+
+    def verificar(self, password_hash, password):
+        """check_password_hash en el pool acotado. Tira HashSaturado si no hay lugar."""
+        return self._en_pool(check_password_hash, password_hash, password)
+
+    def rehashear(self, password):
+        """Hash nuevo con el costo actual, también en el pool."""
+        return self._en_pool(self.hashear, password)
+
+
+def hash_password(password):
+    """Hash con el método configurado (o el default si no hay app)."""
+    from flask import current_app, has_app_context
+
+    if has_app_context() and "passwords" in current_app.extensions:
+        return current_app.extensions["passwords"].hashear(password)
+    return generate_password_hash(password, method=METODO_DEFAULT)
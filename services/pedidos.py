@@ -0,0 +1,148 @@
+# services/pedidos.py
+import json
+
+from sqlalchemy import and_, func, update
+
+from database import db
+from models import Pago, Pedido, PedidoDetalle, PedidoResumen, Producto, Usuario
+
+
+def ultimo_estado_pago_por_pedido(pedido_ids):
+    """{pedido_id: estado del último Pago (por fecha_creacion)} en 1 query."""
+    if not pedido_ids:
+        return {}
+
+    ultimos = (
+        db.session.query(Pago.pedido_id, func.max(Pago.fecha_creacion).label("fecha"))
+        .filter(Pago.pedido_id.in_(pedido_ids))
+        .group_by(Pago.pedido_id)
+        .subquery()
+    )
+    rows = (
+        db.session.query(Pago.pedido_id, Pago.estado)
+        .join(ultimos, and_(Pago.pedido_id == ultimos.c.pedido_id, Pago.fecha_creacion == ultimos.c.fecha))
+        .order_by(Pago.id)  # empate de fecha: gana el último id
+        .all()
+    )
+    return {pedido_id: estado for pedido_id, estado in rows}
+
+
+def detalles_por_pedido(pedido_ids):
+    """{pedido_id: [{"producto", "cantidad", "subtotal"}]} con el nombre del producto (1 query)."""
+    if not pedido_ids:
+        return {}
+
+    rows = (
+        db.session.query(PedidoDetalle.pedido_id, Producto.nombre, PedidoDetalle.cantidad, PedidoDetalle.subtotal)
+        .outerjoin(Producto, Producto.id == PedidoDetalle.producto_id)
+        .filter(PedidoDetalle.pedido_id.in_(pedido_ids))
+        .order_by(PedidoDetalle.pedido_id, PedidoDetalle.id)
+        .all()
+    )
+    resultado = {}
+    for pedido_id, nombre, cantidad, subtotal in rows:
+        resultado.setdefault(pedido_id, []).append({
+            "producto": nombre,
+            "cantidad": cantidad,
+            "subtotal": subtotal,
+        })
+    return resultado
+
+
+def refrescar_resumen(pedido_ids):
+    """
+    Recalcula la fila de pedidos_resumen de esos pedidos desde las tablas
+    fuente (4 queries sin importar cuántos). No hace commit: va en la misma
+    transacción que la escritura que lo disparó.
+    """
+    ids = list({int(pid) for pid in pedido_ids if pid is not None})
+    if not ids:
+        return
+
+    pedidos = (
+        db.session.query(
+            Pedido.id, Pedido.usuario_id, Pedido.fecha, Pedido.estado,
+            Pedido.total, Pedido.costo_envio, Usuario.email,
+        )
+        .outerjoin(Usuario, Usuario.id == Pedido.usuario_id)
+        .filter(Pedido.id.in_(ids))
+        .all()
+    )
+    estados_pago = ultimo_estado_pago_por_pedido(ids)
+    detalles = detalles_por_pedido(ids)
+    existentes = {
+        r.pedido_id: r for r in PedidoResumen.query.filter(PedidoResumen.pedido_id.in_(ids)).all()
+    }
+
+    for p in pedidos:
+        resumen = existentes.pop(p.id, None)
+        if resumen is None:
+            resumen = PedidoResumen(pedido_id=p.id)
+            db.session.add(resumen)
+
+        items = detalles.get(p.id, [])
+        resumen.usuario_id = p.usuario_id
+        resumen.email = p.email
+        resumen.fecha = p.fecha
+        resumen.estado = p.estado
+        resumen.total = p.total
+        resumen.costo_envio = p.costo_envio
+        resumen.estado_pago = estados_pago.get(p.id)
+        resumen.cantidad_items = sum(int(i["cantidad"] or 0) for i in items)
+        resumen.productos = ", ".join(i["producto"] or "" for i in items)
+        resumen.detalles = json.dumps(
+            [
+                {
+                    "producto": i["producto"],
+                    "cantidad": i["cantidad"],
+                    "subtotal": str(i["subtotal"]) if i["subtotal"] is not None else None,
+                }
+                for i in items
+            ],
+            ensure_ascii=False,
+        )
+
+    # pedidos que ya no existen
+    for resumen in existentes.values():
+        db.session.delete(resumen)
+
+
+def refrescar_resumen_de_usuario(usuario_id, email):
+    """El email del cliente cambió: lo pisa en sus filas de pedidos_resumen (1 UPDATE). No hace commit."""
+    db.session.execute(
+        update(PedidoResumen)
+        .where(PedidoResumen.usuario_id == usuario_id)
+        .values(email=email)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def refrescar_resumen_de_producto(producto_id, lote=500):
+    """
+    El nombre del producto cambió: recalcula el resumen de los pedidos que lo
+    tienen, de a `lote` pedidos. No hace commit.
+    """
+    ids = [
+        pid for (pid,) in db.session.query(PedidoDetalle.pedido_id)
+        .filter(PedidoDetalle.producto_id == producto_id)
+        .distinct()
+        .all()
+    ]
+    for i in range(0, len(ids), lote):
+        refrescar_resumen(ids[i:i + lote])
+
+
+def resumen_a_dict(r):
+    return {
+        "id": r.pedido_id,
+        "estado": r.estado,
+        "total": r.total,
+        "costo_envio": r.costo_envio,
+        "fecha": r.fecha.isoformat() if r.fecha else None,
+        "email": r.email,
+        "usuario_id": r.usuario_id,
+        "estado_pago": r.estado_pago,
+        "cantidad_items": r.cantidad_items,
+        "productos": r.productos,
+        "detalles": json.loads(r.detalles) if r.detalles else [],
+    }
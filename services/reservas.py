@@ -0,0 +1,125 @@
+# services/reservas.py
+from datetime import datetime
+
+from sqlalchemy import case, func, update
+
+from database import db
+from models import Pedido, PedidoDetalle, PedidoResumen, Producto
+
+LOTE_EXPIRACION = 200
+
+
+def _reclamar_vencidos(ahora, limite):
+    """
+    Ids + stock_state de un lote de pedidos vencidos. En MySQL con
+    FOR UPDATE SKIP LOCKED: dos corridas a la vez no toman los mismos.
+    """
+    query = (
+        db.session.query(Pedido.id, Pedido.stock_state)
+        .filter(Pedido.estado == "PENDIENTE_PAGO")
+        .filter(Pedido.expires_at.isnot(None))
+        .filter(Pedido.expires_at < ahora)
+        .order_by(Pedido.expires_at, Pedido.id)
+        .limit(limite)
+    )
+    if db.engine.dialect.name == "mysql":
+        query = query.with_for_update(skip_locked=True)
+    return query.all()
+
+
+def expirar_lote(ahora=None, limite=LOTE_EXPIRACION):
+    """
+    Expira un lote de pedidos vencidos en una transacción y la commitea.
+    El stock vuelve con un solo UPDATE productos ... CASE con las cantidades
+    sumadas por producto. Devuelve (expired_ids, released_stock_for).
+
+    El UPDATE de pedidos vuelve a exigir estado PENDIENTE_PAGO: fuera de
+    MySQL el SELECT no lockea, y un pago que entró entre el SELECT y el
+    UPDATE no se pisa. Las filas que ese UPDATE cambió quedan marcadas
+    EXPIRANDO (solo visible dentro de esta transacción) y el stock se
+    devuelve solo por ellas.
+    """
+    ahora = ahora or datetime.utcnow()
+
+    filas = _reclamar_vencidos(ahora, limite)
+    if not filas:
+        db.session.commit()
+        return [], []
+
+    db.session.execute(
+        update(Pedido)
+        .where(
+            Pedido.id.in_([pid for pid, _ in filas]),
+            Pedido.estado == "PENDIENTE_PAGO",
+            Pedido.expires_at < ahora,
+        )
+        .values(estado="EXPIRANDO")
+        .execution_options(synchronize_session=False)
+    )
+    filas = (
+        db.session.query(Pedido.id, Pedido.stock_state)
+        .filter(Pedido.id.in_([pid for pid, _ in filas]), Pedido.estado == "EXPIRANDO")
+        .order_by(Pedido.id)
+        .all()
+    )
+    if not filas:
+        db.session.commit()
+        return [], []
+
+    expired_ids = [pid for pid, _ in filas]
+    # idempotencia: si ya se liberó el stock, no repetir
+    reservados = [pid for pid, stock_state in filas if stock_state == "reserved"]
+
+    if reservados:
+        devolver = dict(
+            db.session.query(PedidoDetalle.producto_id, func.sum(PedidoDetalle.cantidad))
+            .filter(PedidoDetalle.pedido_id.in_(reservados))
+            .group_by(PedidoDetalle.producto_id)
+            .all()
+        )
+        if devolver:
+            db.session.execute(
+                update(Producto)
+                .where(Producto.id.in_(list(devolver)))
+                .values(stock=Producto.stock + case({pid: int(n) for pid, n in devolver.items()}, value=Producto.id, else_=0))
+                .execution_options(synchronize_session=False)
+            )
+
+    db.session.execute(
+        update(Pedido)
+        .where(Pedido.id.in_(expired_ids), Pedido.estado == "EXPIRANDO")
+        .values(
+            estado="EXPIRADO",
+            stock_state=case((Pedido.stock_state == "reserved", "released"), else_=Pedido.stock_state),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(PedidoResumen)
+        .where(PedidoResumen.pedido_id.in_(expired_ids))
+        .values(estado="EXPIRADO")
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if reservados:
+        from extension import cache
+        cache.bump_stock()
+    return expired_ids, reservados
+
+
+def expirar_vencidos(ahora=None, limite=LOTE_EXPIRACION, max_lotes=None):
+    """
+    Expira todos los pedidos vencidos de a `limite` por transacción (cada lote
+    bloquea productos un rato corto). Devuelve (expired_ids, released_stock_for).
+    """
+    ahora = ahora or datetime.utcnow()
+    expired_ids, released = [], []
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        ids, liberados = expirar_lote(ahora, limite)
+        expired_ids += ids
+        released += liberados
+        lotes += 1
+        if len(ids) < limite:
+            break
+    return expired_ids, released
@@ -0,0 +1,160 @@
+# services/revocaciones.py
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def _epoch(dt):
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+class RevocacionTokens:
+    """
+    Blocklist de JWT por `jti` (logout).
+
+    La tabla tokens_revocados es la fuente de verdad; cada worker tiene una
+    copia en memoria (jti -> vencimiento), así el chequeo de cada request
+    autenticado es un lookup en un dict, sin ir a la DB.
+
+    Un thread por worker trae cada REVOCACION_SYNC_SEGUNDOS las revocaciones
+    nuevas de los demás workers (por revocado_en, con solapamiento) y saca de
+    memoria lo vencido; cada REVOCACION_PURGA_SEGUNDOS borra de la tabla los
+    tokens que ya vencieron (ahí el JWT se rechaza solo por `exp`).
+
+    Un logout vale al instante en el worker que lo atendió y en los demás a
+    más tardar en un intervalo de sync.
+    """
+
+    # revocaciones commiteadas tarde (transacciones largas) no se pierden
+    SOLAPAMIENTO = timedelta(seconds=30)
+
+    def __init__(self, app=None):
+        self.app = None
+        self.sync = 5
+        self.purga = 600
+        self.vida_token = 86400
+        self._revocados = {}  # jti -> exp (epoch)
+        self._cargado = False
+        self._ultimo_sync = None
+        self._ultima_purga = 0.0
+        self._lock = threading.Lock()
+        self._thread_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("REVOCACION_SYNC_SEGUNDOS", 5)
+        app.config.setdefault("REVOCACION_PURGA_SEGUNDOS", 600)
+
+        self.app = app
+        self.sync = float(app.config["REVOCACION_SYNC_SEGUNDOS"])
+        self.purga = float(app.config["REVOCACION_PURGA_SEGUNDOS"])
+        expira = app.config.get("JWT_ACCESS_TOKEN_EXPIRES")
+        if isinstance(expira, timedelta):
+            self.vida_token = expira.total_seconds()
+        app.extensions["revocaciones"] = self
+        app.before_request(self._asegurar_thread)
+
+    # ------------------------
+    # API
+    # ------------------------
+    def revocado(self, jti):
+        """¿Está revocado? Lookup en memoria (la primera vez en el worker, carga la tabla)."""
+        if not self._cargado:
+            self.sincronizar(completo=True)
+        return jti in self._revocados
+
+    def revocar(self, jti, exp=None, usuario_id=None):
+        """Guarda la revocación y la commitea. `exp` es el claim del token (epoch)."""
+        from database import db
+        from models import TokenRevocado
+
+        if exp is None:
+            exp = time.time() + self.vida_token
+        db.session.merge(TokenRevocado(
+            jti=jti,
+            usuario_id=usuario_id,
+            expira=datetime.utcfromtimestamp(exp),
+            revocado_en=datetime.utcnow(),
+        ))
+        db.session.commit()
+        with self._lock:
+            self._revocados[jti] = float(exp)
+
+    def cantidad(self):
+        return len(self._revocados)
+
+    # ------------------------
+    # Sync con la DB
+    # ------------------------
+    def sincronizar(self, completo=False):
+        """Trae de la tabla lo vigente (todo, o lo revocado desde el último sync). Requiere app context."""
+        from database import db
+        from models import TokenRevocado
+
+        ahora = datetime.utcnow()
+        query = db.session.query(TokenRevocado.jti, TokenRevocado.expira).filter(TokenRevocado.expira > ahora)
+        if not completo and self._ultimo_sync is not None:
+            query = query.filter(TokenRevocado.revocado_en >= self._ultimo_sync - self.SOLAPAMIENTO)
+        filas = query.all()
+
+        # nunca se des-revoca: siempre se agrega, lo vencido se saca en `_purgar_memoria`
+        with self._lock:
+            for jti, expira in filas:
+                self._revocados[jti] = _epoch(expira)
+            self._ultimo_sync = ahora
+            self._cargado = True
+        return len(filas)
+
+    def _purgar_memoria(self):
+        ahora = time.time()
+        with self._lock:
+            vencidos = [jti for jti, exp in self._revocados.items() if exp <= ahora]
+            for jti in vencidos:
+                del self._revocados[jti]
+        return len(vencidos)
+
+    def purgar(self):
+        """Borra de la tabla los tokens ya vencidos. Requiere app context."""
+        from database import db
+        from models import TokenRevocado
+
+        n = (
+            TokenRevocado.query
+            .filter(TokenRevocado.expira < datetime.utcnow())
+            .delete(synchronize_session=False)
+        )
+        db.session.commit()
+        return n
+
+    # ------------------------
+    # Thread de barrido
+    # ------------------------
+    def _asegurar_thread(self):
+        # el thread se arranca en el proceso del worker (no en el master de gunicorn)
+        if self._thread_pid == os.getpid() or self.app is None:
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._loop, name="revocaciones-sync", daemon=True).start()
+
+    def _loop(self):
+        from database import db
+
+        while True:
+            time.sleep(self.sync)
+            try:
+                with self.app.app_context():
+                    try:
+                        self.sincronizar()
+                        self._purgar_memoria()
+                        if time.monotonic() - self._ultima_purga > self.purga:
+                            self.purgar()
+                            self._ultima_purga = time.monotonic()
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                print("ERROR REVOCACIONES:", repr(e))
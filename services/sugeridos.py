@@ -0,0 +1,227 @@
+# services/sugeridos.py
+import heapq
+import threading
+import time
+from bisect import insort
+
+
+class SugeridosIndex:
+    """
+    Índice en memoria (por worker) de productos sugeridos.
+
+    Para cada categoría guarda sus productos activos ordenados por
+    (vistas desc, valoracion desc); los sugeridos de un producto salen de
+    mezclar las listas de sus categorías. El top de cada producto se calcula
+    a demanda y se invalida solo para los productos que comparten categoría
+    con el que cambió.
+
+    Se recarga completo cuando cambia la versión del catálogo o vence el TTL
+    (así se ven los cambios hechos por otros workers).
+    """
+
+    def __init__(self, app=None, limite=8):
+        self.limite = limite
+        self.ttl = 300
+        self._lock = threading.RLock()
+        self._productos = {}    # pid -> campos para el front
+        self._cats_de = {}      # pid -> set(categoria_id)
+        self._por_cat = {}      # categoria_id -> [(-vistas, -valoracion, pid)] ordenado
+        self._categorias = {}   # categoria_id -> {"id", "nombre", "slug"}
+        self._top = {}          # pid -> [pid sugeridos]
+        self._version = None
+        self._cargado_en = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SUGERIDOS_TTL", 300)
+        self.ttl = float(app.config["SUGERIDOS_TTL"])
+        app.extensions["sugeridos_index"] = self
+
+    # ------------------------
+    # Carga
+    # ------------------------
+    @staticmethod
+    def _clave(campos):
+        return (-(campos["vistas"] or 0), -float(campos["valoracion_promedio"] or 0), campos["id"])
+
+    @staticmethod
+    def _campos(row):
+        return {
+            "id": row.id,
+            "precio": row.precio,
+            "nombre": row.nombre,
+            "extra": row.extra,
+            "url_imagen_principal": row.url_imagen_principal,
+            "vistas": row.vistas,
+            "valoracion_promedio": row.valoracion_promedio,
+        }
+
+    @staticmethod
+    def _columnas():
+        from models import Producto
+
+        return (
+            Producto.id, Producto.precio, Producto.nombre, Producto.extra,
+            Producto.url_imagen_principal, Producto.vistas, Producto.valoracion_promedio,
+        )
+
+    def cargar(self):
+        from database import db
+        from extension import cache
+        from models import Producto, Categoria, producto_categoria
+
+        productos = (
+            db.session.query(*self._columnas())
+            .filter(Producto.activo.is_(True))
+            .all()
+        )
+        pivote = db.session.execute(
+            db.select(producto_categoria.c.producto_id, producto_categoria.c.categoria_id)
+        ).all()
+        categorias = db.session.query(Categoria.id, Categoria.nombre, Categoria.slug).all()
+
+        with self._lock:
+            self._productos = {r.id: self._campos(r) for r in productos}
+            self._categorias = {c.id: {"id": c.id, "nombre": c.nombre, "slug": c.slug} for c in categorias}
+            self._cats_de = {}
+            for pid, cid in pivote:
+                if pid in self._productos:
+                    self._cats_de.setdefault(pid, set()).add(cid)
+
+            self._por_cat = {}
+            for pid, cats in self._cats_de.items():
+                clave = self._clave(self._productos[pid])
+                for cid in cats:
+                    self._por_cat.setdefault(cid, []).append(clave)
+            for lista in self._por_cat.values():
+                lista.sort()
+
+            self._top = {}
+            self._version = cache.version()
+            self._cargado_en = time.monotonic()
+
+    def _asegurar_cargado(self):
+        from extension import cache
+
+        if (
+            self._version != cache.version()
+            or time.monotonic() - self._cargado_en > self.ttl
+        ):
+            self.cargar()
+
+    # ------------------------
+    # Lectura
+    # ------------------------
+    def sugeridos(self, producto_id):
+        """Lista de sugeridos (dicts con campos + categorías) para un producto."""
+        self._asegurar_cargado()
+        with self._lock:
+            top = self._top.get(producto_id)
+            if top is None:
+                top = self._calcular_top(producto_id)
+                self._top[producto_id] = top
+
+            return [
+                {
+                    **self._productos[pid],
+                    "categorias": [
+                        self._categorias[cid]
+                        for cid in sorted(self._cats_de.get(pid, ()))
+                        if cid in self._categorias
+                    ],
+                }
+                for pid in top
+            ]
+
+    def _calcular_top(self, producto_id):
+        cats = self._cats_de.get(producto_id)
+        if not cats:
+            return []
+
+        top = []
+        vistos = {producto_id}
+        for _, _, pid in heapq.merge(*(self._por_cat.get(cid, []) for cid in cats)):
+            if pid in vistos:
+                continue
+            vistos.add(pid)
+            top.append(pid)
+            if len(top) >= self.limite:
+                break
+        return top
+
+    # ------------------------
+    # Actualización incremental
+    # ------------------------
+    def _sacar(self, pid):
+        campos = self._productos.pop(pid, None)
+        cats = self._cats_de.pop(pid, set())
+        if campos is not None:
+            clave = self._clave(campos)
+            for cid in cats:
+                lista = self._por_cat.get(cid)
+                if lista and clave in lista:
+                    lista.remove(clave)
+        return cats
+
+    def _poner(self, campos, cats):
+        pid = campos["id"]
+        self._productos[pid] = campos
+        self._cats_de[pid] = set(cats)
+        clave = self._clave(campos)
+        for cid in cats:
+            insort(self._por_cat.setdefault(cid, []), clave)
+
+    def _invalidar(self, cats):
+        # solo cambian los sugeridos de quienes comparten categoría
+        for cid in cats:
+            for _, _, pid in self._por_cat.get(cid, []):
+                self._top.pop(pid, None)
+
+    def actualizar(self, producto_id):
+        """Recarga un producto desde la DB (categorías, activo, vistas, rating)."""
+        from database import db
+        from extension import cache
+        from models import Producto, producto_categoria
+
+        if self._version is None:
+            return
+
+        row = (
+            db.session.query(*self._columnas())
+            .filter(Producto.id == producto_id, Producto.activo.is_(True))
+            .first()
+        )
+        cats = set()
+        if row is not None:
+            cats = {
+                cid for (cid,) in db.session.execute(
+                    db.select(producto_categoria.c.categoria_id)
+                    .where(producto_categoria.c.producto_id == producto_id)
+                ).all()
+            }
+
+        with self._lock:
+            viejas = self._sacar(producto_id)
+            self._top.pop(producto_id, None)
+            self._invalidar(viejas)
+            if row is not None:
+                self._poner(self._campos(row), cats)
+                self._invalidar(cats)
+            # el bump de esta escritura ya quedó reflejado; si hubo otros en el
+            # medio (otros workers, con Redis) no: que `_asegurar_cargado` recargue
+            version = cache.version()
+            if self._version == version - 1:
+                self._version = version
+
+    def sumar_vistas(self, lote):
+        """Aplica un lote {producto_id: vistas} ya escrito en la DB."""
+        with self._lock:
+            for pid, n in lote.items():
+                campos = self._productos.get(pid)
+                if campos is None:
+                    continue
+                cats = self._sacar(pid)
+                campos = {**campos, "vistas": (campos["vistas"] or 0) + n}
+                self._poner(campos, cats)
+                self._invalidar(cats)
@@ -0,0 +1,98 @@
+# services/vistas.py
+import atexit
+import os
+import threading
+import time
+
+from sqlalchemy import case, func, update
+
+
+class VistasBuffer:
+    """
+    Acumula las vistas de productos en memoria (por worker) y las escribe
+    cada VISTAS_FLUSH_SEGUNDOS con un solo UPDATE ... CASE.
+
+    El orden por `vistas` queda atrasado como mucho un intervalo de flush.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.intervalo = 10
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self._thread_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("VISTAS_FLUSH_SEGUNDOS", 10)
+        self.app = app
+        self.intervalo = float(app.config["VISTAS_FLUSH_SEGUNDOS"])
+        app.extensions["vistas_buffer"] = self
+        # al apagar el worker no se pierden las vistas acumuladas
+        atexit.register(self._flush_con_contexto)
+
+    def sumar(self, producto_id, cantidad=1):
+        with self._lock:
+            self._pendientes[producto_id] = self._pendientes.get(producto_id, 0) + cantidad
+        self._asegurar_thread()
+
+    def pendientes(self):
+        with self._lock:
+            return dict(self._pendientes)
+
+    def flush(self):
+        """Escribe lo acumulado. Requiere app context. Devuelve cuántos productos tocó."""
+        from database import db
+        from models import Producto
+
+        with self._lock:
+            lote, self._pendientes = self._pendientes, {}
+
+        if not lote:
+            return 0
+
+        try:
+            db.session.execute(
+                update(Producto)
+                .where(Producto.id.in_(list(lote)), Producto.activo.is_(True))
+                .values(vistas=func.coalesce(Producto.vistas, 0) + case(lote, value=Producto.id, else_=0))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # devolvemos el lote al buffer para el próximo intento
+            with self._lock:
+                for pid, n in lote.items():
+                    self._pendientes[pid] = self._pendientes.get(pid, 0) + n
+            raise
+
+        from extension import sugeridos_index
+        sugeridos_index.sumar_vistas(lote)
+
+        return len(lote)
+
+    def _flush_con_contexto(self):
+        if self.app is None:
+            return
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception as e:
+            print("ERROR FLUSH VISTAS:", repr(e))
+
+    def _asegurar_thread(self):
+        # el thread se arranca en el proceso del worker (no en el master de gunicorn)
+        if self._thread_pid == os.getpid() or self.app is None:
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._loop, name="vistas-flush", daemon=True).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.intervalo)
+            self._flush_con_contexto()
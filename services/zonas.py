@@ -0,0 +1,202 @@
+# services/zonas.py
+import heapq
+import threading
+import time
+from bisect import bisect_right
+
+
+def _cp_int(cp):
+    try:
+        return int(str(cp).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _tipo(tipo_envio):
+    return str(tipo_envio or "").strip().lower()
+
+
+class ZonasIndex:
+    """
+    Índice en memoria (por worker) de las zonas de envío activas.
+
+    Por cada tipo_envio guarda los rangos de CP como segmentos disjuntos
+    ordenados, así una búsqueda es un bisect (O(log n)). Si dos zonas se
+    solapan gana la de menor id (lo que devolvía el .first() de antes) y el
+    solapamiento queda registrado (ver `solapamientos()`).
+
+    Se recarga completo al cambiar zonas (crear/actualizar/eliminar), cuando
+    cambia la versión del catálogo o vence el TTL.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 300
+        self._lock = threading.Lock()
+        self._por_tipo = {}     # tipo -> (inicios, fines, zonas) de segmentos disjuntos
+        self._solapamientos = []
+        self._version = None
+        self._cargado_en = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("ZONAS_TTL", 300)
+        self.ttl = float(app.config["ZONAS_TTL"])
+        app.extensions["zonas_index"] = self
+
+    # ------------------------
+    # Carga
+    # ------------------------
+    @staticmethod
+    def _segmentos(zonas):
+        """
+        Parte los rangos (posiblemente solapados) en segmentos disjuntos.
+        Devuelve (inicios, fines, zonas_por_segmento, solapamientos).
+
+        Dos barridos por inicio con un heap de zonas abiertas: uno por fin
+        (cada zona se compara con todas las que siguen abiertas, así salen
+        todos los pares) y otro por id (la ganadora de cada segmento es la
+        de menor id todavía abierta). O((n + pares) log n).
+        """
+        zonas = sorted(zonas, key=lambda z: (z["cp_inicio"], z["id"]))
+
+        solapamientos = []
+        abiertas = []  # (cp_fin, id)
+        for z in zonas:
+            while abiertas and abiertas[0][0] < z["cp_inicio"]:
+                heapq.heappop(abiertas)
+            solapamientos += [(otra, z["id"]) for _, otra in sorted(abiertas, key=lambda a: a[1])]
+            heapq.heappush(abiertas, (z["cp_fin"], z["id"]))
+
+        bordes = sorted({z["cp_inicio"] for z in zonas} | {z["cp_fin"] + 1 for z in zonas})
+        inicios, fines, ganadoras = [], [], []
+        activas = []  # (id, cp_fin, zona); las vencidas se sacan recién cuando quedan arriba
+        siguiente = 0
+        for desde, hasta in zip(bordes, bordes[1:]):
+            while siguiente < len(zonas) and zonas[siguiente]["cp_inicio"] <= desde:
+                z = zonas[siguiente]
+                heapq.heappush(activas, (z["id"], z["cp_fin"], z))
+                siguiente += 1
+            while activas and activas[0][1] < desde:
+                heapq.heappop(activas)
+            if not activas:
+                continue
+            ganadora = activas[0][2]
+            if ganadoras and ganadoras[-1] is ganadora and fines[-1] == desde - 1:
+                fines[-1] = hasta - 1
+                continue
+            inicios.append(desde)
+            fines.append(hasta - 1)
+            ganadoras.append(ganadora)
+        return inicios, fines, ganadoras, solapamientos
+
+    def cargar(self):
+        from extension import cache
+        from models import ZonaEnvio
+
+        zonas = ZonaEnvio.query.filter(ZonaEnvio.activa == True).all()
+
+        por_tipo = {}
+        for z in zonas:
+            if z.cp_inicio is None or z.cp_fin is None or z.cp_inicio > z.cp_fin:
+                print("ZONA INVÁLIDA, se ignora:", z.id, z.cp_inicio, z.cp_fin)
+                continue
+            por_tipo.setdefault(_tipo(z.tipo_envio), []).append({
+                "id": z.id,
+                "nombre": z.nombre,
+                "tipo_envio": z.tipo_envio,
+                "cp_inicio": z.cp_inicio,
+                "cp_fin": z.cp_fin,
+                "precio": z.precio,
+            })
+
+        indice, solapamientos = {}, []
+        for tipo, lista in por_tipo.items():
+            inicios, fines, ganadoras, solapadas = self._segmentos(lista)
+            indice[tipo] = (inicios, fines, ganadoras)
+            solapamientos += [{"tipo_envio": tipo, "zonas": par} for par in solapadas]
+
+        if solapamientos:
+            print("ZONAS SOLAPADAS:", solapamientos)
+
+        with self._lock:
+            self._por_tipo = indice
+            self._solapamientos = solapamientos
+            self._version = cache.version()
+            self._cargado_en = time.monotonic()
+
+    def _asegurar_cargado(self):
+        from extension import cache
+
+        if (
+            self._version != cache.version()
+            or time.monotonic() - self._cargado_en > self.ttl
+        ):
+            self.cargar()
+
+    # ------------------------
+    # Lectura
+    # ------------------------
+    @staticmethod
+    def _en(segmentos, cp):
+        inicios, fines, zonas = segmentos
+        i = bisect_right(inicios, cp) - 1
+        if i >= 0 and cp <= fines[i]:
+            return zonas[i]
+        return None
+
+    def solapamientos(self):
+        """Pares de zonas del mismo tipo cuyos rangos se pisan (detectados al cargar)."""
+        self._asegurar_cargado()
+        return list(self._solapamientos)
+
+    def buscar(self, cp, tipo_envio):
+        """Zona activa (dict) que cubre el CP para ese tipo de envío, o None."""
+        cp = _cp_int(cp)
+        if cp is None:
+            return None
+        self._asegurar_cargado()
+        segmentos = self._por_tipo.get(_tipo(tipo_envio))
+        return self._en(segmentos, cp) if segmentos else None
+
+    def buscar_todos(self, cp):
+        """Una zona por tipo de envío que cubra el CP: {tipo_envio: zona}."""
+        cp = _cp_int(cp)
+        if cp is None:
+            return {}
+        self._asegurar_cargado()
+        resultado = {}
+        for tipo, segmentos in self._por_tipo.items():
+            zona = self._en(segmentos, cp)
+            if zona is not None:
+                resultado[tipo] = zona
+        return resultado
+
+    def buscar_lote(self, cps, tipo_envio=None):
+        """
+        Muchos CPs de una: {cp: zona} para un tipo, o {cp: {tipo: zona}} si
+        no se pasa tipo. Los CPs se ordenan y se recorren junto con los
+        segmentos (un solo barrido por tipo).
+        """
+        self._asegurar_cargado()
+        validos = sorted({(_cp_int(cp), cp) for cp in cps if _cp_int(cp) is not None})
+        tipos = [_tipo(tipo_envio)] if tipo_envio is not None else list(self._por_tipo)
+
+        resultado = {cp: ({} if tipo_envio is None else None) for cp in cps}
+        for tipo in tipos:
+            segmentos = self._por_tipo.get(tipo)
+            if not segmentos:
+                continue
+            inicios, fines, zonas = segmentos
+            i = 0
+            for numero, cp in validos:
+                while i < len(inicios) and fines[i] < numero:
+                    i += 1
+                if i == len(inicios):
+                    break
+                if inicios[i] <= numero:
+                    if tipo_envio is None:
+                        resultado[cp][tipo] = zonas[i]
+                    else:
+                        resultado[cp] = zonas[i]
+        return resultado
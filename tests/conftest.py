@@ -0,0 +1,182 @@
+"""
+Fixtures comunes: la app contra una base SQLite temporal (create_all, sin
+migraciones) y un contador de statements SQL.
+
+    python -m pytest -q tests
+"""
+import contextlib
+import os
+import socket
+import sys
+import threading
+import tempfile
+from datetime import datetime
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+_DB = os.path.join(tempfile.mkdtemp(prefix="loversplay-tests-"), "tests.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB}"
+os.environ["RESERVAS_SCHEDULER"] = "false"
+os.environ.setdefault("URL_BASE_IMG", "http://img.test")
+
+# SMTP: el stub de benchmarks/smtp_throughput.py en un puerto libre (fixture `smtp`)
+with socket.socket() as _s:
+    _s.bind(("127.0.0.1", 0))
+    SMTP_PUERTO = _s.getsockname()[1]
+os.environ.update(
+    MAIL_SERVER="127.0.0.1", MAIL_PORT=str(SMTP_PUERTO), MAIL_USE_TLS="false", MAIL_USE_SSL="false",
+    MAIL_DEFAULT_SENDER="tests@localhost",
+)
+os.environ.pop("MAIL_USERNAME", None)
+os.environ.pop("MAIL_PASSWORD", None)
+
+# Mercado Pago: benchmarks/fake_mp_api.py (fixture `fake_mp`); el SDK se arma al importar
+with socket.socket() as _s:
+    _s.bind(("127.0.0.1", 0))
+    MP_PUERTO = _s.getsockname()[1]
+os.environ["MP_API_URL"] = f"http://127.0.0.1:{MP_PUERTO}"
+os.environ["MP_ACCESS_TOKEN"] = "TEST-token"
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app as flask_app
+
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+
+@pytest.fixture
+def db(app):
+    """Tablas vacías y cache del catálogo limpio en cada test."""
+    from database import db as _db
+    from extension import cache
+
+    with app.app_context():
+        _db.drop_all()
+        _db.create_all()
+        cache.backend.clear()
+        yield _db
+        _db.session.remove()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def contar_queries(db):
+    """`with contar_queries() as stmts:` junta los statements que se ejecutan adentro."""
+    from sqlalchemy import event
+
+    @contextlib.contextmanager
+    def contar():
+        stmts = []
+
+        def escuchar(conn, cursor, statement, parameters, context, executemany):
+            stmts.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", escuchar)
+        try:
+            yield stmts
+        finally:
+            event.remove(db.engine, "before_cursor_execute", escuchar)
+
+    return contar
+
+
+@pytest.fixture
+def token(app):
+    """token(usuario_id) -> headers con un JWT válido."""
+    from flask_jwt_extended import create_access_token
+
+    def _token(usuario_id, **claims):
+        with app.app_context():
+            jwt = create_access_token(identity=str(usuario_id), additional_claims=claims or None)
+        return {"Authorization": f"Bearer {jwt}"}
+
+    return _token
+
+
+@pytest.fixture
+def crear_usuario(db):
+    """crear_usuario(rol="cliente", **campos) -> Usuario commiteado (sin hashear: es caro)."""
+    from models import Usuario
+
+    creados = [0]
+
+    def _crear(rol="cliente", **campos):
+        creados[0] += 1
+        campos.setdefault("nombre", f"{rol} {creados[0]}")
+        campos.setdefault("email", f"{rol}{creados[0]}@test.local")
+        u = Usuario(rol=rol, password_hash="sin-hash", **campos)
+        db.session.add(u)
+        db.session.commit()
+        return u
+
+    return _crear
+
+
+@pytest.fixture
+def sembrar_catalogo(db):
+    """sembrar_catalogo(cantidad=30): productos activos con 2 categorías y 3 imágenes cada uno."""
+    from models import Categoria, ImagenProducto, Producto
+
+    def _sembrar(cantidad=30):
+        categorias = [Categoria(nombre=f"Categoría {i}", slug=f"cat-{i}", icon_key="x") for i in range(3)]
+        db.session.add_all(categorias)
+        productos = []
+        for i in range(cantidad):
+            p = Producto(
+                nombre=f"Producto {i}", slug=f"producto-{i}", precio=100 + i, stock=5, vistas=i,
+                activo=True, url_imagen_principal=f"/p{i}.jpg", fecha_creacion=datetime(2024, 1, 1 + i % 28),
+            )
+            p.categorias = [categorias[i % 3], categorias[(i + 1) % 3]]
+            p.imagenes = [ImagenProducto(url_imagen=f"/p{i}_{k}.jpg") for k in range(3)]
+            db.session.add(p)
+            productos.append(p)
+        db.session.commit()
+        return productos
+
+    return _sembrar
+
+
+@pytest.fixture(scope="session")
+def _smtp_server():
+    from benchmarks.smtp_throughput import _Server, _SMTPStub
+
+    server = _Server(("127.0.0.1", SMTP_PUERTO), _SMTPStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield _SMTPStub
+    server.shutdown()
+
+
+@pytest.fixture
+def smtp(_smtp_server):
+    """El stub SMTP con los contadores en cero; `smtp.rechazados` = destinatarios con 550."""
+    _smtp_server.recibidos = _smtp_server.conexiones = 0
+    _smtp_server.latencia = 0.0
+    _smtp_server.rechazados = set()
+    return _smtp_server
+
+
+@pytest.fixture(scope="session")
+def _fake_mp_server():
+    from benchmarks import fake_mp_api
+
+    server = fake_mp_api.servir(MP_PUERTO)
+    yield fake_mp_api
+    server.shutdown()
+
+
+@pytest.fixture
+def fake_mp(_fake_mp_server):
+    """La API fake de MP vacía: cargar pagos en `fake_mp.PAGOS`, errores en `fake_mp.FALLAS`."""
+    for tabla in (_fake_mp_server.PAGOS, _fake_mp_server.CONSULTAS, _fake_mp_server.FALLAS):
+        tabla.clear()
+    _fake_mp_server.FakeMP.latencia = 0.0
+    return _fake_mp_server
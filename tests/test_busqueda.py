@@ -0,0 +1,115 @@
+import pytest
+
+
+@pytest.fixture
+def catalogo(db):
+    """Productos con textos pensados para el ranking; el índice en memoria recién cargado."""
+    from extension import busqueda_index
+    from models import Categoria, Producto
+
+    lubricantes = Categoria(nombre="Lubricantes", slug="lubricantes", icon_key="x")
+    db.session.add(lubricantes)
+
+    def producto(nombre, descripcion="", vistas=0, categorias=(), activo=True):
+        p = Producto(nombre=nombre, slug=nombre.lower().replace(" ", "-"), precio=100, stock=5,
+                     vistas=vistas, activo=activo, descripcion_corta=descripcion)
+        p.categorias = list(categorias)
+        db.session.add(p)
+        return p
+
+    creados = {
+        "gel": producto("Gel Íntimo Frutilla", "a base de agua", vistas=10, categorias=[lubricantes]),
+        "aceite": producto("Aceite de masaje", "con aroma a gel de aloe", vistas=500),
+        "vibrador": producto("Vibrador Rosa", "silicona suave", vistas=50),
+        "inactivo": producto("Gel Viejo", activo=False),
+    }
+    # muchos empates exactos de relevancia (mismo texto y vistas): los desempata el id
+    creados["empates"] = [producto(f"Anillo Silicona {i}", "silicona", vistas=3) for i in range(12)]
+    db.session.commit()
+    busqueda_index.cargar()
+    return creados
+
+
+def test_tokenizar_saca_tildes_y_stopwords_pero_no_la_enie():
+    from services.busqueda import normalizar, tokenizar
+
+    assert normalizar("Íntimo CÓMODO") == "intimo comodo"
+    assert normalizar("Muñeca Niño") == "muñeca niño"
+    assert tokenizar("El gel de la Señora, con 2 tonos!") == ["gel", "señora", "2", "tonos"]
+    assert tokenizar("") == []
+
+
+def test_ranking_pesa_el_nombre_y_desempata_por_vistas(catalogo):
+    from extension import busqueda_index
+
+    ranking = busqueda_index.rankear("gel")
+    ids = [pid for _, pid in ranking]
+    # "gel" en el nombre pesa más que en la descripción, aunque el aceite tenga más vistas
+    assert ids == [catalogo["gel"].id, catalogo["aceite"].id]
+    assert catalogo["inactivo"].id not in ids
+
+
+def test_buscar_con_tildes_prefijo_y_todos_los_terminos(catalogo):
+    from services.busqueda import buscar
+
+    productos, total, _ = buscar("intimo")
+    assert [p.id for p in productos] == [catalogo["gel"].id] and total == 1
+
+    # el último término se busca como prefijo
+    productos, _, _ = buscar("vibr")
+    assert [p.id for p in productos] == [catalogo["vibrador"].id]
+
+    # todos los términos tienen que aparecer
+    assert buscar("gel vibrador")[1] == 0
+    assert buscar("de la")[1] == 0
+
+
+def test_buscar_por_categoria(catalogo):
+    from services.busqueda import buscar
+
+    categoria_id = catalogo["gel"].categorias[0].id
+    productos, total, _ = buscar("gel", categoria_id)
+    assert [p.id for p in productos] == [catalogo["gel"].id] and total == 1
+
+
+def test_cursor_con_empates_recorre_lo_mismo_que_el_offset(catalogo):
+    from services.busqueda import buscar
+
+    por_offset = [p.id for page in (1, 2, 3) for p in buscar("silicona", page=page, per_page=5)[0]]
+    assert len(por_offset) == 13
+
+    por_cursor, cursor = [], None
+    while True:
+        productos, total, cursor = buscar("silicona", per_page=5, cursor=cursor, usar_cursor=True)
+        por_cursor += [p.id for p in productos]
+        if cursor is None:
+            break
+    assert total == 13
+    assert por_cursor == por_offset
+
+
+def test_cursor_invalido_da_400(catalogo, client):
+    from services.paginacion import codificar_cursor
+
+    assert client.get("/productos/filtro?filtro=silicona&cursor=no-es-base64").status_code == 400
+    # la relevancia del cursor es entera: un float no es un cursor de búsqueda
+    cursor = codificar_cursor(1.5, catalogo["vibrador"].id)
+    assert client.get(f"/productos/filtro?filtro=silicona&cursor={cursor}").status_code == 400
+
+
+def test_actualizar_no_tapa_bumps_ajenos(catalogo):
+    from extension import busqueda_index, cache
+
+    gel = catalogo["gel"]
+    cache.bump()
+    busqueda_index.actualizar([gel.id])
+    assert busqueda_index._version == cache.version()
+
+    # un bump de otro worker en el medio: no se da por aplicado
+    cache.bump()
+    cache.bump()
+    busqueda_index.actualizar([gel.id])
+    assert busqueda_index._version != cache.version()
+
+    busqueda_index.rankear("gel")
+    assert busqueda_index._version == cache.version()
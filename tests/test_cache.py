@@ -0,0 +1,78 @@
+def test_cache_stats_solo_admin(client, crear_usuario, token):
+    admin = crear_usuario("admin")
+    cliente = crear_usuario("cliente")
+
+    assert client.get("/api/cache/stats").status_code == 401
+    assert client.get("/api/cache/stats", headers=token(cliente.id, rol="cliente")).status_code == 403
+    r = client.get("/api/cache/stats", headers=token(admin.id, rol="admin"))
+    assert r.status_code == 200
+    assert "hit_ratio" in r.get_json()
+
+
+def test_hit_miss_y_bump(db, client, sembrar_catalogo):
+    from extension import cache
+
+    producto = sembrar_catalogo(3)[0]
+
+    r = client.get("/productos/?per_page=2")
+    assert r.headers["X-Cache"] == "MISS"
+    assert client.get("/productos/?per_page=2").headers["X-Cache"] == "HIT"
+    # otros parámetros, otra entrada
+    assert client.get("/productos/?per_page=3").headers["X-Cache"] == "MISS"
+    assert client.get(f"/productos/{producto.id}").headers["X-Cache"] == "MISS"
+    assert client.get(f"/productos/{producto.id}").headers["X-Cache"] == "HIT"
+    # los 404 no se cachean
+    assert client.get("/productos/987654").headers["X-Cache"] == "MISS"
+    assert client.get("/productos/987654").headers["X-Cache"] == "MISS"
+
+    producto.nombre = "Renombrado"
+    db.session.commit()
+    cache.bump()
+    r = client.get(f"/productos/{producto.id}")
+    assert r.headers["X-Cache"] == "MISS" and r.get_json()["nombre"] == "Renombrado"
+    assert client.get("/productos/?per_page=2").headers["X-Cache"] == "MISS"
+
+
+def test_un_pedido_invalida_el_stock_cacheado(db, client, sembrar_catalogo):
+    from extension import cache
+
+    producto = sembrar_catalogo(1)[0]  # stock 5
+    version = cache.version()
+
+    assert client.get(f"/productos/{producto.id}").get_json()["stock"] == 5
+    assert client.get("/productos/?en_stock=1").get_json()["total"] == 1
+    # lo que no muestra stock sigue cacheado
+    assert client.get("/categorias/").status_code == 200
+
+    r = client.post("/pedidos/", json={
+        "email": "invitado@test.local", "detalles": [{"producto_id": producto.id, "cantidad": 5}],
+    })
+    assert r.status_code == 201
+
+    r = client.get(f"/productos/{producto.id}")
+    assert r.headers["X-Cache"] == "MISS" and r.get_json()["stock"] == 0
+    assert client.get("/productos/?en_stock=1").get_json()["total"] == 0
+    assert client.get("/categorias/").headers["X-Cache"] == "HIT"
+    # el catálogo no cambió: los índices en memoria no se recargan
+    assert cache.version() == version
+
+
+def test_expirar_reservas_invalida_el_stock_cacheado(db, client, sembrar_catalogo):
+    from datetime import datetime, timedelta
+
+    from models import Pedido
+    from services.reservas import expirar_vencidos
+
+    producto = sembrar_catalogo(1)[0]
+    r = client.post("/pedidos/", json={
+        "email": "invitado@test.local", "detalles": [{"producto_id": producto.id, "cantidad": 2}],
+    })
+    pedido = db.session.get(Pedido, r.get_json()["pedido_id"])
+    assert client.get(f"/productos/{producto.id}").get_json()["stock"] == 3
+
+    pedido.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db.session.commit()
+    assert expirar_vencidos()[1] == [pedido.id]
+
+    r = client.get(f"/productos/{producto.id}")
+    assert r.headers["X-Cache"] == "MISS" and r.get_json()["stock"] == 5
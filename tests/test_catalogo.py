@@ -0,0 +1,29 @@
+def test_listado_queries_constantes(client, sembrar_catalogo, contar_queries):
+    """count + página + primeras imágenes + categorías: 4 statements, sin N+1."""
+    sembrar_catalogo()
+
+    for per_page in (1, 5, 12, 30):
+        with contar_queries() as stmts:
+            r = client.get(f"/productos/?per_page={per_page}")
+        assert r.status_code == 200
+        data = r.get_json()
+        assert len(data["productos"]) == per_page
+        assert len(stmts) == 4, stmts
+        assert all(p["url_imagen_secundaria"] and len(p["categoria_ids"]) == 2 for p in data["productos"])
+
+
+def test_filtro_de_precio(db, client, sembrar_catalogo):
+    productos = sembrar_catalogo(5)  # precios 100..104
+    productos[0].precio = 150000
+    db.session.commit()
+
+    def ids(query=""):
+        r = client.get(f"/productos/?per_page=50{query}")
+        assert r.status_code == 200
+        return {p["id"] for p in r.get_json()["productos"]}
+
+    # sin filtro: el tope de 100000 sigue aplicando
+    assert ids() == {p.id for p in productos[1:]}
+    assert ids("&min_price=102") == {p.id for p in productos[2:]}
+    assert ids("&max_price=102") == {productos[1].id, productos[2].id}
+    assert ids("&max_price=500000") == {p.id for p in productos[1:]}
@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _ViaCargoLento(BaseHTTPRequestHandler):
+    demora = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.demora)
+        body = json.dumps({"Cotizacion": [{"TOTAL": "1500", "PRODUCTO_DESCRIPCION": "Estándar"}]}).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # el cliente ya cortó por timeout
+
+
+@pytest.fixture
+def cotizador(app, db):
+    from extension import cotizador as _cotizador
+    from services.cotizador import CircuitBreaker
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ViaCargoLento)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    urls, hilos, cola_max = dict(_cotizador.urls), _cotizador.hilos, _cotizador.cola_max
+    _cotizador.urls["viacargo"] = f"http://127.0.0.1:{server.server_address[1]}/cotizar"
+    _cotizador.breakers["viacargo"] = CircuitBreaker()
+    yield _cotizador
+    _cotizador.urls = urls
+    _cotizador.breakers["viacargo"] = CircuitBreaker()
+    _cotizador.configurar(hilos, cola_max)
+    _ViaCargoLento.demora = 0.0
+    server.shutdown()
+
+
+def test_timeout_http_acotado_al_deadline(cotizador):
+    """Lo que no llega al deadline no deja threads ocupados los 10 s del timeout de ViaCargo."""
+    _ViaCargoLento.demora = 3.0
+    cotizador.configurar(hilos=2, cola_max=2)
+
+    t0 = time.monotonic()
+    cotizaciones, errores = cotizador.cotizar_lote([("viacargo", "5500"), ("viacargo", "5501")], deadline=0.3)
+    assert cotizaciones == {}
+    assert set(errores.values()) == {"deadline"}
+    assert time.monotonic() - t0 < 1
+
+    # los threads se liberan con el timeout recortado: un lote nuevo responde
+    time.sleep(0.5)
+    _ViaCargoLento.demora = 0.0
+    cotizaciones, errores = cotizador.cotizar_lote([("viacargo", "5600")], deadline=2)
+    assert errores == {}
+    assert cotizaciones[("viacargo", "5600")]["precio"] == 1500.0
+    # cortar por deadline propio no abre el circuito
+    assert cotizador.breakers["viacargo"].estado() == "cerrado"
+
+
+def test_cola_llena_responde_saturado(cotizador):
+    _ViaCargoLento.demora = 1.0
+    cotizador.configurar(hilos=1, cola_max=1)
+
+    t0 = time.monotonic()
+    _, errores = cotizador.cotizar_lote([("viacargo", str(cp)) for cp in range(5700, 5704)], deadline=0.2)
+    assert sorted(errores.values()) == ["deadline", "deadline", "saturado", "saturado"]
+    assert time.monotonic() - t0 < 0.5
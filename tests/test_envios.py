@@ -0,0 +1,65 @@
+def _producto(db, nombre, peso, medidas=(None, None, None)):
+    from models import Producto
+
+    p = Producto(nombre=nombre, slug=nombre, precio=100, stock=10, activo=True, peso=peso,
+                 alto_cm=medidas[0], ancho_cm=medidas[1], largo_cm=medidas[2])
+    db.session.add(p)
+    db.session.commit()
+    return p
+
+
+def test_bulto_para_carrito():
+    from services.cotizador import bulto_para_carrito
+
+    # dos de 10x20x30 apilados por el lado chico + uno sin medidas (6x15x20)
+    bulto = bulto_para_carrito([(0.5, 30, 10, 20, 2), (0.3, None, None, None, 1)])
+    assert bulto == {"peso_g": 1500, "alto": 30, "ancho": 20, "largo": 30}
+    # redondeo hacia arriba al paso
+    assert bulto_para_carrito([(0.1, 1, 2, 3, 1)]) == {"peso_g": 250, "alto": 5, "ancho": 5, "largo": 5}
+
+
+def test_cotizar_lote_sin_login_y_acota_pares(client, db, monkeypatch):
+    from extension import cotizador
+
+    llamados = []
+    monkeypatch.setattr(cotizador, "cotizar_lote", lambda pares, bulto: llamados.append((pares, bulto)) or ({}, {}))
+    p = _producto(db, "caja", 0.8, (12, 25, 40))
+    items = [{"producto_id": p.id, "cantidad": 3}]
+
+    # checkout de invitados: sin token
+    r = client.post("/envios/cotizar-lote", json={"items": items, "cps": ["5500", "5501", "5502", "5503"]})
+    assert r.status_code == 400
+    r = client.post("/envios/cotizar-lote",
+                    json={"items": items, "cps": ["5500", "5501", "5502"], "carriers": ["andreani", "viacargo"]})
+    assert r.status_code == 200
+    assert len(llamados[-1][0]) == 6
+
+    r = client.post("/envios/cotizar-lote", json={"items": items, "cps": ["5500"]})
+    assert r.status_code == 200
+    # el bulto es el del carrito: 3 cajas de 12x25x40 apiladas
+    assert r.get_json()["bulto"] == {"peso_g": 2500, "alto": 40, "ancho": 25, "largo": 40}
+    assert llamados[-1][1] == r.get_json()["bulto"]
+
+
+def test_cotizar_lote_valida_listas_y_productos_activos(client, db, monkeypatch):
+    from extension import cotizador
+
+    llamados = []
+    monkeypatch.setattr(cotizador, "cotizar_lote", lambda pares, bulto: llamados.append(pares) or ({}, {}))
+    p = _producto(db, "caja", 0.8)
+    items = [{"producto_id": p.id, "cantidad": 1}]
+
+    # un string no se recorre letra por letra
+    for cuerpo in (
+        {"items": items, "cps": "5500"},
+        {"items": items, "cps": ["5500"], "carriers": "andreani"},
+        {"items": {"producto_id": p.id}, "cps": ["5500"]},
+        {"items": [p.id], "cps": ["5500"]},
+    ):
+        assert client.post("/envios/cotizar-lote", json=cuerpo).status_code == 400
+
+    p.activo = False
+    db.session.commit()
+    r = client.post("/envios/cotizar-lote", json={"items": items, "cps": ["5500"]})
+    assert r.status_code == 404
+    assert llamados == []
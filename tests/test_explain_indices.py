@@ -0,0 +1,47 @@
+"""
+benchmarks/explain_indices.py como test: cada query caliente usa su índice
+en el esquema que arman las migraciones.
+
+Corre el script en otro proceso (la app de los tests ya quedó atada a su
+base al importarse). MySQL se saltea si no hay un servidor con la base de
+EXPLAIN_MYSQL_URL (se borra entera: que sea una base descartable).
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(RAIZ, "benchmarks", "explain_indices.py")
+MYSQL_URL = os.getenv(
+    "EXPLAIN_MYSQL_URL", "mysql+pymysql://root:@127.0.0.1:3306/ecommerce_explain?charset=utf8mb4",
+)
+
+
+def _explain(url):
+    r = subprocess.run(
+        [sys.executable, SCRIPT, "--db", url],
+        cwd=RAIZ, capture_output=True, text=True, timeout=300,
+    )
+    assert r.returncode == 0, r.stdout + r.stderr
+
+
+def test_planes_sqlite(tmp_path):
+    _explain(f"sqlite:///{tmp_path / 'explain.db'}")
+
+
+def test_planes_mysql():
+    pytest.importorskip("pymysql")
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import OperationalError
+
+    engine = create_engine(MYSQL_URL, connect_args={"connect_timeout": 2})
+    try:
+        engine.connect().close()
+    except OperationalError as e:
+        pytest.skip(f"MySQL no disponible: {e.orig}")
+    finally:
+        engine.dispose()
+
+    _explain(MYSQL_URL)
@@ -0,0 +1,23 @@
+def test_agregar_favorito_es_idempotente(db, client, token, crear_usuario, sembrar_catalogo):
+    from models import Favorito
+
+    producto = sembrar_catalogo(1)[0]
+    usuario = crear_usuario()
+    headers = token(usuario.id)
+
+    r = client.post(f"/auth/fav/{producto.id}", headers=headers)
+    assert r.status_code == 200
+    assert r.get_json()["message"] == "Producto agregado a favoritos"
+    r = client.post(f"/auth/fav/{producto.id}", headers=headers)
+    assert r.get_json()["message"] == "El producto ya estaba en favoritos"
+    assert Favorito.query.filter_by(usuario_id=usuario.id).count() == 1
+
+
+def test_agregar_favorito_de_producto_inexistente_da_404(db, client, token, crear_usuario):
+    from models import Favorito
+
+    usuario = crear_usuario()
+
+    r = client.post("/auth/fav/999", headers=token(usuario.id))
+    assert r.status_code == 404
+    assert Favorito.query.count() == 0
@@ -0,0 +1,103 @@
+import pytest
+
+
+@pytest.fixture
+def identidad(db, monkeypatch):
+    """El cache de rol/activo de este worker vacío."""
+    from extension import identidad
+
+    monkeypatch.setattr(identidad, "_estados", {})
+    return identidad
+
+
+@pytest.fixture
+def autorizar(app, contar_queries):
+    """autorizar(headers) -> (Acceso o None, statements que corrió require_admin)."""
+    from flask_jwt_extended import verify_jwt_in_request
+
+    from extension import identidad
+
+    def _autorizar(headers):
+        with app.test_request_context(headers=headers):
+            verify_jwt_in_request()  # la blocklist puede consultar: queda afuera de la cuenta
+            with contar_queries() as stmts:
+                acceso = identidad.require_admin()
+        return acceso, stmts
+
+    return _autorizar
+
+
+def test_token_de_cliente_se_rechaza_sin_consultas(crear_usuario, token, identidad, autorizar):
+    cliente = crear_usuario()
+
+    acceso, stmts = autorizar(token(cliente.id, rol="cliente"))
+
+    assert acceso is None
+    assert stmts == []
+
+
+def test_token_de_cliente_con_rol_admin_en_la_db_igual_se_rechaza(crear_usuario, token, identidad, autorizar):
+    # el claim manda: un token viejo de cuando era cliente no sirve para admin
+    usuario = crear_usuario(rol="admin")
+
+    acceso, stmts = autorizar(token(usuario.id, rol="cliente"))
+
+    assert acceso is None
+    assert stmts == []
+
+
+def test_chequeo_de_admin_queda_cacheado(crear_usuario, token, identidad, autorizar):
+    admin = crear_usuario(rol="admin")
+    headers = token(admin.id, rol="admin")
+
+    acceso, stmts = autorizar(headers)
+    assert acceso is not None and acceso.id == admin.id
+    assert len(stmts) == 1
+
+    acceso, stmts = autorizar(headers)
+    assert acceso is not None and acceso.es_admin
+    assert stmts == []
+
+
+def test_token_sin_claim_de_rol_usa_la_db(crear_usuario, token, identidad, autorizar):
+    # tokens emitidos antes de que el rol viajara en el JWT
+    admin = crear_usuario(rol="admin")
+    cliente = crear_usuario()
+
+    assert autorizar(token(admin.id))[0] is not None
+    assert autorizar(token(cliente.id))[0] is None
+
+
+def test_admin_desactivado_da_403(client, crear_usuario, token, identidad):
+    admin = crear_usuario(rol="admin", activo=False)
+    otro = crear_usuario()
+
+    r = client.get(f"/auth/{otro.id}", headers=token(admin.id, rol="admin"))
+
+    assert r.status_code == 403
+    assert r.get_json()["error"] == "Acceso denegado"
+
+
+def test_actualizar_usuario_admin_invalida_el_cache(client, crear_usuario, token, identidad):
+    jefe = crear_usuario(rol="admin")
+    admin = crear_usuario(rol="admin")
+    headers = token(admin.id, rol="admin")
+    assert client.get(f"/auth/{jefe.id}", headers=headers).status_code == 200
+    assert admin.id in identidad._estados
+
+    r = client.patch(f"/auth/{admin.id}", json={"activo": False}, headers=token(jefe.id, rol="admin"))
+    assert r.status_code == 200
+
+    # sin esperar el TTL
+    assert client.get(f"/auth/{jefe.id}", headers=headers).status_code == 403
+
+
+def test_eliminar_usuario_invalida_el_cache(client, crear_usuario, token, identidad):
+    jefe = crear_usuario(rol="admin")
+    admin = crear_usuario(rol="admin")
+    headers = token(admin.id, rol="admin")
+    assert client.get(f"/auth/{jefe.id}", headers=headers).status_code == 200
+
+    assert client.delete(f"/auth/{admin.id}", headers=token(jefe.id, rol="admin")).status_code == 200
+
+    assert client.get(f"/auth/{jefe.id}", headers=headers).status_code == 403
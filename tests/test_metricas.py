@@ -0,0 +1,41 @@
+import pytest
+
+
+@pytest.fixture
+def metricas(app, monkeypatch):
+    from extension import metricas
+
+    monkeypatch.setattr(metricas, "token", None)
+    monkeypatch.setattr(metricas, "publicas", False)
+    return metricas
+
+
+def test_metrics_sin_token_configurado_da_403(client, metricas):
+    assert client.get("/metrics").status_code == 403
+
+
+def test_metrics_con_token(client, metricas, monkeypatch):
+    monkeypatch.setattr(metricas, "token", "s3creto")
+
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics?token=otro").status_code == 403
+    r = client.get("/metrics", headers={"Authorization": "Bearer s3creto"})
+    assert r.status_code == 200
+    assert "http_request_duration_seconds" in r.get_data(as_text=True)
+
+
+def test_metrics_publicas_solo_si_se_pide(client, metricas, monkeypatch):
+    monkeypatch.setattr(metricas, "publicas", True)
+
+    assert client.get("/metrics").status_code == 200
+
+
+def test_log_de_sql_lento_no_muestra_parametros(db, metricas, monkeypatch, capsys):
+    from sqlalchemy import text
+
+    monkeypatch.setattr(metricas, "slow_ms", 1e-9)
+    db.session.execute(text("SELECT :email"), {"email": "alguien@test.local"})
+
+    salida = capsys.readouterr().out
+    assert "SQL LENTO" in salida
+    assert "alguien@test.local" not in salida
@@ -0,0 +1,77 @@
+import threading
+from datetime import datetime, timedelta
+
+
+def encolar(db, cantidad, **campos):
+    from services.outbox import encolar_email
+
+    emails = [encolar_email(f"cliente{i}@localhost", f"Pedido #{i}", "<p>hola</p>", **campos) for i in range(cantidad)]
+    db.session.commit()
+    return [e.id for e in emails]
+
+
+def test_envia_el_lote_y_marca_enviados(db, smtp):
+    from models import EmailOutbox
+    from services.outbox import procesar_lote
+
+    encolar(db, 5)
+    assert procesar_lote(50) == (5, 0)
+    assert smtp.recibidos == 5
+    assert {e.estado for e in EmailOutbox.query} == {"enviado"}
+    assert procesar_lote(50) == (0, 0)
+
+
+def test_fallidos_se_reintentan_con_backoff(db, smtp):
+    from models import EmailOutbox
+    from services.outbox import procesar_lote
+
+    encolar(db, 3)
+    smtp.rechazados = {"cliente1@localhost"}
+    assert procesar_lote(50) == (2, 1)
+
+    db.session.expire_all()
+    fallido = EmailOutbox.query.filter_by(destinatario="cliente1@localhost").one()
+    assert fallido.estado == "pendiente"
+    assert fallido.intentos == 1
+    assert fallido.proximo_intento > datetime.utcnow() + timedelta(seconds=20)
+
+
+def test_no_hay_transaccion_abierta_durante_el_envio(app, db, smtp, monkeypatch):
+    """El lote se commitea antes de SMTP: otro worker no lo ve y no hay locks tomados."""
+    import services.outbox as outbox
+
+    encolar(db, 4)
+    vistos = {}
+
+    def send_many(mensajes):
+        vistos["en_transaccion"] = db.session().in_transaction()
+
+        def otro_worker():
+            with app.app_context():
+                vistos["reclamados_por_otro"] = outbox._reclamar(50)
+                db.session.remove()
+
+        t = threading.Thread(target=otro_worker)
+        t.start()
+        t.join(5)
+        return enviar(mensajes)
+
+    enviar = outbox.send_many
+    monkeypatch.setattr(outbox, "send_many", send_many)
+
+    assert outbox.procesar_lote(50) == (4, 0)
+    assert vistos == {"en_transaccion": False, "reclamados_por_otro": []}
+
+
+def test_lease_vencido_se_retoma(db, smtp):
+    """Si el worker murió después de reclamar, el lote vuelve a la cola al vencer el lease."""
+    from models import EmailOutbox
+    from services.outbox import _reclamar, procesar_lote
+
+    encolar(db, 2)
+    assert len(_reclamar(50)) == 2
+    assert procesar_lote(50) == (0, 0)
+
+    EmailOutbox.query.update({EmailOutbox.proximo_intento: datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    assert procesar_lote(50) == (2, 0)
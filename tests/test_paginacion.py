@@ -0,0 +1,129 @@
+import pytest
+
+from services.paginacion import (
+    CursorInvalido, codificar_cursor, decodificar_cursor, paginar_cursor,
+)
+
+ORDENES = ("views", "price_asc", "price_desc", "rating", "newest")
+
+
+@pytest.fixture
+def catalogo(db, sembrar_catalogo):
+    """30 productos con empates en todas las columnas de orden y fechas NULL."""
+    productos = sembrar_catalogo(30)
+    for i, p in enumerate(productos):
+        p.vistas = i % 4
+        p.precio = 100 + i % 5
+        p.valoracion_promedio = (i % 3) / 2
+        p.fecha_creacion = None if i % 6 == 0 else p.fecha_creacion
+    db.session.commit()
+    return productos
+
+
+def _por_cursor(client, query):
+    ids, cursor, paginas = [], "", 0
+    while cursor is not None:
+        r = client.get(f"/productos/?{query}&cursor={cursor}")
+        assert r.status_code == 200, r.get_json()
+        data = r.get_json()
+        ids += [p["id"] for p in data["productos"]]
+        cursor = data["next_cursor"]
+        paginas += 1
+        assert paginas <= 30
+    return ids
+
+
+def _por_offset(client, query):
+    ids, page = [], 1
+    while True:
+        data = client.get(f"/productos/?{query}&page={page}").get_json()
+        ids += [p["id"] for p in data["productos"]]
+        if page >= data["pages"]:
+            return ids
+        page += 1
+
+
+@pytest.mark.parametrize("sort", ORDENES)
+def test_cursor_recorre_lo_mismo_que_offset(client, catalogo, sort):
+    query = f"sort={sort}&per_page=7"
+
+    por_cursor = _por_cursor(client, query)
+
+    assert por_cursor == _por_offset(client, query)
+    assert sorted(por_cursor) == sorted(p.id for p in catalogo)
+
+
+@pytest.mark.parametrize("descendente", (False, True))
+def test_seek_con_fecha_null(db, catalogo, descendente):
+    """NULL es el menor valor: primero en orden ascendente, último en descendente."""
+    from models import Producto
+
+    clave = lambda p: (p.fecha_creacion is not None, p.fecha_creacion, p.id)
+    esperado = [p.id for p in sorted(catalogo, key=clave, reverse=descendente)]
+
+    ids, cursor = [], None
+    while True:
+        filas, cursor = paginar_cursor(
+            Producto.query, Producto.fecha_creacion, Producto.id, descendente, cursor, 4,
+            lambda p: (p.fecha_creacion, p.id),
+        )
+        ids += [p.id for p in filas]
+        if cursor is None:
+            break
+
+    assert ids == esperado
+    nulos = {p.id for p in catalogo if p.fecha_creacion is None}
+    assert (set(ids[-len(nulos):]) if descendente else set(ids[:len(nulos)])) == nulos
+
+
+def test_cursor_con_valor_null_sigue_despues(db, catalogo):
+    from models import Producto
+
+    nulos = sorted(p.id for p in catalogo if p.fecha_creacion is None)
+    cursor = codificar_cursor(None, nulos[1])
+
+    desc, _ = paginar_cursor(
+        Producto.query, Producto.fecha_creacion, Producto.id, True, cursor, 50, lambda p: (None, p.id),
+    )
+    asc, _ = paginar_cursor(
+        Producto.query, Producto.fecha_creacion, Producto.id, False, cursor, 50, lambda p: (None, p.id),
+    )
+
+    # en descendente solo quedan los NULL de id menor; en ascendente, el resto
+    assert [p.id for p in desc] == [nulos[0]]
+    assert [p.id for p in asc][:len(nulos) - 2] == nulos[2:]
+    assert len(asc) == len(catalogo) - 2
+
+
+def test_decodificar_cursor_convierte_al_tipo_de_la_columna():
+    from datetime import datetime
+    from decimal import Decimal
+
+    from models import Producto
+
+    fecha = datetime(2024, 1, 2, 3, 4, 5)
+    assert decodificar_cursor(codificar_cursor(fecha, 7), Producto.fecha_creacion) == (fecha, 7)
+    assert decodificar_cursor(codificar_cursor(Decimal("101.50"), 7), Producto.precio) == (Decimal("101.50"), 7)
+    assert decodificar_cursor(codificar_cursor(3, 7), Producto.vistas) == (3, 7)
+    assert decodificar_cursor(codificar_cursor(None, 7), Producto.vistas) == (None, 7)
+
+
+@pytest.mark.parametrize("cursor", [
+    "basura!",
+    codificar_cursor(3, "x"),
+    codificar_cursor("2024-99-99", 1),
+    "W10",  # []
+])
+def test_cursor_malformado(cursor):
+    from models import Producto
+
+    with pytest.raises(CursorInvalido):
+        decodificar_cursor(cursor, Producto.fecha_creacion)
+
+
+@pytest.mark.parametrize("cursor", ["basura!", codificar_cursor("no-es-int", 1)])
+def test_cursor_malformado_da_400(client, catalogo, cursor):
+    r = client.get(f"/productos/?sort=views&cursor={cursor}")
+
+    assert r.status_code == 400
+    assert r.get_json()["msg"] == "cursor inválido"
@@ -0,0 +1,128 @@
+import threading
+from datetime import datetime, timedelta
+
+
+def crear_pedido(db, crear_usuario):
+    from models import Pago, Pedido
+
+    usuario = crear_usuario()
+    pedido = Pedido(usuario_id=usuario.id, total=100, estado="PENDIENTE_PAGO", stock_state="reserved",
+                    expires_at=datetime.utcnow() + timedelta(hours=1))
+    db.session.add(pedido)
+    db.session.flush()
+    pago = Pago(pedido_id=pedido.id, monto=100, estado="pending")
+    db.session.add(pago)
+    db.session.commit()
+    return pedido, pago
+
+
+def notificar(db, payment_id, action="payment.updated"):
+    from services.pagos_mp import registrar_notificacion
+
+    registrar_notificacion(payment_id, action, {"data": {"id": payment_id}})
+    db.session.commit()
+
+
+def cargar_pago(fake_mp, payment_id, pago, status="approved"):
+    fake_mp.PAGOS[payment_id] = {
+        "id": payment_id, "status": status, "external_reference": str(pago.id),
+        "status_detail": "accredited", "transaction_amount": 100,
+        "payment_method": {"id": "visa"}, "payment_type_id": "credit_card", "order": {"id": 1},
+    }
+
+
+def test_aprueba_el_pedido_con_una_consulta_por_pago(db, crear_usuario, fake_mp):
+    from models import MpNotificacion, Pedido
+    from services.pagos_mp import procesar_lote
+
+    pedido, pago = crear_pedido(db, crear_usuario)
+    cargar_pago(fake_mp, "555", pago)
+    notificar(db, "555", "payment.created")
+    notificar(db, "555", "payment.updated")
+
+    assert procesar_lote() == (1, 0)
+    assert fake_mp.CONSULTAS == {"555": 1}
+    db.session.expire_all()
+    assert db.session.get(Pedido, pedido.id).estado == "PAGADO"
+    assert {(n.estado, n.resultado) for n in MpNotificacion.query} == {("procesado", "ok")}
+
+
+def test_error_de_mp_reintenta_con_backoff(db, crear_usuario, fake_mp):
+    from models import MpNotificacion, Pedido
+    from services.pagos_mp import procesar_lote
+
+    pedido, pago = crear_pedido(db, crear_usuario)
+    cargar_pago(fake_mp, "777", pago)
+    fake_mp.FALLAS["777"] = 503
+    notificar(db, "777")
+
+    assert procesar_lote() == (0, 1)
+    db.session.expire_all()
+    n = MpNotificacion.query.one()
+    assert (n.estado, n.intentos) == ("pendiente", 1)
+    assert n.proximo_intento > datetime.utcnow() + timedelta(seconds=20)
+    assert db.session.get(Pedido, pedido.id).estado == "PENDIENTE_PAGO"
+
+
+def test_sin_transaccion_durante_la_consulta(app, db, crear_usuario, fake_mp, monkeypatch):
+    """MP lento: no hay transacción abierta y otro worker no reclama el mismo lote."""
+    import services.pagos_mp as pagos_mp
+
+    pedido, pago = crear_pedido(db, crear_usuario)
+    cargar_pago(fake_mp, "888", pago)
+    notificar(db, "888")
+    vistos = {}
+    consultar = pagos_mp._consultar
+
+    def consultar_espiando(payment_id):
+        vistos["en_transaccion"] = db.session().in_transaction()
+
+        def otro_worker():
+            with app.app_context():
+                vistos["reclamados_por_otro"] = pagos_mp._reclamar(50)
+                db.session.remove()
+
+        t = threading.Thread(target=otro_worker)
+        t.start()
+        t.join(5)
+        return consultar(payment_id)
+
+    monkeypatch.setattr(pagos_mp, "_consultar", consultar_espiando)
+    assert pagos_mp.procesar_lote() == (1, 0)
+    assert vistos == {"en_transaccion": False, "reclamados_por_otro": []}
+
+
+def test_notificacion_durante_la_consulta_queda_pendiente(app, db, crear_usuario, fake_mp, monkeypatch):
+    """Un reintento de MP que llega mientras se consulta no se da por procesado con la respuesta vieja."""
+    import services.pagos_mp as pagos_mp
+    from models import MpNotificacion
+
+    pedido, pago = crear_pedido(db, crear_usuario)
+    cargar_pago(fake_mp, "999", pago, status="pending")
+    notificar(db, "999")
+    consultar = pagos_mp._consultar
+
+    def consultar_y_renotificar(payment_id):
+        respuesta = consultar(payment_id)
+
+        def webhook():
+            with app.app_context():
+                notificar(db, payment_id)
+                db.session.remove()
+
+        t = threading.Thread(target=webhook)
+        t.start()
+        t.join(5)
+        return respuesta
+
+    monkeypatch.setattr(pagos_mp, "_consultar", consultar_y_renotificar)
+    assert pagos_mp.procesar_lote() == (1, 0)
+    db.session.expire_all()
+    assert MpNotificacion.query.one().estado == "pendiente"
+
+    monkeypatch.setattr(pagos_mp, "_consultar", consultar)
+    cargar_pago(fake_mp, "999", pago, status="approved")
+    assert pagos_mp.procesar_lote() == (1, 0)
+    assert fake_mp.CONSULTAS == {"999": 2}
+    db.session.expire_all()
+    assert MpNotificacion.query.one().estado == "procesado"
@@ -0,0 +1,105 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fcntl")
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Dos instancias de Passwords (como dos workers sync) con los cupos en el mismo directorio."""
+    from services.passwords import Passwords
+
+    creados = []
+
+    def _crear(**config):
+        p = Passwords()
+        p.configurar(metodo="pbkdf2:sha256:1000", cupos_dir=str(tmp_path), **config)
+        creados.append(p)
+        return p
+
+    yield _crear
+    for p in creados:
+        if p._pool is not None:
+            p._pool.shutdown(wait=True)
+
+
+def _ocupar(pw, liberar):
+    entro = threading.Event()
+
+    def lento():
+        entro.set()
+        liberar.wait(5)
+        return True
+
+    t = threading.Thread(target=pw._en_pool, args=(lento,))
+    t.start()
+    assert entro.wait(5)
+    return t
+
+
+def test_el_tope_global_se_comparte_entre_workers(workers):
+    from services.passwords import HashSaturado
+
+    a = workers(hilos_global=1, cola_global=0, timeout=0.2)
+    b = workers(hilos_global=1, cola_global=0, timeout=0.2)
+    liberar = threading.Event()
+    t = _ocupar(a, liberar)
+
+    # b tiene su semáforo por worker vacío, pero no hay lugar en la máquina
+    with pytest.raises(HashSaturado):
+        b._en_pool(lambda: True)
+    liberar.set()
+    t.join()
+    # los cupos se sueltan en el done_callback, desde el hilo del pool de a
+    a._pool.shutdown(wait=True)
+    assert b._en_pool(lambda: True) is True
+
+
+def test_la_cola_global_espera_un_cupo_hasta_el_timeout(workers):
+    from services.passwords import HashSaturado
+
+    a = workers(hilos_global=1, cola_global=1, timeout=0.3)
+    b = workers(hilos_global=1, cola_global=1, timeout=0.3)
+    liberar = threading.Event()
+    t = _ocupar(a, liberar)
+
+    inicio = time.monotonic()
+    with pytest.raises(HashSaturado):
+        b._en_pool(lambda: True)
+    assert time.monotonic() - inicio >= 0.25
+
+    threading.Timer(0.1, liberar.set).start()
+    assert b._en_pool(lambda: True) is True
+    t.join()
+
+
+def _tomar_y_esperar(directorio, tomado, soltar):
+    from services.passwords import CuposArchivo
+
+    fd = CuposArchivo(directorio, "hash", 1).tomar()
+    tomado.set()
+    soltar.wait(5)
+    CuposArchivo.soltar(fd)
+
+
+def test_cupos_de_archivo_entre_procesos(tmp_path):
+    from services.passwords import CuposArchivo
+
+    ctx = multiprocessing.get_context("fork")
+    tomado, soltar = ctx.Event(), ctx.Event()
+    proc = ctx.Process(target=_tomar_y_esperar, args=(str(tmp_path), tomado, soltar))
+    proc.start()
+    try:
+        assert tomado.wait(5)
+        cupos = CuposArchivo(str(tmp_path), "hash", 1)
+        assert cupos.tomar() is None
+        soltar.set()
+        fd = cupos.tomar(time.monotonic() + 5)
+        assert fd is not None
+        CuposArchivo.soltar(fd)
+    finally:
+        soltar.set()
+        proc.join(5)
@@ -0,0 +1,123 @@
+import pytest
+
+
+@pytest.fixture
+def comprar(client, crear_usuario, token):
+    """comprar(detalles) -> respuesta de POST /pedidos/ de un cliente logueado."""
+    headers = token(crear_usuario().id)
+
+    def _comprar(detalles):
+        return client.post("/pedidos/", json={"detalles": detalles}, headers=headers)
+
+    return _comprar
+
+
+def _stock(db, *productos):
+    db.session.expire_all()
+    return [p.stock for p in productos]
+
+
+def test_lineas_repetidas_se_suman(db, sembrar_catalogo, comprar):
+    from models import PedidoDetalle
+
+    a, b = sembrar_catalogo(2)  # stock 5 c/u
+
+    r = comprar([
+        {"producto_id": a.id, "cantidad": 2},
+        {"producto_id": b.id, "cantidad": 1},
+        {"producto_id": a.id, "cantidad": 3},
+    ])
+
+    assert r.status_code == 201
+    assert _stock(db, a, b) == [0, 4]
+    lineas = {d.producto_id: d.cantidad for d in PedidoDetalle.query.filter_by(pedido_id=r.get_json()["pedido_id"])}
+    assert lineas == {a.id: 5, b.id: 1}
+
+
+def test_lineas_repetidas_que_juntas_superan_el_stock(db, sembrar_catalogo, comprar):
+    # cada línea sola entra (3 <= 5); sumadas no
+    a = sembrar_catalogo(1)[0]
+
+    r = comprar([{"producto_id": a.id, "cantidad": 3}, {"producto_id": a.id, "cantidad": 3}])
+
+    assert r.status_code == 400
+    assert _stock(db, a) == [5]
+
+
+def test_faltante_en_un_producto_no_descuenta_ninguno(db, sembrar_catalogo, comprar):
+    from models import Pedido, PedidoDetalle
+
+    a, b, c = sembrar_catalogo(3)
+
+    r = comprar([
+        {"producto_id": a.id, "cantidad": 2},
+        {"producto_id": b.id, "cantidad": 6},
+        {"producto_id": c.id, "cantidad": 5},
+    ])
+
+    assert r.status_code == 400
+    assert _stock(db, a, b, c) == [5, 5, 5]
+    assert Pedido.query.count() == 0
+    assert PedidoDetalle.query.count() == 0
+
+
+def test_el_error_nombra_el_producto_sin_stock(sembrar_catalogo, comprar):
+    a, b = sembrar_catalogo(2)
+
+    r = comprar([{"producto_id": a.id, "cantidad": 1}, {"producto_id": b.id, "cantidad": 9}])
+
+    assert r.status_code == 400
+    assert r.get_json()["error"] == f"Stock insuficiente para {b.nombre}"
+
+
+def test_producto_inactivo_no_se_vende(db, sembrar_catalogo, comprar):
+    a, b = sembrar_catalogo(2)
+    b.activo = False
+    db.session.commit()
+
+    r = comprar([{"producto_id": a.id, "cantidad": 1}, {"producto_id": b.id, "cantidad": 1}])
+
+    assert r.status_code == 404
+    assert r.get_json()["error"] == f"Producto {b.id} no encontrado"
+    assert _stock(db, a, b) == [5, 5]
+
+
+def test_mis_pedidos_queries_constantes(db, client, crear_usuario, token, sembrar_catalogo, contar_queries):
+    """pedidos + último pago + detalles: las mismas queries con 1 pedido que con 6."""
+    from datetime import datetime
+
+    from models import Pago, Pedido, PedidoDetalle
+
+    productos = sembrar_catalogo(3)
+    cliente = crear_usuario()
+    headers = token(cliente.id)
+    client.get("/pedidos/", headers=headers)  # la blocklist carga en el primer request
+
+    def agregar_pedidos(cantidad):
+        for _ in range(cantidad):
+            pedido = Pedido(usuario_id=cliente.id, total=300, estado="PAGADO", stock_state="confirmed")
+            pedido.detalles = [PedidoDetalle(producto_id=p.id, cantidad=1, subtotal=p.precio) for p in productos]
+            db.session.add(pedido)
+            db.session.flush()
+            db.session.add_all([
+                Pago(pedido_id=pedido.id, monto=300, estado="rechazado", fecha_creacion=datetime(2024, 1, 1)),
+                Pago(pedido_id=pedido.id, monto=300, estado="aprobado", fecha_creacion=datetime(2024, 1, 2)),
+            ])
+        db.session.commit()
+
+    def listar():
+        with contar_queries() as stmts:
+            r = client.get("/pedidos/", headers=headers)
+        assert r.status_code == 200
+        return r.get_json(), len(stmts)
+
+    agregar_pedidos(1)
+    pedidos, con_uno = listar()
+    assert len(pedidos) == 1
+
+    agregar_pedidos(5)
+    pedidos, con_seis = listar()
+    assert len(pedidos) == 6
+    assert all(len(p["detalles"]) == 3 and p["estado_pago"] == "aprobado" for p in pedidos)
+
+    assert con_seis == con_uno
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+
+def crear_pedido_vencido(db, crear_usuario, producto, cantidad=2):
+    from models import Pedido, PedidoDetalle
+
+    usuario = crear_usuario()
+    pedido = Pedido(usuario_id=usuario.id, total=100, estado="PENDIENTE_PAGO", stock_state="reserved",
+                    expires_at=datetime.utcnow() - timedelta(minutes=5))
+    db.session.add(pedido)
+    db.session.flush()
+    db.session.add(PedidoDetalle(pedido_id=pedido.id, producto_id=producto.id, cantidad=cantidad,
+                                 subtotal=producto.precio * cantidad))
+    db.session.commit()
+    return pedido.id
+
+
+def test_expira_y_devuelve_el_stock(db, crear_usuario, sembrar_catalogo):
+    from models import Pedido, Producto
+    from services.reservas import expirar_vencidos
+
+    producto = sembrar_catalogo(1)[0]
+    stock = producto.stock
+    pedido_id = crear_pedido_vencido(db, crear_usuario, producto)
+
+    assert expirar_vencidos() == ([pedido_id], [pedido_id])
+    db.session.expire_all()
+    pedido = db.session.get(Pedido, pedido_id)
+    assert (pedido.estado, pedido.stock_state) == ("EXPIRADO", "released")
+    assert db.session.get(Producto, producto.id).stock == stock + 2
+    assert expirar_vencidos() == ([], [])
+
+
+def test_pago_entre_el_select_y_el_update_no_se_expira(db, crear_usuario, sembrar_catalogo, monkeypatch):
+    from models import Pedido, Producto
+    from services import reservas
+
+    producto = sembrar_catalogo(1)[0]
+    stock = producto.stock
+    pedido_id = crear_pedido_vencido(db, crear_usuario, producto)
+
+    reclamar = reservas._reclamar_vencidos
+
+    def reclamar_y_pagar(ahora, limite):
+        filas = reclamar(ahora, limite)
+        # el webhook aprueba el pago desde otra conexión antes del UPDATE
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("UPDATE pedidos SET estado = 'PAGADO' WHERE id = ?", (pedido_id,))
+        return filas
+
+    monkeypatch.setattr(reservas, "_reclamar_vencidos", reclamar_y_pagar)
+
+    assert reservas.expirar_lote() == ([], [])
+    db.session.expire_all()
+    pedido = db.session.get(Pedido, pedido_id)
+    assert (pedido.estado, pedido.stock_state) == ("PAGADO", "reserved")
+    assert db.session.get(Producto, producto.id).stock == stock
+
+
+def test_el_expirador_no_toca_un_pedido_pagado_que_sigue_en_el_heap(db, crear_usuario, sembrar_catalogo):
+    import time
+
+    from models import Pedido, Producto
+    from services.expirador import ExpiradorReservas
+
+    producto = sembrar_catalogo(1)[0]
+    stock = producto.stock
+    pedido_id = crear_pedido_vencido(db, crear_usuario, producto)
+    db.session.get(Pedido, pedido_id).expires_at = datetime.utcnow() + timedelta(seconds=0.2)
+    db.session.commit()
+
+    expirador = ExpiradorReservas()
+    expirador.tick()
+    assert expirador.proximo() is not None
+
+    # el pago se aplica en otro proceso (`flask mp procesar`): el heap no se entera
+    pedido = db.session.get(Pedido, pedido_id)
+    pedido.estado, pedido.stock_state, pedido.expires_at = "PAGADO", "confirmed", None
+    db.session.commit()
+
+    time.sleep(0.3)
+    expirador.tick()
+    assert expirador.proximo() is None
+    db.session.expire_all()
+    assert db.session.get(Pedido, pedido_id).estado == "PAGADO"
+    assert db.session.get(Producto, producto.id).stock == stock
@@ -0,0 +1,45 @@
+def crear_pedido_con_resumen(db, usuario, productos):
+    from models import Pedido, PedidoDetalle
+    from services.pedidos import refrescar_resumen
+
+    pedido = Pedido(usuario_id=usuario.id, total=100, estado="PAGADO", stock_state="confirmed")
+    db.session.add(pedido)
+    db.session.flush()
+    for p in productos:
+        db.session.add(PedidoDetalle(pedido_id=pedido.id, producto_id=p.id, cantidad=1, subtotal=p.precio))
+    db.session.flush()
+    refrescar_resumen([pedido.id])
+    db.session.commit()
+    return pedido.id
+
+
+def listado(client, headers):
+    r = client.get("/pedidos/listar", headers=headers)
+    assert r.status_code == 200
+    return {p["id"]: p for p in r.get_json()["pedidos"]}
+
+
+def test_cambio_de_email_por_admin_llega_al_listado(db, client, token, crear_usuario, sembrar_catalogo):
+    admin = crear_usuario("admin")
+    cliente = crear_usuario()
+    pedido_id = crear_pedido_con_resumen(db, cliente, sembrar_catalogo(1))
+    headers = token(admin.id)
+
+    r = client.patch(f"/auth/{cliente.id}", json={"email": "nuevo@test.local"}, headers=headers)
+    assert r.status_code == 200
+    assert listado(client, headers)[pedido_id]["email"] == "nuevo@test.local"
+
+
+def test_renombrar_producto_llega_al_listado(db, client, token, crear_usuario, sembrar_catalogo):
+    admin = crear_usuario("admin")
+    uno, dos = sembrar_catalogo(2)
+    pedido_id = crear_pedido_con_resumen(db, crear_usuario(), [uno, dos])
+    otro_id = crear_pedido_con_resumen(db, crear_usuario(), [dos])
+    headers = token(admin.id)
+
+    r = client.patch(f"/productos/{uno.id}", data={"nombre": "Renombrado"}, headers=headers)
+    assert r.status_code == 200
+    pedidos = listado(client, headers)
+    assert pedidos[pedido_id]["productos"] == f"Renombrado, {dos.nombre}"
+    assert pedidos[pedido_id]["detalles"][0]["producto"] == "Renombrado"
+    assert pedidos[otro_id]["productos"] == dos.nombre
@@ -0,0 +1,78 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def revocaciones(db, monkeypatch):
+    """La copia en memoria del worker vacía (la tabla la vacía el fixture db)."""
+    from extension import revocaciones
+
+    monkeypatch.setattr(revocaciones, "_revocados", {})
+    monkeypatch.setattr(revocaciones, "_cargado", False)
+    monkeypatch.setattr(revocaciones, "_ultimo_sync", None)
+    return revocaciones
+
+
+def _revocacion(db, jti, expira, revocado_en=None):
+    """Fila escrita por "otro worker": directo a la tabla, sin pasar por la memoria de este."""
+    from models import TokenRevocado
+
+    db.session.add(TokenRevocado(jti=jti, expira=expira, revocado_en=revocado_en or datetime.utcnow()))
+    db.session.commit()
+
+
+def test_token_deslogueado_da_401(client, crear_usuario, token, revocaciones):
+    usuario = crear_usuario()
+    headers = token(usuario.id)
+    otro = token(usuario.id)
+
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+
+    r = client.get("/auth/me", headers=headers)
+    assert r.status_code == 401
+    assert r.get_json()["error"] == "token_revocado"
+    # solo se revoca ese jti
+    assert client.get("/auth/me", headers=otro).status_code == 200
+
+
+def test_sincronizar_trae_revocaciones_de_otros_workers(db, revocaciones):
+    futuro = datetime.utcnow() + timedelta(hours=1)
+    _revocacion(db, "viejo", futuro)
+    assert revocaciones.revocado("viejo")  # primera consulta: carga completa
+
+    _revocacion(db, "nuevo", futuro)
+    # commiteada tarde: revocado_en antes del último sync, dentro del solapamiento
+    _revocacion(db, "tarde", futuro, revocado_en=datetime.utcnow() - timedelta(seconds=10))
+    assert not revocaciones.revocado("nuevo")
+
+    assert revocaciones.sincronizar() == 3
+    assert revocaciones.revocado("nuevo")
+    assert revocaciones.revocado("tarde")
+
+
+def test_sincronizar_no_trae_lo_vencido(db, revocaciones):
+    _revocacion(db, "vencido", datetime.utcnow() - timedelta(minutes=1))
+    revocaciones.sincronizar(completo=True)
+    assert not revocaciones.revocado("vencido")
+
+
+def test_purgar_borra_solo_lo_vencido(db, revocaciones):
+    from models import TokenRevocado
+
+    _revocacion(db, "vencido", datetime.utcnow() - timedelta(minutes=1))
+    _revocacion(db, "vigente", datetime.utcnow() + timedelta(hours=1))
+
+    assert revocaciones.purgar() == 1
+    assert [t.jti for t in TokenRevocado.query.all()] == ["vigente"]
+
+
+def test_purgar_memoria_saca_solo_lo_vencido(revocaciones):
+    revocaciones.revocar("vigente", time.time() + 3600)
+    revocaciones.revocar("vencido", time.time() - 1)
+
+    assert revocaciones._purgar_memoria() == 1
+    assert revocaciones.revocado("vigente")
+    assert not revocaciones.revocado("vencido")
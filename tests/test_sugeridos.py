@@ -0,0 +1,19 @@
+def test_actualizar_no_tapa_bumps_ajenos(app, sembrar_catalogo):
+    from extension import cache, sugeridos_index
+
+    productos = sembrar_catalogo(10)
+    sugeridos_index.cargar()
+
+    # escritura propia: el índice queda al día sin recargar
+    cache.bump()
+    sugeridos_index.actualizar(productos[0].id)
+    assert sugeridos_index._version == cache.version()
+
+    # un bump de otro worker en el medio: no se da por aplicado
+    cache.bump()
+    cache.bump()
+    sugeridos_index.actualizar(productos[0].id)
+    assert sugeridos_index._version != cache.version()
+
+    sugeridos_index.sugeridos(productos[1].id)
+    assert sugeridos_index._version == cache.version()
@@ -0,0 +1,51 @@
+def test_prefijos_por_palabra(db, sembrar_catalogo):
+    from extension import prefijo_index
+    from models import Producto
+
+    sembrar_catalogo(30)
+    db.session.add(Producto(nombre="Vibrador Rosa Extralargo", slug="vibrador", precio=10, stock=1,
+                            vistas=1000, activo=True))
+    db.session.commit()
+    prefijo_index.cargar()
+
+    assert [p["nombre"] for p in prefijo_index.sugerir("ros")] == ["Vibrador Rosa Extralargo"]
+    assert [p["nombre"] for p in prefijo_index.sugerir("rosa ext")] == ["Vibrador Rosa Extralargo"]
+    # más largo que PREFIJO_MAX: sale por bisect
+    assert [p["nombre"] for p in prefijo_index.sugerir("extralargoxx")] == []
+    assert [p["nombre"] for p in prefijo_index.sugerir("extralargo")] == ["Vibrador Rosa Extralargo"]
+    # "producto" matchea 30 (> K_MAX): top por vistas precalculado
+    assert "producto" in prefijo_index._top
+    assert [p["nombre"] for p in prefijo_index.sugerir("produc", k=3)] == ["Producto 29", "Producto 28", "Producto 27"]
+    # sin prefijos de sufijos enteros ("vibrador rosa ...")
+    assert all(" " not in clave for clave in prefijo_index._top)
+
+
+def test_recarga_en_fondo(db, sembrar_catalogo):
+    from extension import cache, prefijo_index
+    from models import Producto
+
+    sembrar_catalogo(5)
+    prefijo_index.cargar()
+
+    db.session.add(Producto(nombre="Gel Nuevo", slug="gel", precio=10, stock=1, vistas=1, activo=True))
+    db.session.commit()
+    cache.bump()
+
+    # responde con el índice anterior y reconstruye aparte
+    assert prefijo_index.sugerir("gel") == []
+    prefijo_index._hilo.join(5)
+    assert [p["nombre"] for p in prefijo_index.sugerir("gel")] == ["Gel Nuevo"]
+
+
+def test_k_invalido_usa_el_default(client, sembrar_catalogo):
+    from extension import prefijo_index
+
+    sembrar_catalogo(30)
+    prefijo_index.cargar()
+
+    for k in ("abc", "1.5", ""):
+        r = client.get(f"/productos/sugerir?q=produc&k={k}")
+        assert r.status_code == 200
+        assert len(r.get_json()) == 8
+    assert len(client.get("/productos/sugerir?q=produc&k=3").get_json()) == 3
+    assert len(client.get("/productos/sugerir?q=produc&k=500").get_json()) == 20
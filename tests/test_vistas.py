@@ -0,0 +1,86 @@
+import pytest
+
+
+@pytest.fixture
+def vistas(app, monkeypatch):
+    """El buffer vacío y sin el thread de flush periódico (los tests hacen flush a mano)."""
+    from extension import vistas_buffer
+
+    monkeypatch.setattr(vistas_buffer, "_pendientes", {})
+    monkeypatch.setattr(vistas_buffer, "_asegurar_thread", lambda: None)
+    return vistas_buffer
+
+
+def test_solo_cuenta_vistas_de_productos_que_se_muestran(db, client, sembrar_catalogo, vistas):
+    activo, inactivo = sembrar_catalogo(2)
+    inactivo.activo = False
+    db.session.commit()
+
+    assert client.get(f"/productos/{activo.id}").status_code == 200
+    # el segundo sale del cache y también cuenta
+    r = client.get(f"/productos/{activo.id}")
+    assert r.status_code == 200 and r.headers["X-Cache"] == "HIT"
+    assert client.get(f"/productos/{inactivo.id}").status_code == 404
+    assert client.get("/productos/987654").status_code == 404
+
+    assert vistas.pendientes() == {activo.id: 2}
+
+
+def test_flush_es_un_solo_update(db, sembrar_catalogo, contar_queries, vistas):
+    from models import Producto
+
+    productos = sembrar_catalogo(5)
+    antes = {p.id: p.vistas for p in productos}
+    for p in productos:
+        vistas.sumar(p.id, p.id)
+
+    with contar_queries() as stmts:
+        assert vistas.flush() == 5
+    updates = [s for s in stmts if s.lstrip().upper().startswith("UPDATE")]
+    assert len(updates) == 1 and len(stmts) == 1, stmts
+    assert vistas.pendientes() == {}
+
+    db.session.expire_all()
+    for p in Producto.query.all():
+        assert p.vistas == antes[p.id] + p.id
+
+
+def test_flush_fallido_devuelve_las_vistas_al_buffer(db, sembrar_catalogo, vistas, monkeypatch):
+    producto = sembrar_catalogo(1)[0]
+    vistas.sumar(producto.id, 3)
+
+    def romper(*args, **kwargs):
+        raise RuntimeError("db caída")
+
+    with monkeypatch.context() as m:
+        m.setattr(db.session, "execute", romper)
+        with pytest.raises(RuntimeError):
+            vistas.flush()
+        # lo que llegó mientras tanto se suma a lo devuelto
+        vistas.sumar(producto.id, 2)
+    assert vistas.pendientes() == {producto.id: 5}
+
+    assert vistas.flush() == 1
+    db.session.refresh(producto)
+    assert producto.vistas == 5
+
+
+def test_hook_de_apagado_escribe_lo_pendiente(app, db, sembrar_catalogo, vistas, monkeypatch):
+    import atexit
+
+    from services.vistas import VistasBuffer
+
+    registrados = []
+    monkeypatch.setattr(atexit, "register", registrados.append)
+    buffer = VistasBuffer()
+    buffer.init_app(app)
+    buffer._asegurar_thread = lambda: None
+    assert registrados == [buffer._flush_con_contexto]
+
+    producto = sembrar_catalogo(1)[0]
+    buffer.sumar(producto.id, 4)
+    # abre su propio app context, como al apagar el worker
+    registrados[0]()
+    db.session.refresh(producto)
+    assert producto.vistas == 4
+    assert buffer.pendientes() == {}
@@ -0,0 +1,49 @@
+import random
+
+
+def _zona(id, inicio, fin):
+    return {"id": id, "cp_inicio": inicio, "cp_fin": fin}
+
+
+def test_solapamientos_todos_los_pares():
+    from services.zonas import ZonasIndex
+
+    zonas = [_zona(1, 1, 100), _zona(2, 10, 20), _zona(3, 15, 30), _zona(4, 200, 300)]
+    *_, pares = ZonasIndex._segmentos(zonas)
+    assert sorted(pares) == [(1, 2), (1, 3), (2, 3)]
+
+
+def test_segmentos_contra_fuerza_bruta():
+    """Cada CP cae en la zona activa de menor id que lo cubre; los pares son todos los que se pisan."""
+    from services.zonas import ZonasIndex
+
+    rnd = random.Random(7)
+    for _ in range(50):
+        zonas = []
+        for id in rnd.sample(range(1, 100), 12):
+            inicio = rnd.randint(1000, 1200)
+            zonas.append(_zona(id, inicio, inicio + rnd.randint(0, 60)))
+        segmentos = ZonasIndex._segmentos(zonas)
+        inicios, fines, ganadoras, pares = segmentos
+
+        for cp in range(990, 1270):
+            cubren = [z for z in zonas if z["cp_inicio"] <= cp <= z["cp_fin"]]
+            esperada = min(cubren, key=lambda z: z["id"]) if cubren else None
+            assert ZonasIndex._en((inicios, fines, ganadoras), cp) is esperada
+
+        esperados = {
+            tuple(sorted((a["id"], b["id"])))
+            for i, a in enumerate(zonas) for b in zonas[i + 1:]
+            if a["cp_inicio"] <= b["cp_fin"] and b["cp_inicio"] <= a["cp_fin"]
+        }
+        assert {tuple(sorted(p)) for p in pares} == esperados
+        assert len(pares) == len(esperados)
+
+
+def test_solapamientos_solo_admin(client, crear_usuario, token):
+    admin = crear_usuario("admin")
+    cliente = crear_usuario("cliente")
+
+    assert client.get("/envios/solapamientos").status_code == 401
+    assert client.get("/envios/solapamientos", headers=token(cliente.id, rol="cliente")).status_code == 403
+    assert client.get("/envios/solapamientos", headers=token(admin.id, rol="admin")).status_code == 200